@@ -1,8 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+from typing import Optional
 from .services.db import init_database
-from .routers import data, predict
+from .services.scheduler import start_scheduler, stop_scheduler
+from .services import metrics, profiling, query_log
+from .routers import data, predict, dashboard
 
 # ロガー設定
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +23,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# リクエストのプロファイリング（REQUEST_PROFILING=1 の場合のみ登録）
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+    logger.info("Request profiling enabled (X-Profile header or profile query)")
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -31,14 +40,24 @@ async def startup_event():
         # モデルロードは遅延初期化（predict.get_predictor()で実行）
         logger.info("ML models will be loaded on first prediction request (lazy loading)")
 
+        # 予測の事前計算（FORECAST_SCHEDULER が有効な場合のみ）
+        start_scheduler(predict.get_predictor)
+
     except Exception as e:
         logger.error(f"Startup failed: {e}")
         logger.warning("Continuing with limited functionality")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """終了時処理"""
+    await stop_scheduler()
+
+
 # ルーター登録
 app.include_router(data.router)
 app.include_router(predict.router)
+app.include_router(dashboard.router)
 
 
 @app.get("/")
@@ -52,4 +71,66 @@ async def health_check():
     """ヘルスチェック"""
     return {"status": "ok", "message": "API is running"}
 
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """メトリクス（処理段階ごとの所要時間・キャッシュのヒット率・モデルのロード時間、Prometheusのテキスト形式）"""
+    return Response(content=metrics.render(), media_type=metrics.PROMETHEUS_MEDIA_TYPE)
+
+
+# SQLの集計（QUERY_LOG_ENDPOINT=1 かつ QUERY_LOG_TOKEN を設定した場合のみ登録）
+if query_log.QUERY_LOG_ENDPOINT_ENABLED and query_log.QUERY_LOG_TOKEN:
+    logger.info("Query stats endpoint enabled (/api/admin/queries, X-Admin-Token required)")
+
+    @app.get("/api/admin/queries")
+    async def get_query_stats(sort: str = "total", limit: int = 50,
+                              x_admin_token: Optional[str] = Header(None)):
+        """
+        SQLの文ごとの実行時間の集計（get_db() / get_readonly_db() の接続で実行したもの）
+
+        Args:
+            sort: 並べ替えの基準（total / mean / max / count / slow、デフォルト: total）
+            limit: 返す文の数（デフォルト: 50）
+            x_admin_token: X-Admin-Token ヘッダー（QUERY_LOG_TOKEN と一致する必要がある）
+
+        Returns:
+            文ごとの実行回数・合計/平均/最大時間・行数・スロークエリの回数・実行計画
+        """
+        if not query_log.check_token(x_admin_token):
+            raise HTTPException(status_code=403, detail="X-Admin-Token が一致しません")
+        try:
+            return query_log.statement_stats(sort, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+elif query_log.QUERY_LOG_ENDPOINT_ENABLED:
+    logger.warning("QUERY_LOG_ENDPOINT=1 but QUERY_LOG_TOKEN is not set; /api/admin/queries is not registered")
+
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "json"):
+    """
+    プロファイリングの結果（X-Profile-Id ヘッダーのID）
+
+    Args:
+        profile_id: プロファイルID
+        format: json（段階ごとの所要時間と collapsed 形式のスタック）または
+                folded（collapsed 形式のテキストのみ、flamegraph.pl / speedscope 用）
+
+    Returns:
+        プロファイル
+    """
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="プロファイリングは無効です")
+    if format not in ("json", "folded"):
+        raise HTTPException(status_code=400, detail="format は json または folded を指定してください")
+
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="プロファイルが見つかりません")
+
+    if format == "folded":
+        return PlainTextResponse(profile["folded"])
+    return profile
+
+
 # Vercel Python Functionsは、appオブジェクトを自動的に認識します
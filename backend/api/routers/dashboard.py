@@ -0,0 +1,103 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+import asyncio
+import time
+import logging
+from ..services.db import get_db, get_actuals_status, calculate_mapes, data_version
+from ..services.http_cache import make_etag, cache_headers, is_not_modified, not_modified
+from ..services.weather import REQUEST_BUDGET_SECONDS, WeatherService
+from ..services import scheduler
+from .predict import load_forecast, forecast_version, prediction_version, to_points_response, accuracy_summary
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+
+def _read_summary(area: str, days: int) -> tuple:
+    """データ状態と予測精度を1つの接続で取得（スレッドプールで実行）"""
+    db = get_db()
+    try:
+        return get_actuals_status(db), calculate_mapes(db, area, days)
+    finally:
+        db.close()
+
+
+def _dashboard_headers(request: Request, version: str, forecast_parts: tuple) -> dict:
+    """ETag（DBのバージョン・30分枠・予測のバージョン）とキャッシュヘッダー"""
+    etag = make_etag(request.url.path, request.url.query, version, scheduler.current_slot(), *forecast_parts)
+    return cache_headers(etag)
+
+
+@router.get("")
+async def get_dashboard(request: Request, response: Response,
+                        area: str = "tokyo", hours: int = 48, days: int = 7):
+    """
+    ダッシュボードの表示に必要なデータを1回で取得
+
+    /api/data/status・/api/predict/latest・/api/predict/accuracy の内容をまとめて返す。
+    DBの読み取り（1つの接続）はスレッドプールで予測の取得と並行して実行する。
+
+    Args:
+        area: 対象エリア（デフォルト: tokyo）
+        hours: 予測時間数（デフォルト: 48）
+        days: 精度の集計期間（日、デフォルト: 7）
+
+    Returns:
+        {"status", "prediction", "accuracy"}（予測に失敗した場合は prediction が None で
+        prediction_error に理由が入る）
+    """
+    # 関数の実行時間上限に収まるよう期限を決める
+    deadline = time.monotonic() + REQUEST_BUDGET_SECONDS
+
+    try:
+        version = data_version()
+        checked = False
+
+        # スナップショットが新しいか、その場で計算する予測ならDBを読む前にETagを判定できる
+        if hours == scheduler.SNAPSHOT_HOURS:
+            snapshot = scheduler.get_snapshot(area)
+            if scheduler.is_fresh(area, snapshot):
+                headers = _dashboard_headers(request, version,
+                                             forecast_version(snapshot, snapshot["generated_at"]))
+                if is_not_modified(request, headers["ETag"]):
+                    return not_modified(headers)
+                checked = True
+        else:
+            parts = prediction_version(version, scheduler.current_slot(), WeatherService.cached_fetched_at(area))
+            headers = _dashboard_headers(request, version, parts)
+            if is_not_modified(request, headers["ETag"]):
+                return not_modified(headers)
+            checked = True
+
+        reads = asyncio.get_event_loop().run_in_executor(None, _read_summary, area, days)
+
+        prediction = None
+        prediction_error = None
+        try:
+            forecast, forecast_parts = await load_forecast(area, hours, deadline)
+            prediction = to_points_response(area, forecast)
+        except Exception as e:
+            logger.error(f"Prediction for dashboard failed: {e}")
+            prediction_error = f"予測に失敗しました: {str(e)}"
+
+        status, mapes = await reads
+
+        # 処理中にDBが更新された（予測を保存した場合など）ときは、読んだ内容とバージョンが
+        # 対応しないことがあるためETagを付けない
+        if prediction is not None and data_version() == version:
+            headers = _dashboard_headers(request, version, forecast_parts)
+            if not checked and is_not_modified(request, headers["ETag"]):
+                return not_modified(headers)
+            response.headers.update(headers)
+
+        return {
+            "area": area,
+            "status": status,
+            "prediction": prediction,
+            "prediction_error": prediction_error,
+            "accuracy": accuracy_summary(area, days, mapes)
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to get dashboard: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
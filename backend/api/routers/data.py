@@ -1,10 +1,26 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 import pandas as pd
 import numpy as np
 import io
+import time
 import logging
 from ..services.db import (
     get_db,
+    data_version,
+    to_epoch,
+    format_timestamp,
+    format_timestamps,
+    get_generation_data,
+    get_price_data,
+    get_actuals_range,
+    align_actuals,
+    get_rollup_series,
+    get_actuals_status,
+    ACTUAL_SOURCES,
+    ROLLUP_METRICS,
+    DEFAULT_MAX_POINTS,
     save_generation_data,
     save_price_data,
     save_predictions,
@@ -12,13 +28,28 @@ from ..services.db import (
     clear_price_data,
     clear_predictions
 )
+from ..services.downsample import downsample_rows
+from ..services.export import validate_export, export_batches
+from ..services import scheduler
+from ..services.http_cache import conditional
+from ..services.metrics import observe, timed_function
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/data", tags=["data"])
 
 
+def _columns_to_json(data: dict) -> dict:
+    """列ごとの配列をJSON用のリストに変換（timestamp は日時文字列、NaNはNone）"""
+    result = {"timestamp": format_timestamps(data['timestamp'])}
+    for col, values in data.items():
+        if col != 'timestamp':
+            result[col] = np.where(np.isnan(values), None, values).tolist()
+    return result
+
+
 @router.post("/upload")
+@timed_function("upload.total")
 async def upload_csv(
     generation_file: UploadFile = File(None),
     price_file: UploadFile = File(None)
@@ -31,7 +62,7 @@ async def upload_csv(
         price_file: 価格CSVファイル
 
     Returns:
-        アップロード結果
+        アップロード結果（段階ごとの所要時間は metrics に "upload.*" として記録）
     """
     try:
         db = get_db()
@@ -48,6 +79,7 @@ async def upload_csv(
 
         if generation_file:
             # CSVファイルを読み込み
+            stage_start = time.perf_counter()
             content = await generation_file.read()
 
             # まず最初の行を確認してTEPCO形式かどうか判定
@@ -96,8 +128,12 @@ async def upload_csv(
                 if 'total_mw' not in df.columns:
                     df['total_mw'] = df.get('pv_mw', 0) + df.get('wind_mw', 0)
 
+            observe("upload.generation.parse", time.perf_counter() - stage_start)
+
             # DBに保存
+            stage_start = time.perf_counter()
             save_generation_data(db, df, area="tokyo")
+            observe("upload.generation.save", time.perf_counter() - stage_start)
             uploaded_files.append({
                 "type": "generation",
                 "filename": generation_file.filename,
@@ -106,6 +142,7 @@ async def upload_csv(
 
             # デモ用: 仮想的な予測データを生成してMAPE計算を可能にする
             # 実績値に5-10%のランダムノイズを加えたものを予測値として保存
+            stage_start = time.perf_counter()
             virtual_predictions = []
             for _, row in df.iterrows():
                 noise_factor = np.random.uniform(0.9, 1.1)  # ±10%のノイズ
@@ -119,12 +156,14 @@ async def upload_csv(
 
             # 予測データを保存（actual_valueも同時に保存）
             save_predictions(db, "tokyo", "generation", virtual_predictions)
+            observe("upload.generation.virtual_predictions", time.perf_counter() - stage_start)
 
             logger.info(f"Uploaded generation file: {generation_file.filename} ({len(df)} rows)")
             logger.info(f"Generated {len(virtual_predictions)} virtual predictions for MAPE calculation")
 
         if price_file:
             # CSVファイルを読み込み
+            stage_start = time.perf_counter()
             content = await price_file.read()
             df = pd.read_csv(io.BytesIO(content))
 
@@ -137,8 +176,12 @@ async def upload_csv(
             # timestampを日時型に変換
             df['timestamp'] = pd.to_datetime(df['timestamp'])
 
+            observe("upload.price.parse", time.perf_counter() - stage_start)
+
             # DBに保存
+            stage_start = time.perf_counter()
             save_price_data(db, df, area="tokyo")
+            observe("upload.price.save", time.perf_counter() - stage_start)
             uploaded_files.append({
                 "type": "price",
                 "filename": price_file.filename,
@@ -146,6 +189,7 @@ async def upload_csv(
             })
 
             # デモ用: 仮想的な予測データを生成してMAPE計算を可能にする
+            stage_start = time.perf_counter()
             virtual_predictions = []
             for _, row in df.iterrows():
                 noise_factor = np.random.uniform(0.9, 1.1)  # ±10%のノイズ
@@ -159,6 +203,7 @@ async def upload_csv(
 
             # 予測データを保存（actual_valueも同時に保存）
             save_predictions(db, "tokyo", "price", virtual_predictions)
+            observe("upload.price.virtual_predictions", time.perf_counter() - stage_start)
 
             logger.info(f"Uploaded price file: {price_file.filename} ({len(df)} rows)")
             logger.info(f"Generated {len(virtual_predictions)} virtual predictions for MAPE calculation")
@@ -168,6 +213,9 @@ async def upload_csv(
         if not uploaded_files:
             raise HTTPException(status_code=400, detail="No files uploaded")
 
+        # 新しい実績で予測を計算し直す（スケジューラーが動いていれば購読者にも配信）
+        scheduler.invalidate("tokyo")
+
         return {
             "status": "success",
             "message": "データをアップロードしました",
@@ -183,51 +231,272 @@ async def upload_csv(
 
 
 @router.get("/status")
-async def get_data_status():
+async def get_data_status(request: Request, response: Response):
     """
     データ更新状態を確認
 
     Returns:
-        データ統計情報
+        データ統計情報（ETag はDBのバージョンから作り、If-None-Match が一致すれば 304）
     """
     try:
+        headers, cached = conditional(request, data_version())
+        if cached is not None:
+            return cached
+        response.headers.update(headers)
+
         db = get_db()
-        cursor = db.cursor()
+        status = get_actuals_status(db)
+        db.close()
 
-        # 発電量データの件数
-        cursor.execute("SELECT COUNT(*) as count FROM generation_actual")
-        generation_count = cursor.fetchone()['count']
+        return status
 
-        # 価格データの件数
-        cursor.execute("SELECT COUNT(*) as count FROM price_actual")
-        price_count = cursor.fetchone()['count']
+    except Exception as e:
+        logger.error(f"Failed to get data status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # 最新のタイムスタンプ
-        cursor.execute("""
-            SELECT MAX(timestamp) as latest
-            FROM generation_actual
-        """)
-        latest_generation = cursor.fetchone()['latest']
 
-        cursor.execute("""
-            SELECT MAX(timestamp) as latest
-            FROM price_actual
-        """)
-        latest_price = cursor.fetchone()['latest']
+@router.get("/series")
+async def get_series(
+    metric: str = "total_mw",
+    area: str = "tokyo",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    days: int = 30,
+    max_points: int = DEFAULT_MAX_POINTS
+):
+    """
+    長期間のグラフ用の集計系列を取得（期間に応じて30分・1時間・1日から解像度を選ぶ）
 
-        db.close()
+    Args:
+        metric: 指標（pv_mw / wind_mw / total_mw / price_yen / generation_error / price_error）
+        area: 対象エリア
+        start: 開始日時（日本時間、省略時は end の days 日前）
+        end: 終了日時（日本時間、含まない。省略時は最新データの次の30分）
+        days: start 省略時の期間（日）
+        max_points: 返す点数の上限の目安
+
+    Returns:
+        解像度と、バケットごとの件数・平均・最小・最大
+    """
+    try:
+        if metric not in ROLLUP_METRICS:
+            raise ValueError(f"Unknown metric: {metric} (choose from {', '.join(ROLLUP_METRICS)})")
+        if max_points < 1 or days < 1:
+            raise ValueError("max_points and days must be positive")
+
+        db = get_db()
+        try:
+            if end is not None:
+                end_epoch = to_epoch(end)
+            else:
+                table, ts_col, _, _ = ROLLUP_METRICS[metric]
+                latest = db.execute(f"SELECT MAX({ts_col}) FROM {table} WHERE area = ?", (area,)).fetchone()[0]
+                if latest is None:
+                    return {"metric": metric, "area": area, "start": None, "end": None,
+                            "resolution_seconds": None, "points": []}
+                end_epoch = latest + 1800
+
+            start_epoch = to_epoch(start) if start is not None else end_epoch - days * 86400
+            if start_epoch >= end_epoch:
+                raise ValueError("start must be earlier than end")
+
+            resolution, rows = get_rollup_series(db, metric, area, start_epoch, end_epoch, max_points)
+        finally:
+            db.close()
+
+        # 1日単位でも上限を超える長い期間は平均の形を保って間引く
+        rows = downsample_rows(rows, 'bucket', 'mean', max_points)
+
+        return {
+            "metric": metric,
+            "area": area,
+            "start": format_timestamp(start_epoch),
+            "end": format_timestamp(end_epoch),
+            "resolution_seconds": resolution,
+            "points": [
+                {
+                    "timestamp": format_timestamp(row['bucket']),
+                    "count": row['count'],
+                    "mean": row['mean'],
+                    "min": row['min'],
+                    "max": row['max']
+                }
+                for row in rows
+            ]
+        }
+
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to get series: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/actuals")
+async def get_actuals(
+    source: str = "generation",
+    area: str = "tokyo",
+    limit: int = 1000,
+    max_points: Optional[int] = None
+):
+    """
+    最新の実績データを取得
+
+    Args:
+        source: 'generation'（発電量）または 'price'（価格）
+        area: 対象エリア
+        limit: 取得する件数（新しい順）
+        max_points: 指定した場合はピークや谷を残したままこの点数までLTTBで間引く
+
+    Returns:
+        時系列順の実績データ
+    """
+    try:
+        if source not in ('generation', 'price'):
+            raise ValueError("source must be 'generation' or 'price'")
+        if limit < 1 or (max_points is not None and max_points < 1):
+            raise ValueError("limit and max_points must be positive")
+
+        db = get_db()
+        try:
+            if source == 'generation':
+                rows = get_generation_data(db, area, limit)
+                columns, value_key = ['pv_mw', 'wind_mw', 'total_mw'], 'total_mw'
+            else:
+                rows = get_price_data(db, area, limit)
+                columns, value_key = ['price_yen'], 'price_yen'
+        finally:
+            db.close()
+
+        # 時系列順に並べ直す
+        rows = rows[::-1]
+        if max_points is not None:
+            rows = downsample_rows(rows, 'timestamp', value_key, max_points)
 
         return {
-            "generation": {
-                "count": generation_count,
-                "latest_timestamp": latest_generation
-            },
-            "price": {
-                "count": price_count,
-                "latest_timestamp": latest_price
+            "source": source,
+            "area": area,
+            "count": len(rows),
+            "data": [
+                {"timestamp": format_timestamp(row['timestamp']), **{col: row[col] for col in columns}}
+                for row in rows
+            ]
+        }
+
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to get actuals: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/range")
+async def get_actuals_in_range(
+    start: str,
+    end: str,
+    area: str = "tokyo",
+    source: Optional[str] = None,
+    join: bool = False
+):
+    """
+    期間内の実績データを列ごとの配列で取得
+
+    Args:
+        start: 開始日時（日本時間、含む）
+        end: 終了日時（日本時間、含まない）
+        area: 対象エリア
+        source: 'generation' / 'price'（省略時は両方）
+        join: True の場合は発電量と価格を timestamp で揃えた1組の配列で返す
+
+    Returns:
+        ソースごと（join の場合は "data" に1つ）の {"timestamp": [...], 列名: [...]}
+    """
+    try:
+        if source is not None and source not in ACTUAL_SOURCES:
+            raise ValueError("source must be 'generation' or 'price'")
+        if join and source is not None:
+            raise ValueError("join cannot be combined with source")
+
+        start_epoch = to_epoch(start)
+        end_epoch = to_epoch(end)
+        if start_epoch >= end_epoch:
+            raise ValueError("start must be earlier than end")
+
+        db = get_db()
+        try:
+            data = {
+                name: get_actuals_range(db, name, area, start_epoch, end_epoch)
+                for name in ([source] if source else ACTUAL_SOURCES)
             }
+        finally:
+            db.close()
+
+        result = {
+            "area": area,
+            "start": format_timestamp(start_epoch),
+            "end": format_timestamp(end_epoch)
         }
+        if join:
+            result["data"] = _columns_to_json(align_actuals(data['generation'], data['price']))
+        else:
+            result.update({name: _columns_to_json(columns) for name, columns in data.items()})
+
+        return result
 
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Failed to get data status: {e}")
+        logger.error(f"Failed to get actuals in range: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export/{dataset}")
+async def export_data(
+    dataset: str,
+    start: str,
+    end: str,
+    area: Optional[str] = None,
+    format: str = "arrow",
+    compression: Optional[str] = None
+):
+    """
+    期間内の実績・予測をArrow IPCストリーム / Parquetでエクスポート（分割して送信）
+
+    Args:
+        dataset: 'generation' / 'price' / 'predictions'
+        start: 開始日時（日本時間、含む。predictions は予測対象時刻で絞る）
+        end: 終了日時（日本時間、含まない）
+        area: 対象エリア（省略時は全エリア）
+        format: 'arrow' / 'parquet'
+        compression: 圧縮方式（arrow: lz4 / zstd、parquet: snappy / gzip / zstd / lz4、省略時は無圧縮）
+
+    Returns:
+        ファイルのストリーム
+    """
+    try:
+        media_type, extension = validate_export(dataset, format, compression)
+
+        start_epoch = to_epoch(start)
+        end_epoch = to_epoch(end)
+        if start_epoch >= end_epoch:
+            raise ValueError("start must be earlier than end")
+
+        batches = export_batches(dataset, start_epoch, end_epoch, area, format, compression)
+        dates = [format_timestamp(epoch)[:10].replace('-', '') for epoch in (start_epoch, end_epoch)]
+        filename = f"{dataset}_{area or 'all'}_{dates[0]}-{dates[1]}.{extension}"
+
+        return StreamingResponse(
+            batches,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
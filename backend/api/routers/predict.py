@@ -1,17 +1,32 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+from typing import Optional
+import time
+import asyncio
 import logging
-from ..services.db import get_db, calculate_mape
+from ..services.db import get_db, calculate_mapes, format_timestamp, format_utc_timestamp, data_version
 from ..services.model_loader import ModelLoader
-from ..services.predictor import Predictor
+from ..services.predictor import Predictor, to_points, forecast_info, to_columnar
+from ..services.serialization import json_response, arrow_response, require_arrow
+from ..services.downsample import downsample_rows
+from ..services.weather import REQUEST_BUDGET_SECONDS, WeatherService
+from ..services import scheduler
+from ..services.broadcast import forecast_broadcaster
+from ..services.http_cache import conditional, make_etag, cache_headers, is_not_modified, not_modified
+from ..services.metrics import timed_function, record_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/predict", tags=["predict"])
 
+# /latest のレスポンス形式
+PREDICTION_FORMATS = ("points", "columnar", "arrow")
+
 # グローバルキャッシュ（Vercel Serverless Functions用）
 _model_loader = None
 _predictor = None
+_model_version = None
 
 
 def get_predictor():
@@ -37,38 +52,168 @@ def get_predictor():
     return _predictor
 
 
+def get_model_version() -> str:
+    """モデルのバージョンを取得（ETag用、モデルはロードしない）"""
+    global _model_version
+
+    if _model_version is None:
+        _model_version = (_model_loader or ModelLoader()).version()
+
+    return _model_version
+
+
 def set_predictor(p):
     """予測サービスを設定（後方互換性のため残す）"""
     global _predictor
     _predictor = p
 
 
+def forecast_version(forecast: dict, version: str) -> tuple:
+    """予測のETagの元（データのバージョン・モデル・気象予報の取得時刻）"""
+    return (version, get_model_version(), forecast["weather"]["fetched_at"])
+
+
+def prediction_version(version: str, slot: int, fetched_at: Optional[str]) -> tuple:
+    """
+    その場で計算する予測のETagの元
+
+    予測を計算する前に分かる値（DBのバージョン・モデル・30分枠・気象予報の取得時刻）だけで作る。
+    計算後は使った気象予報の取得時刻がキャッシュの取得時刻になるため、
+    次のリクエストは同じ値から If-None-Match を計算前に判定できる。
+
+    Args:
+        version: data_version() の戻り値
+        slot: scheduler.current_slot() の戻り値
+        fetched_at: 気象予報の取得時刻（WeatherService.cached_fetched_at() と同じ形式）
+
+    Returns:
+        ETagの元
+    """
+    return (version, get_model_version(), slot, fetched_at)
+
+
+async def load_forecast(area: str, hours: int, deadline: float) -> tuple:
+    """
+    予測を取得
+
+    hours が scheduler.SNAPSHOT_HOURS ならスナップショット（なければ現在の枠の予測を計算）、
+    それ以外はその場で計算する。
+
+    Args:
+        area: エリア名
+        hours: 予測時間数
+        deadline: 期限（time.monotonic() 基準）
+
+    Returns:
+        (予測, ETagの元: スナップショットは forecast_version()、それ以外は prediction_version() の戻り値)
+    """
+    if hours == scheduler.SNAPSHOT_HOURS:
+        forecast = scheduler.get_snapshot(area)
+        fresh = scheduler.is_fresh(area, forecast)
+        record_cache("forecast_snapshot", fresh)
+        if not fresh:
+            logger.info(f"Refreshing {hours}h forecast snapshot for {area}")
+            forecast = await scheduler.refresh_forecast(area, get_predictor, deadline=deadline)
+        return forecast, forecast_version(forecast, forecast["generated_at"])
+
+    version = data_version()
+    slot = scheduler.current_slot()
+
+    # 予測サービスを取得（初回時にロード）
+    predictor = get_predictor()
+
+    logger.info(f"Generating {hours}h prediction for {area}")
+
+    # 予測実行
+    forecast = await predictor.predict(area=area, hours=hours, deadline=deadline)
+    forecast["generated_at"] = datetime.now().isoformat()
+    return forecast, prediction_version(version, slot, forecast["weather"]["fetched_at"])
+
+
+@timed_function("serialize.points")
+def to_points_response(area: str, forecast: dict) -> dict:
+    """/latest の points 形式のレスポンス"""
+    return {
+        **forecast_info(area, forecast),
+        "predictions": {
+            "generation": to_points(forecast["start"], forecast["generation"]),
+            "price": to_points(forecast["start"], forecast["price"])
+        }
+    }
+
+
+def accuracy_summary(area: str, days: int, mapes: dict) -> dict:
+    """/accuracy のレスポンス"""
+    return {
+        "area": area,
+        "period_days": days,
+        "generation_mape": mapes["generation"],
+        "price_mape": mapes["price"],
+        "note": "MAPEが小さいほど精度が高い"
+    }
+
+
 @router.get("/latest")
-async def get_latest_prediction(area: str = "tokyo", hours: int = 48):
+async def get_latest_prediction(request: Request, response: Response,
+                                area: str = "tokyo", hours: int = 48, format: str = "points"):
     """
     次のN時間の予測を取得
 
     Args:
         area: 対象エリア（デフォルト: tokyo）
         hours: 予測時間数（デフォルト: 48）
+        format: レスポンス形式
+            - points: ターゲットごとの [{"timestamp", "value"}] のリスト（デフォルト）
+            - columnar: 先頭時刻 start・間隔 step_seconds とターゲットごとの値の配列
+            - arrow: columnar と同じ内容のArrow IPCストリーム（列 generation / price、
+              その他の項目はスキーマのメタデータ）
 
     Returns:
-        予測結果
-    """
-    try:
-        # 予測サービスを取得（初回時にロード）
-        predictor = get_predictor()
+        予測結果（stale_inputs が True の場合はキャッシュした気象予報を使用）
 
-        logger.info(f"Generating {hours}h prediction for {area}")
+    hours が既定値（scheduler.SNAPSHOT_HOURS）の場合は事前計算したスナップショットを返し、
+    なければ現在の30分枠の予測を計算する（同時のリクエストは1つの計算を共有）。
+    generated_at はスナップショットを計算した時刻。
 
-        # 予測実行
-        predictions = await predictor.predict(area=area, hours=hours)
+    ETag はスナップショットでは計算した時刻、それ以外はDBのバージョン・モデル・30分枠と
+    キャッシュした気象予報の取得時刻から作り、If-None-Match が一致すれば 304 を返す。
+    どちらも予測を計算せずに判定する（スナップショットが古い場合は計算し直すが、
+    計算した時刻が変わるため以前のETagとは一致しない）。
+    """
+    # 関数の実行時間上限に収まるよう期限を決める
+    deadline = time.monotonic() + REQUEST_BUDGET_SECONDS
 
-        return {
-            "area": area,
-            "predictions": predictions,
-            "generated_at": datetime.now().isoformat()
-        }
+    try:
+        if format not in PREDICTION_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(PREDICTION_FORMATS)}")
+        if format == "arrow":
+            require_arrow()
+
+        snapshot = hours == scheduler.SNAPSHOT_HOURS
+        if not snapshot:
+            # 前回と同じ入力なら気象予報の取得・推論の前に 304 を返す
+            parts = prediction_version(data_version(), scheduler.current_slot(),
+                                       WeatherService.cached_fetched_at(area))
+            headers = cache_headers(make_etag(request.url.path, request.url.query, *parts))
+            if is_not_modified(request, headers["ETag"]):
+                return not_modified(headers)
+
+        forecast, version = await load_forecast(area, hours, deadline)
+
+        headers = cache_headers(make_etag(request.url.path, request.url.query, *version))
+        if snapshot and is_not_modified(request, headers["ETag"]):
+            return not_modified(headers)
+
+        if format == "points":
+            response.headers.update(headers)
+            return to_points_response(area, forecast)
+
+        content = to_columnar(area, forecast)
+        if format == "arrow":
+            columns = content.pop("predictions")
+            del content["format"]
+            return arrow_response(columns, metadata=content, headers=headers)
+        return json_response(content, headers=headers)
 
     except ValueError as e:
         logger.error(f"Validation error: {e}")
@@ -78,11 +223,58 @@ async def get_latest_prediction(area: str = "tokyo", hours: int = 48):
         raise HTTPException(status_code=500, detail=f"予測に失敗しました: {str(e)}")
 
 
+@router.get("/stream")
+async def stream_predictions(area: str = "tokyo", last_event_id: Optional[str] = Header(None)):
+    """
+    予測の更新をServer-Sent Eventsで受け取る
+
+    予測が公開されるたびに forecast イベント（data は /latest?format=columnar と同じJSON）を送る。
+    接続時には最新の予測をすぐに送り（Last-Event-ID で受け取り済みなら省略）、
+    まだなければ計算を始める。受信が追いつかない接続はサーバーから切断する。
+
+    Args:
+        area: 対象エリア（デフォルト: tokyo）
+        last_event_id: 再接続時に EventSource が送る最後のイベントID
+
+    Returns:
+        text/event-stream
+    """
+    try:
+        subscription = forecast_broadcaster.subscribe(area, last_event_id)
+
+        snapshot = scheduler.get_snapshot(area)
+        if not scheduler.is_fresh(area, snapshot):
+            async def refresh():
+                try:
+                    await scheduler.refresh_forecast(area, get_predictor)
+                except Exception as e:
+                    logger.error(f"Prediction for stream failed: {e}")
+            asyncio.ensure_future(refresh())
+
+        async def events():
+            try:
+                async for event in subscription.events():
+                    yield event
+            finally:
+                forecast_broadcaster.unsubscribe(subscription)
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        })
+
+    except Exception as e:
+        logger.error(f"Failed to open prediction stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/accuracy")
-async def get_accuracy(area: str = "tokyo", days: int = 7):
+async def get_accuracy(request: Request, response: Response, area: str = "tokyo", days: int = 7):
     """
     過去N日間の予測精度（MAPE）を取得
 
+    ETag はDBのバージョンと30分枠（期間が現在時刻基準のため）から作る。
+
     Args:
         area: 対象エリア
         days: 過去何日分
@@ -91,23 +283,19 @@ async def get_accuracy(area: str = "tokyo", days: int = 7):
         精度メトリクス
     """
     try:
-        db = get_db()
+        headers, cached = conditional(request, data_version(), scheduler.current_slot(), shared_max_age=300)
+        if cached is not None:
+            return cached
+        response.headers.update(headers)
 
-        # 発電量のMAPE
-        generation_mape = calculate_mape(db, "generation", area, days)
+        db = get_db()
 
-        # 価格のMAPE
-        price_mape = calculate_mape(db, "price", area, days)
+        # 発電量・価格のMAPE
+        mapes = calculate_mapes(db, area, days)
 
         db.close()
 
-        return {
-            "area": area,
-            "period_days": days,
-            "generation_mape": generation_mape,
-            "price_mape": price_mape,
-            "note": "MAPEが小さいほど精度が高い"
-        }
+        return accuracy_summary(area, days, mapes)
 
     except Exception as e:
         logger.error(f"Failed to calculate accuracy: {e}")
@@ -115,42 +303,60 @@ async def get_accuracy(area: str = "tokyo", days: int = 7):
 
 
 @router.get("/history")
-async def get_prediction_history(area: str = "tokyo", days: int = 7):
+async def get_prediction_history(request: Request, response: Response,
+                                 area: str = "tokyo", days: int = 7, max_points: Optional[int] = None):
     """
     過去の予測履歴を取得
 
     Args:
         area: 対象エリア
         days: 過去何日分
+        max_points: 指定した場合は期間内の全件を対象に、予測値の形を保ったまま
+            target_type ごとにこの点数までLTTBで間引く（省略時は新しい順に1000件）
 
     Returns:
-        予測履歴
+        予測履歴（ETag は /accuracy と同じくDBのバージョンと30分枠から作る）
     """
     try:
+        if max_points is not None and max_points < 1:
+            raise ValueError("max_points must be positive")
+
+        headers, cached = conditional(request, data_version(), scheduler.current_slot(), shared_max_age=300)
+        if cached is not None:
+            return cached
+        response.headers.update(headers)
+
         db = get_db()
         cursor = db.cursor()
 
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT area, target_type, forecast_timestamp, predicted_value, actual_value, created_at
             FROM predictions
             WHERE area = ?
-            AND created_at >= datetime('now', '-' || ? || ' days')
+            AND created_at >= CAST(strftime('%s', 'now') AS INTEGER) - ? * 86400
             ORDER BY forecast_timestamp DESC
-            LIMIT 1000
+            {'' if max_points is not None else 'LIMIT 1000'}
         """, (area, days))
 
         rows = cursor.fetchall()
         db.close()
 
+        if max_points is not None:
+            sampled = []
+            for target_type in ('generation', 'price'):
+                ascending = [row for row in reversed(rows) if row['target_type'] == target_type]
+                sampled += downsample_rows(ascending, 'forecast_timestamp', 'predicted_value', max_points)
+            rows = sorted(sampled, key=lambda row: row['forecast_timestamp'], reverse=True)
+
         history = []
         for row in rows:
             history.append({
                 "area": row['area'],
                 "target_type": row['target_type'],
-                "forecast_timestamp": row['forecast_timestamp'],
+                "forecast_timestamp": format_timestamp(row['forecast_timestamp']),
                 "predicted_value": row['predicted_value'],
                 "actual_value": row['actual_value'],
-                "created_at": row['created_at']
+                "created_at": format_utc_timestamp(row['created_at'])
             })
 
         return {
@@ -159,6 +365,9 @@ async def get_prediction_history(area: str = "tokyo", days: int = 7):
             "history": history
         }
 
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get prediction history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,149 @@
+"""
+予測の更新のServer-Sent Events配信
+
+スケジューラーが新しい予測を公開するたびに、イベントを1回だけシリアライズして
+購読中の全クライアントのキューに入れます。キューは SUBSCRIBER_QUEUE_SIZE 件までで、
+溢れたクライアント（受信が追いつかない接続）は切断します。EventSource は自動で
+再接続し、接続時に最新の予測を受け取るため、切断されても取りこぼしはありません。
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from .predictor import to_columnar
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# クライアントごとに溜められるイベント数
+SUBSCRIBER_QUEUE_SIZE = 8
+
+# 接続を維持するためのコメントを送る間隔（秒）
+HEARTBEAT_SECONDS = 15
+
+# 切断後の再接続までの待ち時間（ミリ秒、EventSource に伝える）
+RETRY_MILLISECONDS = 3000
+
+# キューに入れる終了の合図
+_CLOSE = None
+
+
+def format_event(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    """
+    SSEのイベントに整形
+
+    Args:
+        event: イベント名
+        data: 1行のJSON
+        event_id: イベントID（再接続時に Last-Event-ID として返ってくる）
+
+    Returns:
+        イベントのバイト列
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}".encode('utf-8'))
+    lines.append(f"event: {event}".encode('utf-8'))
+    lines.append(b"data: " + data)
+    return b"\n".join(lines) + b"\n\n"
+
+
+class Subscription:
+    """1つの接続の購読"""
+
+    def __init__(self, area: str):
+        self.area = area
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+
+    async def events(self):
+        """
+        イベントのバイト列を順に返す（HEARTBEAT_SECONDS ごとにコメントを挟む）
+
+        切断された（または受信が遅れて購読を外された）ところで終わる。
+        """
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode('utf-8')
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is _CLOSE:
+                return
+            yield event
+
+
+class ForecastBroadcaster:
+    """予測の更新をエリアごとの購読者に配信"""
+
+    def __init__(self):
+        self._subscribers = set()
+        # エリアごとの最新のイベント（イベントID, バイト列）
+        self._latest = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, area: str, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        購読を開始
+
+        最新のイベントがあり、クライアントが受け取り済みでなければすぐにキューに入れる。
+
+        Args:
+            area: エリア名
+            last_event_id: クライアントが最後に受け取ったイベントID（Last-Event-ID ヘッダー）
+
+        Returns:
+            Subscription
+        """
+        subscription = Subscription(area)
+        latest = self._latest.get(area)
+        if latest is not None and latest[0] != last_event_id:
+            subscription.queue.put_nowait(latest[1])
+        self._subscribers.add(subscription)
+        logger.info(f"Forecast stream subscribed for {area} ({self.subscriber_count} subscribers)")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """購読を終了"""
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            logger.info(f"Forecast stream unsubscribed for {subscription.area} "
+                        f"({self.subscriber_count} subscribers)")
+
+    def publish(self, area: str, forecast: dict):
+        """
+        新しい予測をエリアの購読者に配信
+
+        Args:
+            area: エリア名
+            forecast: 予測（"generated_at" を含む）
+        """
+        event_id = forecast["generated_at"]
+        event = format_event("forecast", dumps(to_columnar(area, forecast)), event_id)
+        self._latest[area] = (event_id, event)
+
+        for subscription in list(self._subscribers):
+            if subscription.area != area:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription):
+        """受信が追いつかない購読を外し、溜まったイベントを捨てて接続を終わらせる"""
+        self.unsubscribe(subscription)
+        subscription.dropped = True
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(_CLOSE)
+        logger.warning(f"Dropped slow forecast stream subscriber for {subscription.area}")
+
+
+# プロセス内で共有する配信先
+forecast_broadcaster = ForecastBroadcaster()
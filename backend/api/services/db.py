@@ -1,25 +1,76 @@
 import sqlite3
 import shutil
+import os
+import calendar
+from datetime import datetime, timedelta
 from pathlib import Path
 import logging
+import numpy as np
+import pandas as pd
+
+from .migrations import apply_migrations, create_schema
+from .metrics import timed_function
+from . import query_log
 
 logger = logging.getLogger(__name__)
 
+# 主なDB呼び出しの所要時間は metrics に "db.<関数名>" の段階として記録する
+
 DB_PATH = "/tmp/elect.db"
-SCHEMA_PATH = Path(__file__).parent.parent.parent / "db" / "schema.sql"
+# シードデータを取り込み済みのスナップショット（scripts/build_seed_db.py で作成）
+SEED_DB_PATH = Path(__file__).parent.parent.parent / "db" / "seed.db"
+
+# 実績・予測の時刻は日本時間として扱い、UNIX秒で保存する
+JST_OFFSET_SECONDS = 9 * 3600
+
+# ロールアップの解像度（秒）。元データは30分単位
+RAW_INTERVAL_SECONDS = 1800
+HOURLY_SECONDS = 3600
+DAILY_SECONDS = 86400
+
+# 集計系列で返す点数の目安
+DEFAULT_MAX_POINTS = 500
+
+# 予測誤差は絶対パーセント誤差（MAPEと同じ定義、実績が0の時刻は除く）
+_ERROR_EXPR = "ABS(actual_value - predicted_value) * 100.0 / ABS(actual_value)"
+_ERROR_CONDITION = "AND target_type = '{}' AND actual_value IS NOT NULL AND actual_value != 0"
+
+# ロールアップする指標: (元テーブル, 時刻の列, 値の式, 追加の条件)
+ROLLUP_METRICS = {
+    'pv_mw': ('generation_actual', 'timestamp', 'pv_mw', ''),
+    'wind_mw': ('generation_actual', 'timestamp', 'wind_mw', ''),
+    'total_mw': ('generation_actual', 'timestamp', 'total_mw', ''),
+    'price_yen': ('price_actual', 'timestamp', 'price_yen', ''),
+    'generation_error': ('predictions', 'forecast_timestamp', _ERROR_EXPR, _ERROR_CONDITION.format('generation')),
+    'price_error': ('predictions', 'forecast_timestamp', _ERROR_EXPR, _ERROR_CONDITION.format('price'))
+}
+
+GENERATION_METRICS = ['pv_mw', 'wind_mw', 'total_mw']
+PRICE_METRICS = ['price_yen']
+
+# 実績のソースごとの (テーブル, timestamp以外の列)
+ACTUAL_SOURCES = {
+    'generation': ('generation_actual', GENERATION_METRICS),
+    'price': ('price_actual', PRICE_METRICS)
+}
+
 
 def init_database():
-    """起動時にDBを初期化"""
+    """起動時にDBを初期化（未適用のマイグレーションを適用）"""
     db_file = Path(DB_PATH)
 
     if not db_file.exists():
+        # シードスナップショットがあればコピーするだけで済ませる
+        if restore_seed_snapshot():
+            _migrate()
+            return
+
         logger.info("Initializing database at /tmp/elect.db")
 
-        # スキーマから作成
+        # 最新のスキーマから作成
         conn = sqlite3.connect(DB_PATH)
         try:
-            with open(SCHEMA_PATH) as f:
-                conn.executescript(f.read())
+            create_schema(conn)
             logger.info("Database schema created successfully")
         except Exception as e:
             logger.error(f"Failed to create database: {e}")
@@ -29,88 +80,344 @@ def init_database():
     else:
         logger.info("Database already exists at /tmp/elect.db")
 
-def get_db():
-    """DB接続取得"""
+        if _migrate():
+            restore_seed_snapshot()
+            _migrate()
+
+
+def _migrate() -> bool:
+    """
+    DB_PATH のDBにマイグレーションを適用し、シードスナップショットのデータを反映
+
+    Returns:
+        シードスナップショットで置き換えるべき（DBが空）ならTrue
+    """
     conn = sqlite3.connect(DB_PATH)
+    try:
+        apply_migrations(conn)
+        return _apply_seed(conn)
+    except Exception as e:
+        logger.error(f"Failed to migrate database: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+def _open_seed():
+    """シードスナップショットを読み取り専用で開く"""
+    return sqlite3.connect(f"file:{SEED_DB_PATH}?mode=ro&immutable=1", uri=True)
+
+
+def _read_seed_meta() -> dict:
+    """シードスナップショットのメタ情報を読み取り専用で取得（なければ空）"""
+    if not SEED_DB_PATH.exists():
+        return {}
+
+    conn = _open_seed()
+    try:
+        return dict(conn.execute("SELECT key, value FROM db_meta").fetchall())
+    finally:
+        conn.close()
+
+
+def _is_empty(conn) -> bool:
+    """実績・予測のどのテーブルにも行がないか"""
+    return conn.execute("""
+        SELECT NOT EXISTS (SELECT 1 FROM generation_actual)
+           AND NOT EXISTS (SELECT 1 FROM price_actual)
+           AND NOT EXISTS (SELECT 1 FROM predictions)
+    """).fetchone()[0] == 1
+
+
+def _apply_seed(conn) -> bool:
+    """
+    シードスナップショットのデータを既存のDBに反映
+
+    バージョンが同じなら何もしない。DBが空ならスナップショットで置き換える（Trueを返す）。
+    そうでなければスナップショットの実績のうち既存DBにない時刻の行だけを追加し、
+    追加した範囲のロールアップを集計し直す。既存の実績（アップロード・インポートされたデータ）、
+    予測、事前計算した予測、スナップショットにないエリアはそのまま残す。
+
+    Returns:
+        シードスナップショットで置き換えるべきならTrue
+    """
+    seed_meta = _read_seed_meta()
+    if not seed_meta:
+        return False
+
+    row = conn.execute("SELECT value FROM db_meta WHERE key = 'seed_version'").fetchone()
+    if row is not None and row[0] == seed_meta['seed_version']:
+        return False
+
+    if _is_empty(conn):
+        return True
+
+    seed = _open_seed()
+    try:
+        with conn:
+            for source, (table, columns) in ACTUAL_SOURCES.items():
+                column_list = ", ".join(['area', 'timestamp'] + columns)
+                rows = seed.execute(f"SELECT {column_list} FROM {table}").fetchall()
+                if not rows:
+                    continue
+
+                placeholders = ", ".join("?" * (len(columns) + 2))
+                conn.executemany(f"INSERT OR IGNORE INTO {table} ({column_list}) VALUES ({placeholders})", rows)
+
+                for area, start, end in seed.execute(
+                    f"SELECT area, MIN(timestamp), MAX(timestamp) FROM {table} GROUP BY area"
+                ).fetchall():
+                    refresh_rollups(conn, columns, area, start, end)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO db_meta (key, value) VALUES ('seed_version', ?)",
+                (seed_meta['seed_version'],)
+            )
+    finally:
+        seed.close()
+
+    logger.info(f"Merged seed snapshot into {DB_PATH} (version {seed_meta['seed_version']})")
+    return False
+
+
+def restore_seed_snapshot() -> bool:
+    """
+    シードスナップショットを DB_PATH にコピー（DBがない・空の場合のみ使う）
+
+    一時ファイルにコピーしてから置き換えるため、途中の状態のDBは見えない。
+
+    Returns:
+        コピーしたらTrue（スナップショットがなければFalse）
+    """
+    if not SEED_DB_PATH.exists():
+        return False
+
+    tmp_path = DB_PATH + ".tmp"
+    shutil.copyfile(SEED_DB_PATH, tmp_path)
+    os.replace(tmp_path, DB_PATH)
+
+    logger.info(f"Restored seed snapshot to {DB_PATH} (version {_read_seed_meta().get('seed_version')})")
+    return True
+
+
+def data_version() -> str:
+    """
+    DBの内容のバージョン
+
+    DBファイルの更新時刻とサイズで、どの接続・プロセスから書き込んでも変わる。
+    DBを開かずに求められるため、条件付きGETのETagに使う。
+
+    Returns:
+        バージョン文字列（DBがなければ "0"）
+    """
+    try:
+        stat = os.stat(DB_PATH)
+    except FileNotFoundError:
+        return "0"
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def get_db():
+    """DB接続取得（文ごとの実行時間は query_log に集計される）"""
+    conn = query_log.connect(DB_PATH)
     conn.row_factory = sqlite3.Row  # 辞書形式でアクセス可能に
     return conn
 
 
+def get_readonly_db():
+    """
+    読み取り専用のDB接続取得（エクスポート用）
+
+    行はタプルで返す。StreamingResponse がスレッドプールの別スレッドから
+    順に読むため、スレッドをまたいで使えるようにする（同時に使わないこと）。
+    """
+    return query_log.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+
+
+# 時刻の変換
+
+def to_epoch(value) -> int:
+    """
+    日時をUNIX秒に変換
+
+    Args:
+        value: 日時（文字列・datetime・pandas.Timestamp）。タイムゾーンがなければ日本時間として扱う
+
+    Returns:
+        UNIX秒
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        return int(value.timestamp())
+    return calendar.timegm(value.timetuple()) - JST_OFFSET_SECONDS
+
+
+def series_to_epoch(timestamps) -> np.ndarray:
+    """
+    日時の列（pandas.Series、タイムゾーンなし・日本時間）をまとめてUNIX秒に変換
+
+    Args:
+        timestamps: datetime64 の Series
+
+    Returns:
+        UNIX秒の int64 配列
+    """
+    return timestamps.to_numpy().astype('datetime64[s]').astype(np.int64) - JST_OFFSET_SECONDS
+
+
+def from_epoch(epoch: int) -> datetime:
+    """
+    UNIX秒を日本時間の datetime（タイムゾーンなし）に変換
+
+    Args:
+        epoch: UNIX秒
+
+    Returns:
+        datetime
+    """
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch + JST_OFFSET_SECONDS)
+
+
+def format_timestamp(epoch):
+    """
+    UNIX秒を日本時間の 'YYYY-MM-DD HH:MM:SS' 文字列に変換
+
+    Args:
+        epoch: UNIX秒（Noneの場合はNoneを返す）
+
+    Returns:
+        日時文字列
+    """
+    if epoch is None:
+        return None
+    return from_epoch(epoch).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def format_utc_timestamp(epoch):
+    """
+    UNIX秒をUTCの 'YYYY-MM-DD HH:MM:SS' 文字列に変換（created_at 用）
+
+    Args:
+        epoch: UNIX秒（Noneの場合はNoneを返す）
+
+    Returns:
+        日時文字列
+    """
+    if epoch is None:
+        return None
+    return (datetime(1970, 1, 1) + timedelta(seconds=epoch)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def format_timestamps(epochs) -> list:
+    """
+    UNIX秒の配列をまとめて日本時間の 'YYYY-MM-DD HH:MM:SS' 文字列のリストに変換
+
+    Args:
+        epochs: UNIX秒の配列
+
+    Returns:
+        日時文字列のリスト
+    """
+    if len(epochs) == 0:
+        return []
+    local = (np.asarray(epochs, dtype=np.int64) + JST_OFFSET_SECONDS).astype('datetime64[s]')
+    return np.char.replace(np.datetime_as_string(local), 'T', ' ').tolist()
+
+
 # CRUD操作
 
+def _float_column(df, *names):
+    """最初に見つかった列を float で取得（どれもなければ0）"""
+    for name in names:
+        if name in df.columns:
+            return df[name].astype(float)
+    return pd.Series(0.0, index=df.index)
+
+
+@timed_function("db.clear_generation_data")
 def clear_generation_data(conn, area: str = "tokyo"):
     """発電量データを削除"""
     cursor = conn.cursor()
     cursor.execute("DELETE FROM generation_actual WHERE area = ?", (area,))
+    _clear_rollups(conn, GENERATION_METRICS, area)
     conn.commit()
     logger.info(f"Cleared generation data for area: {area}")
 
 
+@timed_function("db.save_generation_data")
 def save_generation_data(conn, df, area: str = "tokyo"):
-    """発電量データをDBに保存（東京電力形式対応）"""
-    cursor = conn.cursor()
-
-    for _, row in df.iterrows():
-        # pandasのTimestamp型を文字列に変換
-        timestamp_str = row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-
-        # 東京電力形式の場合
-        if '太陽光発電実績' in row:
-            pv_mw = row.get('太陽光発電実績', 0)
-            wind_mw = row.get('風力発電実績', 0)
-            total_mw = pv_mw + wind_mw
+    """発電量データをDBに保存（東京電力形式対応、同じ時刻は上書き）"""
+    # 東京電力形式の場合
+    if '太陽光発電実績' in df.columns:
+        pv_mw = _float_column(df, '太陽光発電実績')
+        wind_mw = _float_column(df, '風力発電実績')
+        total_mw = pv_mw + wind_mw
+    else:
+        # 旧形式の場合
+        pv_mw = _float_column(df, 'pv_mw')
+        wind_mw = _float_column(df, 'wind_mw')
+        if 'total_mw' in df.columns or 'renewable_total_mw' in df.columns:
+            total_mw = _float_column(df, 'total_mw', 'renewable_total_mw')
         else:
-            # 旧形式の場合
-            pv_mw = row.get('pv_mw', 0)
-            wind_mw = row.get('wind_mw', 0)
-            total_mw = row.get('total_mw', row.get('renewable_total_mw', pv_mw + wind_mw))
+            total_mw = pv_mw + wind_mw
 
-        cursor.execute("""
-            INSERT INTO generation_actual (area, timestamp, pv_mw, wind_mw, total_mw)
+    timestamps = series_to_epoch(df['timestamp'])
+    rows = zip(
+        [area] * len(df),
+        timestamps.tolist(),
+        pv_mw.tolist(),
+        wind_mw.tolist(),
+        total_mw.tolist()
+    )
+
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO generation_actual (area, timestamp, pv_mw, wind_mw, total_mw)
             VALUES (?, ?, ?, ?, ?)
-        """, (
-            area,
-            timestamp_str,
-            pv_mw,
-            wind_mw,
-            total_mw
-        ))
+        """, rows)
+        if len(timestamps):
+            refresh_rollups(conn, GENERATION_METRICS, area, int(timestamps.min()), int(timestamps.max()))
 
-    conn.commit()
     logger.info(f"Saved {len(df)} generation records for area: {area}")
 
 
+@timed_function("db.clear_price_data")
 def clear_price_data(conn, area: str = "tokyo"):
     """価格データを削除"""
     cursor = conn.cursor()
     cursor.execute("DELETE FROM price_actual WHERE area = ?", (area,))
+    _clear_rollups(conn, PRICE_METRICS, area)
     conn.commit()
     logger.info(f"Cleared price data for area: {area}")
 
 
+@timed_function("db.save_price_data")
 def save_price_data(conn, df, area: str = "tokyo"):
-    """価格データをDBに保存"""
-    cursor = conn.cursor()
-
-    for _, row in df.iterrows():
-        # pandasのTimestamp型を文字列に変換
-        timestamp_str = row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-
-        cursor.execute("""
-            INSERT INTO price_actual (area, timestamp, price_yen)
+    """価格データをDBに保存（同じ時刻は上書き）"""
+    prices = _float_column(df, 'price_yen')
+    timestamps = series_to_epoch(df['timestamp'])
+
+    rows = zip(
+        [area] * len(df),
+        timestamps.tolist(),
+        prices.tolist()
+    )
+
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO price_actual (area, timestamp, price_yen)
             VALUES (?, ?, ?)
-        """, (
-            area,
-            timestamp_str,
-            row.get('price_yen', 0)
-        ))
+        """, rows)
+        if len(timestamps):
+            refresh_rollups(conn, PRICE_METRICS, area, int(timestamps.min()), int(timestamps.max()))
 
-    conn.commit()
     logger.info(f"Saved {len(df)} price records for area: {area}")
 
 
+@timed_function("db.get_generation_data")
 def get_generation_data(conn, area: str = "tokyo", limit: int = 1000):
-    """発電量データを取得"""
+    """発電量データを取得（新しい順、timestamp はUNIX秒）"""
     cursor = conn.cursor()
     cursor.execute("""
         SELECT area, timestamp, pv_mw, wind_mw, total_mw,
@@ -126,8 +433,9 @@ def get_generation_data(conn, area: str = "tokyo", limit: int = 1000):
     return cursor.fetchall()
 
 
+@timed_function("db.get_price_data")
 def get_price_data(conn, area: str = "tokyo", limit: int = 1000):
-    """価格データを取得"""
+    """価格データを取得（新しい順、timestamp はUNIX秒）"""
     cursor = conn.cursor()
     cursor.execute("""
         SELECT area, timestamp, price_yen
@@ -140,49 +448,127 @@ def get_price_data(conn, area: str = "tokyo", limit: int = 1000):
     return cursor.fetchall()
 
 
+@timed_function("db.get_actuals_range")
+def get_actuals_range(conn, source: str, area: str, start: int, end: int) -> dict:
+    """
+    期間内の実績を列ごとの配列で取得
+
+    (area, timestamp) の主キーでクラスタ化したテーブルを範囲検索するため、
+    テーブル本体のB-treeだけを連続して読む（別のインデックスや行の参照は発生しない）。
+
+    Args:
+        conn: DB接続
+        source: 'generation' または 'price'
+        area: エリア名
+        start: 期間の開始（UNIX秒、含む）
+        end: 期間の終了（UNIX秒、含まない）
+
+    Returns:
+        {'timestamp': UNIX秒の int64 配列, 列名: float64 配列（NULLはNaN）}
+    """
+    table, columns = ACTUAL_SOURCES[source]
+
+    # 行ごとの sqlite3.Row を作らずにタプルで受け取る
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(f"""
+        SELECT timestamp, {', '.join(columns)}
+        FROM {table}
+        WHERE area = ? AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp
+    """, (area, start, end)).fetchall()
+
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns) + 1)
+    result = {'timestamp': values[:, 0].astype(np.int64)}
+    for i, col in enumerate(columns, 1):
+        result[col] = values[:, i]
+    return result
+
+
+def align_actuals(generation: dict, price: dict) -> dict:
+    """
+    発電量と価格の配列を timestamp で揃える（どちらかにある時刻をすべて含み、ない値はNaN）
+
+    Args:
+        generation: get_actuals_range(conn, 'generation', ...) の戻り値
+        price: get_actuals_range(conn, 'price', ...) の戻り値
+
+    Returns:
+        {'timestamp': 配列, 発電量と価格の各列: 配列}
+    """
+    timestamps = np.union1d(generation['timestamp'], price['timestamp'])
+    result = {'timestamp': timestamps}
+
+    for data in (generation, price):
+        # 各時刻がこのソースにあるかを二分探索で調べる
+        positions = np.searchsorted(data['timestamp'], timestamps)
+        found = positions < len(data['timestamp'])
+        found[found] = data['timestamp'][positions[found]] == timestamps[found]
+
+        for col, values in data.items():
+            if col == 'timestamp':
+                continue
+            aligned = np.full(len(timestamps), np.nan)
+            aligned[found] = values[positions[found]]
+            result[col] = aligned
+
+    return result
+
+
+@timed_function("db.clear_predictions")
 def clear_predictions(conn, area: str = "tokyo", target_type: str = None):
     """予測データを削除"""
     cursor = conn.cursor()
     if target_type:
         cursor.execute("DELETE FROM predictions WHERE area = ? AND target_type = ?", (area, target_type))
+        _clear_rollups(conn, [f"{target_type}_error"], area)
         logger.info(f"Cleared {target_type} predictions for area: {area}")
     else:
         cursor.execute("DELETE FROM predictions WHERE area = ?", (area,))
+        _clear_rollups(conn, ['generation_error', 'price_error'], area)
         logger.info(f"Cleared all predictions for area: {area}")
     conn.commit()
 
 
+@timed_function("db.save_predictions")
 def save_predictions(conn, area: str, target_type: str, predictions: list):
     """予測結果を保存"""
-    cursor = conn.cursor()
-
-    for pred in predictions:
-        # actual_value がある場合は一緒に保存
-        actual_value = pred.get('actual', None)
-
-        cursor.execute("""
-            INSERT INTO predictions (area, target_type, forecast_timestamp, predicted_value, actual_value)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
+    rows = [
+        (
             area,
             target_type,
-            pred['timestamp'],
+            to_epoch(pred['timestamp']),
             pred['value'],
-            actual_value
-        ))
+            # actual_value がある場合は一緒に保存
+            pred.get('actual', None)
+        )
+        for pred in predictions
+    ]
+
+    with conn:
+        conn.executemany("""
+            INSERT INTO predictions (area, target_type, forecast_timestamp, predicted_value, actual_value)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+
+        # 実績がある予測だけ誤差のロールアップに反映
+        with_actual = [row[2] for row in rows if row[4] is not None]
+        metric = f"{target_type}_error"
+        if with_actual and metric in ROLLUP_METRICS:
+            refresh_rollups(conn, [metric], area, min(with_actual), max(with_actual))
 
-    conn.commit()
     logger.info(f"Saved {len(predictions)} {target_type} predictions for area: {area}")
 
 
+@timed_function("db.get_predictions")
 def get_predictions(conn, area: str = "tokyo", days: int = 7):
-    """予測データを取得"""
+    """予測データを取得（時刻はUNIX秒）"""
     cursor = conn.cursor()
     cursor.execute("""
         SELECT area, target_type, forecast_timestamp, predicted_value, actual_value, created_at
         FROM predictions
         WHERE area = ?
-        AND created_at >= datetime('now', '-' || ? || ' days')
+        AND created_at >= CAST(strftime('%s', 'now') AS INTEGER) - ? * 86400
         ORDER BY forecast_timestamp DESC
     """, (area, days))
 
@@ -191,35 +577,364 @@ def get_predictions(conn, area: str = "tokyo", days: int = 7):
 
 def calculate_mape(conn, target_type: str, area: str = "tokyo", days: int = 7):
     """MAPE（平均絶対パーセント誤差）を計算"""
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT predicted_value, actual_value
-        FROM predictions
-        WHERE area = ?
-        AND target_type = ?
-        AND actual_value IS NOT NULL
-        AND created_at >= datetime('now', '-' || ? || ' days')
-    """, (area, target_type, days))
+    return calculate_mapes(conn, area, days)[target_type]
 
-    rows = cursor.fetchall()
 
-    if not rows:
-        return None
+@timed_function("db.calculate_mapes")
+def calculate_mapes(conn, area: str = "tokyo", days: int = 7) -> dict:
+    """
+    発電量・価格のMAPE（平均絶対パーセント誤差）を1回のスキャンで計算
 
-    total_error = 0
-    count = 0
+    実績が入っていない予測と実績が0の予測は除く。
 
-    for row in rows:
-        predicted = row['predicted_value']
-        actual = row['actual_value']
+    Args:
+        conn: DB接続
+        area: エリア名
+        days: 過去何日分（予測の登録時刻で絞る）
 
-        if actual != 0:
-            error = abs((actual - predicted) / actual)
-            total_error += error
-            count += 1
+    Returns:
+        {"generation": MAPE, "price": MAPE}（対象がなければNone、小数点以下2桁）
+    """
+    cursor = conn.execute("""
+        SELECT target_type, AVG(ABS((actual_value - predicted_value) / actual_value)) * 100
+        FROM predictions
+        WHERE area = ?
+        AND actual_value IS NOT NULL
+        AND actual_value != 0
+        AND created_at >= CAST(strftime('%s', 'now') AS INTEGER) - ? * 86400
+        GROUP BY target_type
+    """, (area, days))
 
-    if count == 0:
+    mapes = {"generation": None, "price": None}
+    for target_type, mape in cursor.fetchall():
+        mapes[target_type] = round(mape, 2)
+    return mapes
+
+
+@timed_function("db.get_actuals_status")
+def get_actuals_status(conn) -> dict:
+    """
+    実績データの件数と最新時刻を1つのクエリで取得
+
+    Args:
+        conn: DB接続
+
+    Returns:
+        {"generation": {"count", "latest_timestamp"}, "price": {...}}
+    """
+    row = conn.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM generation_actual),
+            (SELECT MAX(timestamp) FROM generation_actual),
+            (SELECT COUNT(*) FROM price_actual),
+            (SELECT MAX(timestamp) FROM price_actual)
+    """).fetchone()
+
+    return {
+        "generation": {
+            "count": row[0],
+            "latest_timestamp": format_timestamp(row[1])
+        },
+        "price": {
+            "count": row[2],
+            "latest_timestamp": format_timestamp(row[3])
+        }
+    }
+
+
+# ロールアップ
+#
+# 長期間のグラフ用に、指標ごとに1時間・1日単位の件数・合計・最小・最大を rollups に保持する。
+# 保存のたびに保存した期間に含まれるバケットだけを元データから集計し直すため、
+# INSERT OR REPLACE で既存の値が変わっても整合性が保たれる。
+
+def _bucket_sql(column: str, resolution: int) -> str:
+    """時刻の列をバケットの開始時刻に切り捨てるSQL式（1日は日本時間の0時で区切る）"""
+    return f"(({column} + {JST_OFFSET_SECONDS}) / {resolution} * {resolution} - {JST_OFFSET_SECONDS})"
+
+
+def bucket_start(epoch: int, resolution: int) -> int:
+    """
+    UNIX秒をバケットの開始時刻に切り捨て
+
+    Args:
+        epoch: UNIX秒
+        resolution: バケット幅（秒）
+
+    Returns:
+        バケットの開始時刻（UNIX秒）
+    """
+    return (epoch + JST_OFFSET_SECONDS) // resolution * resolution - JST_OFFSET_SECONDS
+
+
+@timed_function("db.refresh_rollups")
+def refresh_rollups(conn, metrics: list, area: str, start: int, end: int):
+    """
+    期間 [start, end] を含むバケットのロールアップを元データから集計し直す
+
+    呼び出し側のトランザクション内で実行する。1時間は元データから、1日は1時間から集計する。
+
+    Args:
+        conn: DB接続
+        metrics: ROLLUP_METRICS のキーのリスト
+        area: エリア名
+        start: 期間の開始（UNIX秒）
+        end: 期間の終了（UNIX秒、この時刻を含む）
+    """
+    hour_start = bucket_start(start, HOURLY_SECONDS)
+    hour_end = bucket_start(end, HOURLY_SECONDS) + HOURLY_SECONDS
+    day_start = bucket_start(start, DAILY_SECONDS)
+    day_end = bucket_start(end, DAILY_SECONDS) + DAILY_SECONDS
+
+    for metric in metrics:
+        table, ts_col, value_expr, condition = ROLLUP_METRICS[metric]
+
+        conn.execute("""
+            DELETE FROM rollups
+            WHERE metric = ? AND area = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+        """, (metric, area, HOURLY_SECONDS, hour_start, hour_end))
+        conn.execute(f"""
+            INSERT INTO rollups (metric, area, resolution, bucket, value_count, value_sum, value_min, value_max)
+            SELECT ?, ?, ?, {_bucket_sql(ts_col, HOURLY_SECONDS)} AS bucket, COUNT(v), SUM(v), MIN(v), MAX(v)
+            FROM (
+                SELECT {ts_col}, {value_expr} AS v FROM {table}
+                WHERE area = ? AND {ts_col} >= ? AND {ts_col} < ? {condition}
+            )
+            WHERE v IS NOT NULL
+            GROUP BY bucket
+        """, (metric, area, HOURLY_SECONDS, area, hour_start, hour_end))
+
+        conn.execute("""
+            DELETE FROM rollups
+            WHERE metric = ? AND area = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+        """, (metric, area, DAILY_SECONDS, day_start, day_end))
+        conn.execute(f"""
+            INSERT INTO rollups (metric, area, resolution, bucket, value_count, value_sum, value_min, value_max)
+            SELECT metric, area, ?, {_bucket_sql('bucket', DAILY_SECONDS)} AS day,
+                   SUM(value_count), SUM(value_sum), MIN(value_min), MAX(value_max)
+            FROM rollups
+            WHERE metric = ? AND area = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+            GROUP BY day
+        """, (DAILY_SECONDS, metric, area, HOURLY_SECONDS, day_start, day_end))
+
+
+def _clear_rollups(conn, metrics: list, area: str):
+    """指定した指標・エリアのロールアップを削除"""
+    conn.executemany(
+        "DELETE FROM rollups WHERE metric = ? AND area = ?",
+        [(metric, area) for metric in metrics]
+    )
+
+
+def select_resolution(span: int, max_points: int = DEFAULT_MAX_POINTS) -> int:
+    """
+    期間の長さから点数が max_points 以下になる最も細かい解像度を選ぶ
+
+    Args:
+        span: 期間の長さ（秒）
+        max_points: 返す点数の上限の目安
+
+    Returns:
+        解像度（秒）。どの解像度でも超える場合は1日
+    """
+    for resolution in (RAW_INTERVAL_SECONDS, HOURLY_SECONDS, DAILY_SECONDS):
+        if span / resolution <= max_points:
+            return resolution
+    return DAILY_SECONDS
+
+
+@timed_function("db.get_rollup_series")
+def get_rollup_series(conn, metric: str, area: str, start: int, end: int,
+                      max_points: int = DEFAULT_MAX_POINTS):
+    """
+    期間に応じた解像度で指標の集計系列を取得
+
+    30分単位で収まる期間は元データを、それ以上は rollups を読むため、
+    読む行数は返す点数に比例する。
+
+    Args:
+        conn: DB接続
+        metric: ROLLUP_METRICS のキー
+        area: エリア名
+        start: 期間の開始（UNIX秒、含む）
+        end: 期間の終了（UNIX秒、含まない）
+        max_points: 返す点数の上限の目安
+
+    Returns:
+        (解像度（秒）, 行のリスト)。各行は bucket, count, mean, min, max（bucket はUNIX秒）
+    """
+    if metric not in ROLLUP_METRICS:
+        raise ValueError(f"Unknown metric: {metric} (choose from {', '.join(ROLLUP_METRICS)})")
+
+    resolution = select_resolution(end - start, max_points)
+
+    if resolution == RAW_INTERVAL_SECONDS:
+        table, ts_col, value_expr, condition = ROLLUP_METRICS[metric]
+        rows = conn.execute(f"""
+            SELECT {ts_col} AS bucket, COUNT(v) AS count, AVG(v) AS mean, MIN(v) AS min, MAX(v) AS max
+            FROM (
+                SELECT {ts_col}, {value_expr} AS v FROM {table}
+                WHERE area = ? AND {ts_col} >= ? AND {ts_col} < ? {condition}
+            )
+            WHERE v IS NOT NULL
+            GROUP BY {ts_col}
+            ORDER BY {ts_col}
+        """, (area, start, end)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT bucket, value_count AS count, value_sum / value_count AS mean,
+                   value_min AS min, value_max AS max
+            FROM rollups
+            WHERE metric = ? AND area = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+            ORDER BY bucket
+        """, (metric, area, resolution, bucket_start(start, resolution), end)).fetchall()
+
+    return resolution, rows
+
+
+
+# 予測の事前計算
+#
+# forecast_runs の (area, slot) 行が各枠の実行権を兼ねる。INSERT OR IGNORE と
+# 条件付きUPDATEはそれぞれ1文で完結するため、複数のプロセスが同時に取りに来ても1つだけが成功する。
+
+# forecast_runs に残す期間（秒）
+FORECAST_RUN_RETENTION_SECONDS = 7 * 86400
+
+# predictions に残す期間（秒）。/history・/accuracy の days はこの範囲で指定する
+PREDICTION_RETENTION_SECONDS = 30 * 86400
+
+
+@timed_function("db.claim_forecast_run")
+def claim_forecast_run(conn, area: str, slot: int, lease_seconds: int) -> bool:
+    """
+    枠の予測の実行権を取得
+
+    未実行なら新しく取り、'running' のまま lease_until を過ぎた枠（実行中に止まったワーカーの枠）は引き継ぐ。
+
+    Args:
+        conn: DB接続
+        area: エリア名
+        slot: 30分枠の開始時刻（UNIX秒）
+        lease_seconds: 実行権の有効期間（秒）
+
+    Returns:
+        実行権を取れたらTrue（実行済み・他のワーカーが実行中ならFalse）
+    """
+    with conn:
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO forecast_runs (area, slot, status, lease_until)
+            VALUES (?, ?, 'running', CAST(strftime('%s', 'now') AS INTEGER) + ?)
+        """, (area, slot, lease_seconds))
+        if cursor.rowcount == 1:
+            return True
+
+        cursor = conn.execute("""
+            UPDATE forecast_runs SET lease_until = CAST(strftime('%s', 'now') AS INTEGER) + ?
+            WHERE area = ? AND slot = ? AND status = 'running'
+            AND lease_until < CAST(strftime('%s', 'now') AS INTEGER)
+        """, (lease_seconds, area, slot))
+        return cursor.rowcount == 1
+
+
+@timed_function("db.release_forecast_run")
+def release_forecast_run(conn, area: str, slot: int, status: str = 'running'):
+    """
+    枠の実行権を手放す（次の機会にいずれかのワーカーが実行できるようにする）
+
+    Args:
+        conn: DB接続
+        area: エリア名
+        slot: 30分枠の開始時刻（UNIX秒）
+        status: 'running'（失敗した実行）/ 'done'（新しいデータで計算し直す実行済みの枠）
+    """
+    with conn:
+        conn.execute(
+            "DELETE FROM forecast_runs WHERE area = ? AND slot = ? AND status = ?",
+            (area, slot, status)
+        )
+
+
+@timed_function("db.save_forecast_run")
+def save_forecast_run(conn, area: str, slot: int, forecast: dict):
+    """
+    枠の予測を predictions にまとめて保存し、スナップショットとして記録
+
+    Args:
+        conn: DB接続
+        area: エリア名
+        slot: 30分枠の開始時刻（UNIX秒）
+        forecast: Predictor.predict() の戻り値に "hours" と "generated_at" を加えた辞書
+    """
+    start = to_epoch(forecast['start'])
+    step = forecast['step_seconds']
+    generation = np.asarray(forecast['generation'], dtype=np.float32)
+    price = np.asarray(forecast['price'], dtype=np.float32)
+
+    rows = []
+    for target_type, values in (('generation', generation), ('price', price)):
+        timestamps = (start + np.arange(len(values), dtype=np.int64) * step).tolist()
+        rows += zip([area] * len(values), [target_type] * len(values), timestamps, values.tolist())
+
+    with conn:
+        conn.executemany("""
+            INSERT INTO predictions (area, target_type, forecast_timestamp, predicted_value)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+        conn.execute("""
+            UPDATE forecast_runs
+            SET status = 'done', hours = ?, start = ?, step_seconds = ?, generation = ?, price = ?,
+                stale_inputs = ?, weather_fetched_at = ?, generated_at = ?
+            WHERE area = ? AND slot = ?
+        """, (
+            forecast['hours'], start, step, generation.tobytes(), price.tobytes(),
+            int(forecast['weather']['stale']), forecast['weather']['fetched_at'], forecast['generated_at'],
+            area, slot
+        ))
+        conn.execute(
+            "DELETE FROM forecast_runs WHERE area = ? AND slot < ?",
+            (area, slot - FORECAST_RUN_RETENTION_SECONDS)
+        )
+        # 登録時刻が保持期間を過ぎた予測を消す（アップロード時の仮想予測は予測対象時刻が過去でも
+        # 登録時刻は新しいため、/history・/accuracy の対象のまま残る）
+        conn.execute(
+            "DELETE FROM predictions WHERE area = ? AND created_at < CAST(strftime('%s', 'now') AS INTEGER) - ?",
+            (area, PREDICTION_RETENTION_SECONDS)
+        )
+
+    logger.info(f"Saved forecast run for {area} (slot {format_timestamp(slot)}, {len(rows)} predictions)")
+
+
+@timed_function("db.get_latest_forecast_run")
+def get_latest_forecast_run(conn, area: str):
+    """
+    最新の実行済みの枠の予測を取得
+
+    Args:
+        conn: DB接続
+        area: エリア名
+
+    Returns:
+        save_forecast_run() に渡したのと同じ形の辞書に "slot" を加えたもの（なければNone）
+    """
+    row = conn.execute("""
+        SELECT slot, hours, start, step_seconds, generation, price, stale_inputs, weather_fetched_at, generated_at
+        FROM forecast_runs
+        WHERE area = ? AND status = 'done'
+        ORDER BY slot DESC
+        LIMIT 1
+    """, (area,)).fetchone()
+
+    if row is None:
         return None
 
-    mape = (total_error / count) * 100
-    return round(mape, 2)
+    return {
+        "slot": row[0],
+        "hours": row[1],
+        "start": from_epoch(row[2]),
+        "step_seconds": row[3],
+        "generation": np.frombuffer(row[4], dtype=np.float32),
+        "price": np.frombuffer(row[5], dtype=np.float32),
+        "weather": {"stale": bool(row[6]), "fetched_at": row[7]},
+        "generated_at": row[8]
+    }
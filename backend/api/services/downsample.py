@@ -0,0 +1,93 @@
+"""
+グラフ用の時系列の間引き（LTTB: Largest-Triangle-Three-Buckets）
+
+先頭・末尾の点を残し、間の点を max_points - 2 個のバケットに分けて、
+各バケットから「前に選んだ点・その点・次のバケットの平均」の三角形の面積が
+最大になる点を1つずつ選びます。ピークや谷が残るため、点数を固定しても
+グラフの形が崩れにくくなります。
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, max_points: int) -> np.ndarray:
+    """
+    LTTBで残す点のインデックスを計算
+
+    バケットの境界と平均は numpy でまとめて計算し、点の選択だけを
+    バケットごとに（前の選択結果を使うため順番に）行う。
+
+    Args:
+        x: 横軸の値（昇順、UNIX秒など）
+        y: 縦軸の値（NaNを含まないこと）
+        max_points: 残す点数（3未満なら先頭・末尾のみ）
+
+    Returns:
+        残す点のインデックス（昇順の int64 配列）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max(max_points, 1)], dtype=np.int64)
+
+    # UNIX秒のままだと面積の計算で桁落ちするため先頭を0にする
+    x = x - x[0]
+
+    # 先頭・末尾を除いた点を bucket_count 個のバケットに分ける（各バケットは1点以上）
+    bucket_count = max_points - 2
+    edges = (np.arange(bucket_count + 1) * ((n - 2) / bucket_count)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+
+    # 各バケットの平均（最後のバケットの「次」は末尾の点）
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    # バケットを行にした [y, x, 1] の3次元配列（足りない列はバケットの先頭の点で埋める）
+    width = int(counts.max())
+    columns = edges[:-1, None] + np.arange(width)
+    columns = np.where(columns < edges[1:, None], columns, edges[:-1, None])
+    points = np.stack([y[columns], x[columns], np.ones(columns.shape)], axis=2)
+
+    next_x, next_y = next_x.tolist(), next_y.tolist()
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(bucket_count):
+        # 三角形の面積の2倍（比較にしか使わないので1/2は省略）は y・x の1次式になる
+        xa, ya = float(x[a]), float(y[a])
+        coefficients = (xa - next_x[i], next_y[i] - ya, next_x[i] * ya - xa * next_y[i])
+        a = int(columns[i, np.abs(points[i] @ coefficients).argmax()])
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_rows(rows: list, x_key: str, y_key: str, max_points: int) -> list:
+    """
+    行のリストをLTTBで間引く
+
+    Args:
+        rows: 行（辞書や sqlite3.Row）のリスト（x_key の昇順）
+        x_key: 横軸の列名
+        y_key: 間引きの基準にする縦軸の列名（値がNoneの行は除く）
+        max_points: 残す点数
+
+    Returns:
+        間引いた行のリスト（元の順序）
+    """
+    rows = [row for row in rows if row[y_key] is not None]
+    if len(rows) <= max_points:
+        return rows
+
+    indices = lttb_indices([row[x_key] for row in rows], [row[y_key] for row in rows], max_points)
+    return [rows[i] for i in indices]
@@ -0,0 +1,187 @@
+"""
+実績・予測のArrow IPC / Parquet形式でのエクスポート
+
+SQLiteのカーソルから EXPORT_BATCH_ROWS 行ずつ読み、1バッチずつ
+Arrowのレコードバッチ（Parquetでは行グループ）に変換して書き出したバイト列を
+順に返します。全件をメモリに載せないため、期間が長くてもメモリ使用量は一定です。
+"""
+
+import logging
+from .db import get_readonly_db
+from .serialization import pa, require_arrow, ARROW_STREAM_MEDIA_TYPE
+
+logger = logging.getLogger(__name__)
+
+# 1バッチで読む行数
+EXPORT_BATCH_ROWS = 50000
+
+# 形式ごとの (メディアタイプ, 拡張子, 使える圧縮方式)
+EXPORT_FORMATS = {
+    'arrow': (ARROW_STREAM_MEDIA_TYPE, 'arrows', ('lz4', 'zstd')),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', ('snappy', 'gzip', 'zstd', 'lz4'))
+}
+
+# データセットごとの (テーブル, 期間で絞る時刻の列, [(列名, 型)])
+# 時刻の列はUNIX秒なので、Arrowでは日本時間のタイムスタンプ型にする
+EXPORT_DATASETS = {
+    'generation': ('generation_actual', 'timestamp', [
+        ('area', 'string'),
+        ('timestamp', 'timestamp'),
+        ('pv_mw', 'float64'),
+        ('wind_mw', 'float64'),
+        ('total_mw', 'float64'),
+        ('created_at', 'timestamp')
+    ]),
+    'price': ('price_actual', 'timestamp', [
+        ('area', 'string'),
+        ('timestamp', 'timestamp'),
+        ('price_yen', 'float64'),
+        ('created_at', 'timestamp')
+    ]),
+    'predictions': ('predictions', 'forecast_timestamp', [
+        ('id', 'int64'),
+        ('area', 'string'),
+        ('target_type', 'string'),
+        ('forecast_timestamp', 'timestamp'),
+        ('predicted_value', 'float64'),
+        ('actual_value', 'float64'),
+        ('created_at', 'timestamp')
+    ])
+}
+
+
+def _arrow_schema(columns: list):
+    """列の定義からArrowのスキーマを作成"""
+    types = {
+        'string': pa.string(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'timestamp': pa.timestamp('s', tz='Asia/Tokyo')
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in columns])
+
+
+class _ChunkSink:
+    """書き込まれたバイト列をためておき、take() で取り出す出力先（pyarrow用のファイル風オブジェクト）"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def validate_export(dataset: str, file_format: str, compression):
+    """
+    エクスポートの指定を検証
+
+    Args:
+        dataset: 'generation' / 'price' / 'predictions'
+        file_format: 'arrow' / 'parquet'
+        compression: 圧縮方式（Noneなら無圧縮）
+
+    Returns:
+        (メディアタイプ, 拡張子)
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"dataset must be one of {', '.join(EXPORT_DATASETS)}")
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+
+    media_type, extension, compressions = EXPORT_FORMATS[file_format]
+    if compression is not None and compression not in compressions:
+        raise ValueError(f"compression for {file_format} must be one of {', '.join(compressions)}")
+
+    require_arrow()
+    return media_type, extension
+
+
+def export_batches(dataset: str, start: int, end: int, area=None,
+                   file_format: str = 'arrow', compression=None):
+    """
+    期間内のデータをArrow IPCストリーム / Parquetのバイト列として少しずつ返す
+
+    クエリは最初のバッチを要求される前に実行する。接続は読み取り専用で、
+    StreamingResponse がスレッドプールの別スレッドから順に読むため
+    スレッドをまたいで使えるものを使う。
+
+    Args:
+        dataset: EXPORT_DATASETS のキー
+        start: 期間の開始（UNIX秒、含む）
+        end: 期間の終了（UNIX秒、含まない）
+        area: エリア名（Noneなら全エリア）
+        file_format: 'arrow' / 'parquet'
+        compression: 圧縮方式（Noneなら無圧縮）
+
+    Returns:
+        バイト列のジェネレーター
+    """
+    table, ts_col, columns = EXPORT_DATASETS[dataset]
+    schema = _arrow_schema(columns)
+
+    sql = f"SELECT {', '.join(name for name, _ in columns)} FROM {table} WHERE {ts_col} >= ? AND {ts_col} < ?"
+    params = [start, end]
+    if area is not None:
+        sql += " AND area = ?"
+        params.append(area)
+
+    conn = get_readonly_db()
+    cursor = conn.execute(sql, params)
+
+    def generate():
+        sink = _ChunkSink()
+        rows_written = 0
+        try:
+            if file_format == 'parquet':
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema,
+                                          compression=compression or 'none')
+            else:
+                options = pa.ipc.IpcWriteOptions(compression=compression)
+                writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema, options=options)
+
+            with writer:
+                while True:
+                    rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                    if not rows:
+                        break
+
+                    values = list(zip(*rows))
+                    batch = pa.RecordBatch.from_arrays(
+                        [pa.array(column, type=field.type) for column, field in zip(values, schema)],
+                        schema=schema
+                    )
+                    if file_format == 'parquet':
+                        writer.write_table(pa.Table.from_batches([batch]))
+                    else:
+                        writer.write_batch(batch)
+
+                    rows_written += len(rows)
+                    yield sink.take()
+
+            # スキーマ（0件の場合）やフッターの残り
+            yield sink.take()
+            logger.info(f"Exported {rows_written} {dataset} rows as {file_format}")
+        finally:
+            conn.close()
+
+    return generate()
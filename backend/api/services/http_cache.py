@@ -0,0 +1,104 @@
+"""
+条件付きGET（ETag / If-None-Match）とキャッシュヘッダー
+
+レスポンスの元になったデータのバージョン（db.data_version()、モデルのバージョン、
+気象予報の取得時刻など）とリクエストのパラメータからETagを作り、
+クライアントが同じETagを送ってきたら本文を作らずに 304 Not Modified を返します。
+Cache-Control はブラウザには毎回の再検証（max-age=0）を、Vercelのエッジキャッシュには
+短時間の共有キャッシュ（s-maxage）を指示します。
+"""
+
+import hashlib
+from fastapi import Request
+from fastapi.responses import Response
+from .metrics import record_cache
+
+# エッジキャッシュの保持時間（秒）
+DEFAULT_SHARED_MAX_AGE = 60
+
+# 保持時間を過ぎた後、再検証しながら古いレスポンスを返してよい時間（秒）
+STALE_WHILE_REVALIDATE = 60
+
+
+def make_etag(*parts) -> str:
+    """
+    ETagを作成
+
+    Args:
+        parts: レスポンスを決める値（文字列に変換して連結する）
+
+    Returns:
+        引用符付きのETag
+    """
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def cache_headers(etag: str, shared_max_age: int = DEFAULT_SHARED_MAX_AGE) -> dict:
+    """
+    ETag と Cache-Control のヘッダー
+
+    Args:
+        etag: make_etag() の戻り値
+        shared_max_age: エッジキャッシュの保持時間（秒）
+
+    Returns:
+        ヘッダーの辞書
+    """
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age=0, s-maxage={shared_max_age}, "
+                         f"stale-while-revalidate={STALE_WHILE_REVALIDATE}"
+    }
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    If-None-Match がETagと一致するか（弱いETag W/ も同じものとして比較）
+
+    Args:
+        request: リクエスト
+        etag: 現在のETag
+
+    Returns:
+        一致すればTrue
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    matched = header.strip() == "*"
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            matched = True
+
+    # クライアントがキャッシュを持っていたリクエストのうち 304 にできた割合
+    record_cache("conditional_get", matched)
+    return matched
+
+
+def not_modified(headers: dict) -> Response:
+    """304 Not Modified（本文なし、ETag と Cache-Control だけ返す）"""
+    return Response(status_code=304, headers=headers)
+
+
+def conditional(request: Request, *parts, shared_max_age: int = DEFAULT_SHARED_MAX_AGE):
+    """
+    ETagを作り、クライアントのキャッシュが有効なら 304 のレスポンスを返す
+
+    Args:
+        request: リクエスト
+        parts: make_etag() に渡す値（パスとクエリは自動で含める）
+        shared_max_age: エッジキャッシュの保持時間（秒）
+
+    Returns:
+        (ヘッダーの辞書, 304レスポンスまたはNone)
+    """
+    etag = make_etag(request.url.path, request.url.query, *parts)
+    headers = cache_headers(etag, shared_max_age)
+    if is_not_modified(request, etag):
+        return headers, not_modified(headers)
+    return headers, None
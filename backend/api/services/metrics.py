@@ -0,0 +1,245 @@
+"""
+処理段階ごとの所要時間・キャッシュのヒット率・モデルのロード時間のメトリクス
+
+プロセス内に集計し、/api/metrics からPrometheusのテキスト形式で読めます
+（外部のコレクターは不要）。所要時間は段階ごとに直近 WINDOW_SIZE 件を保持し、
+読み出し時に分位点（p50/p95/p99）を計算します。記録は deque への追加だけなので、
+リクエストの処理にはほとんど影響しません。
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 分位点の計算に使う直近のサンプル数（段階ごと）
+WINDOW_SIZE = 1024
+
+# 出力する分位点
+QUANTILES = (0.5, 0.95, 0.99)
+
+# メトリクス名の接頭辞
+METRIC_PREFIX = "elect"
+
+# charset はレスポンス側で付く
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4"
+
+
+class Summary:
+    """1つの段階の所要時間（直近のサンプルと累計の件数・合計）"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW_SIZE)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self) -> tuple:
+        """(直近のサンプルの配列, 件数, 合計)"""
+        with self._lock:
+            return np.fromiter(self.samples, dtype=np.float64, count=len(self.samples)), self.count, self.total
+
+
+# 段階名 → Summary
+_stages = {}
+# キャッシュ名 → [ヒット数, ミス数]
+_caches = {}
+# (メトリクス名, ラベルの組) → (説明, 値)
+_gauges = {}
+_lock = threading.Lock()
+
+# リクエスト単位の記録先（profiling から設定される [(段階名, 秒), ...]）
+_recorder = contextvars.ContextVar("metrics_recorder", default=None)
+# 記録中のリクエストの数（0 の間は observe() で ContextVar を読まない）
+_recording = 0
+
+
+def observe(stage: str, seconds: float):
+    """
+    段階の所要時間を記録
+
+    Args:
+        stage: 段階名（"predict.weather_fetch" など）
+        seconds: 所要時間（秒）
+    """
+    summary = _stages.get(stage)
+    if summary is None:
+        with _lock:
+            summary = _stages.setdefault(stage, Summary())
+    summary.observe(seconds)
+
+    if _recording:
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.append((stage, seconds))
+
+
+def start_recording(recorder: list):
+    """
+    現在のコンテキスト（リクエスト）で observe() した段階を recorder にも追加する
+
+    Args:
+        recorder: (段階名, 秒) を追加するリスト
+
+    Returns:
+        stop_recording() に渡すトークン
+    """
+    global _recording
+    with _lock:
+        _recording += 1
+    return _recorder.set(recorder)
+
+
+def stop_recording(token):
+    """start_recording() を解除"""
+    global _recording
+    _recorder.reset(token)
+    with _lock:
+        _recording -= 1
+
+
+class timed:
+    """with ブロックの所要時間を記録（例外で抜けた場合も記録する）"""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def timed_function(stage: str):
+    """関数（async 関数も可）の所要時間を記録するデコレーター"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(stage, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool):
+    """
+    キャッシュのヒット・ミスを記録
+
+    Args:
+        cache: キャッシュ名（"forecast_snapshot" など）
+        hit: ヒットしたか
+    """
+    with _lock:
+        counts = _caches.setdefault(cache, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+def set_gauge(name: str, value: float, description: str, **labels):
+    """
+    ゲージ（最新の値）を設定
+
+    Args:
+        name: メトリクス名（接頭辞なし）
+        value: 値
+        description: 説明（HELP行）
+        labels: ラベル
+    """
+    with _lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = (description, value)
+
+
+def reset():
+    """全メトリクスを消去（テスト・ベンチマーク用）"""
+    with _lock:
+        _stages.clear()
+        _caches.clear()
+        _gauges.clear()
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (
+        key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render() -> str:
+    """
+    Prometheusのテキスト形式で出力
+
+    Returns:
+        テキスト（PROMETHEUS_MEDIA_TYPE）
+    """
+    # 他のスレッドが段階を追加しても影響しないようにコピーしてから出力する
+    with _lock:
+        stages = sorted(_stages.items())
+        caches = sorted((cache, tuple(counts)) for cache, counts in _caches.items())
+        gauges = sorted(_gauges.items())
+
+    lines = []
+
+    name = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines.append(f"# HELP {name} Duration of each processing stage (quantiles over the last {WINDOW_SIZE} samples)")
+    lines.append(f"# TYPE {name} summary")
+    for stage, summary in stages:
+        samples, count, total = summary.snapshot()
+        if len(samples):
+            for quantile, value in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+                lines.append(f"{name}{_labels([('stage', stage), ('quantile', quantile)])} {value:.6g}")
+        lines.append(f"{name}_sum{_labels([('stage', stage)])} {total:.6g}")
+        lines.append(f"{name}_count{_labels([('stage', stage)])} {count}")
+
+    name = f"{METRIC_PREFIX}_cache_requests_total"
+    lines.append(f"# HELP {name} Cache lookups by result")
+    lines.append(f"# TYPE {name} counter")
+    for cache, (hits, misses) in caches:
+        lines.append(f"{name}{_labels([('cache', cache), ('result', 'hit')])} {hits}")
+        lines.append(f"{name}{_labels([('cache', cache), ('result', 'miss')])} {misses}")
+
+    name = f"{METRIC_PREFIX}_cache_hit_ratio"
+    lines.append(f"# HELP {name} Cache hit ratio since process start")
+    lines.append(f"# TYPE {name} gauge")
+    for cache, (hits, misses) in caches:
+        lines.append(f"{name}{_labels([('cache', cache)])} {hits / (hits + misses) if hits + misses else 0:.6g}")
+
+    described = set()
+    for (gauge, labels), (description, value) in gauges:
+        name = f"{METRIC_PREFIX}_{gauge}"
+        if name not in described:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            described.add(name)
+        lines.append(f"{name}{_labels(labels)} {value:.6g}")
+
+    return "\n".join(lines) + "\n"
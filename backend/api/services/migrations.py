@@ -0,0 +1,304 @@
+"""
+スキーママイグレーション
+
+db/migrations/ の NNNN_name.sql / NNNN_name.py を番号順に適用し、
+適用済みのバージョンを schema_version テーブルに記録します。
+
+- 新規DBは db/schema.sql（最新のスキーマ）で作成し、全バージョンを適用済みとして記録する
+- 既存DBは記録されたバージョンより新しいマイグレーションだけを、1つずつトランザクション内で適用する
+- Pythonのマイグレーションは upgrade(conn) でスキーマを変更し、大量データの移行が必要なら
+  backfill(conn, batch_size) を定義する。backfill は処理した行数を返し、0を返すまで
+  バッチごとに別トランザクションで呼び出される。backfill が終わるまでバージョンは記録されないため、
+  途中で止まると次回の起動で upgrade から再実行される（どちらも冪等に書く）
+- backfill を実行するプロセスは upgrade と同じトランザクションで schema_backfill_claim に
+  リース（期限付きの実行権）を記録し、バッチごとに延長する。同時に起動した他のプロセスは
+  リースが切れるまで upgrade / backfill も以降のマイグレーションも実行しない
+"""
+
+import importlib.util
+import logging
+import re
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent.parent.parent / "db" / "schema.sql"
+MIGRATIONS_DIR = Path(__file__).parent.parent.parent / "db" / "migrations"
+
+# backfill 1回（1トランザクション）で処理する行数
+BACKFILL_BATCH_SIZE = 5000
+
+# backfill のリースの長さ（秒）。バッチごとに延長し、プロセスが落ちたらこの時間で他のプロセスが引き継ぐ
+BACKFILL_LEASE_SECONDS = 60
+
+SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    )
+"""
+
+BACKFILL_CLAIM_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_backfill_claim (
+        version INTEGER PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at INTEGER NOT NULL
+    )
+"""
+
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+
+
+def list_migrations() -> list:
+    """
+    マイグレーションの一覧を取得
+
+    Returns:
+        (バージョン, 名前, パス) のリスト（バージョン順）
+    """
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), path))
+
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+
+    return migrations
+
+
+@contextmanager
+def _transaction(conn):
+    """BEGIN IMMEDIATE 〜 COMMIT（例外時はROLLBACK）で囲む"""
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # トランザクションを明示的に制御する
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def _execute_script(conn, sql: str):
+    """複数のSQL文を現在のトランザクション内で実行（executescript は暗黙にCOMMITするため使わない）"""
+    statement = ''
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                conn.execute(statement)
+            statement = ''
+    if statement.strip():
+        conn.execute(statement)
+
+
+def _load_module(path: Path):
+    """Pythonのマイグレーションを読み込む"""
+    spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _detect_unversioned(conn):
+    """
+    schema_version がないDBのバージョンを推定
+
+    Returns:
+        推定したバージョン（テーブルがなければNone）
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'generation_actual'"
+    ).fetchone()
+
+    if row is None:
+        return None
+
+    # 時刻が文字列のままの初期スキーマ
+    if 'WITHOUT ROWID' not in row[0].upper():
+        return 0
+
+    # UNIX秒のスキーマ（メタ情報テーブルの有無で判定）
+    has_meta = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'db_meta'"
+    ).fetchone()
+    return 2 if has_meta else 1
+
+
+def get_schema_version(conn):
+    """
+    現在のスキーマバージョンを取得
+
+    Args:
+        conn: DB接続
+
+    Returns:
+        バージョン（schema_version がなければNone）
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return None
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def _record_versions(conn, migrations: list):
+    """適用済みのバージョンを記録"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)",
+        [(version, name) for version, name, _ in migrations]
+    )
+
+
+def create_schema(conn):
+    """
+    最新のスキーマでDBを作成し、全マイグレーションを適用済みとして記録
+
+    Args:
+        conn: 空のDBへの接続
+    """
+    with open(SCHEMA_PATH) as f:
+        schema = f.read()
+
+    with _transaction(conn):
+        _execute_script(conn, schema)
+        conn.execute(SCHEMA_VERSION_SQL)
+        _record_versions(conn, list_migrations())
+
+
+def apply_migrations(conn) -> list:
+    """
+    未適用のマイグレーションを順に適用
+
+    Args:
+        conn: DB接続
+
+    Returns:
+        適用したバージョンのリスト
+    """
+    migrations = list_migrations()
+    current = get_schema_version(conn)
+
+    if current is None:
+        baseline = _detect_unversioned(conn)
+        if baseline is None:
+            logger.info(f"Creating schema (version {migrations[-1][0] if migrations else 0})")
+            create_schema(conn)
+            return []
+
+        logger.info(f"Unversioned database detected, assuming schema version {baseline}")
+        with _transaction(conn):
+            conn.execute(SCHEMA_VERSION_SQL)
+            _record_versions(conn, [m for m in migrations if m[0] <= baseline])
+        current = baseline
+
+    applied = []
+    # backfill のリースの所有者
+    owner = uuid.uuid4().hex
+
+    for version, name, path in migrations:
+        if version <= current:
+            continue
+
+        module = _load_module(path) if path.suffix == '.py' else None
+        has_backfill = module is not None and hasattr(module, 'backfill')
+
+        with _transaction(conn):
+            # 他のプロセスが先に適用していれば何もしない
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                continue
+
+            # 他のプロセスが backfill 中なら、このマイグレーションと以降のマイグレーションは任せる
+            claimed = not has_backfill or _claim_backfill(conn, version, owner)
+            if claimed:
+                logger.info(f"Applying migration {version:04d}_{name}")
+                if module is None:
+                    _execute_script(conn, path.read_text())
+                else:
+                    module.upgrade(conn)
+
+                # データ移行がない場合はスキーマ変更と同じトランザクションで記録する
+                if not has_backfill:
+                    _record_versions(conn, [(version, name, path)])
+
+        if not claimed:
+            logger.info(f"Migration {version:04d}_{name} is being backfilled by another process")
+            break
+
+        if has_backfill and not _run_backfill(conn, module, version, name, owner):
+            break
+
+        applied.append(version)
+
+    if applied:
+        logger.info(f"Applied migrations: {applied}")
+
+    return applied
+
+
+def _claim_backfill(conn, version: int, owner: str) -> bool:
+    """
+    backfill のリースを取得または延長（呼び出し側のトランザクション内で実行）
+
+    Args:
+        conn: DB接続
+        version: マイグレーションのバージョン
+        owner: リースの所有者
+
+    Returns:
+        取得できたか（他のプロセスが期限内のリースを持っていればFalse）
+    """
+    conn.execute(BACKFILL_CLAIM_SQL)
+    now = int(time.time())
+    row = conn.execute(
+        "SELECT owner, expires_at FROM schema_backfill_claim WHERE version = ?", (version,)
+    ).fetchone()
+    if row is not None and row[0] != owner and row[1] > now:
+        return False
+
+    conn.execute(
+        "INSERT OR REPLACE INTO schema_backfill_claim (version, owner, expires_at) VALUES (?, ?, ?)",
+        (version, owner, now + BACKFILL_LEASE_SECONDS)
+    )
+    return True
+
+
+def _run_backfill(conn, module, version: int, name: str, owner: str) -> bool:
+    """
+    データ移行をバッチごとに別トランザクションで実行し、終わったらバージョンを記録
+
+    1バッチごとにコミットするため、長時間DBをロックしない。各バッチでリースを延長する。
+
+    Returns:
+        最後まで実行したか（リースを他のプロセスに取られたらFalse）
+    """
+    total = 0
+    while True:
+        with _transaction(conn):
+            if not _claim_backfill(conn, version, owner):
+                logger.warning(f"Migration {version:04d}_{name}: lease taken over by another process")
+                return False
+
+            rows = module.backfill(conn, BACKFILL_BATCH_SIZE)
+            if not rows:
+                _record_versions(conn, [(version, name, None)])
+                conn.execute("DELETE FROM schema_backfill_claim WHERE version = ?", (version,))
+                return True
+
+        total += rows
+        logger.info(f"Migration {version:04d}_{name}: backfilled {total} rows")
@@ -1,10 +1,21 @@
+import hashlib
+import time
 import joblib
 import onnxruntime as ort
 from pathlib import Path
 import logging
+from .metrics import set_gauge
 
 logger = logging.getLogger(__name__)
 
+# モデルのファイル（version() の計算対象）
+MODEL_FILES = [
+    "generation_tokyo.onnx",
+    "generation_tokyo.metadata.pkl",
+    "price_tokyo.onnx",
+    "price_tokyo.metadata.pkl"
+]
+
 
 class ModelLoader:
     """学習済みモデルをロードするクラス"""
@@ -14,7 +25,7 @@ class ModelLoader:
         self.model_dir = Path(__file__).parent.parent.parent.parent / "ml" / "models"
 
     def load_models(self):
-        """学習済みモデルをロード（同期関数）"""
+        """学習済みモデルをロード（同期関数、モデルごとのロード時間をメトリクスに記録）"""
         try:
             # 発電量予測モデル（ONNX形式）
             gen_model_path = self.model_dir / "generation_tokyo.onnx"
@@ -22,8 +33,11 @@ class ModelLoader:
 
             if gen_model_path.exists() and gen_metadata_path.exists():
                 # ONNXモデルをロード
+                start = time.perf_counter()
                 ort_session = ort.InferenceSession(str(gen_model_path))
                 metadata = joblib.load(gen_metadata_path)
+                set_gauge("model_load_seconds", time.perf_counter() - start,
+                          "Time taken to load each model", model="generation")
 
                 self.models["generation"] = {
                     "model": ort_session,
@@ -40,8 +54,11 @@ class ModelLoader:
 
             if price_model_path.exists() and price_metadata_path.exists():
                 # ONNXモデルをロード
+                start = time.perf_counter()
                 ort_session = ort.InferenceSession(str(price_model_path))
                 metadata = joblib.load(price_metadata_path)
+                set_gauge("model_load_seconds", time.perf_counter() - start,
+                          "Time taken to load each model", model="price")
 
                 self.models["price"] = {
                     "model": ort_session,
@@ -74,6 +91,23 @@ class ModelLoader:
 
         return self.models[model_type]
 
+    def version(self) -> str:
+        """
+        モデルのバージョン（モデルファイルの更新時刻とサイズのハッシュ）
+
+        モデルをロードせずに求められるため、レスポンスのETagに使う。
+
+        Returns:
+            バージョン文字列
+        """
+        md5_hash = hashlib.md5()
+        for name in MODEL_FILES:
+            path = self.model_dir / name
+            if path.exists():
+                stat = path.stat()
+                md5_hash.update(f"{name}:{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8'))
+        return md5_hash.hexdigest()[:16]
+
     def is_loaded(self, model_type: str) -> bool:
         """モデルがロードされているか確認"""
         return model_type in self.models
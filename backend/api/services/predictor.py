@@ -1,13 +1,76 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Optional
 import logging
 from .model_loader import ModelLoader
 from .weather import WeatherService
 from .db import get_db, get_generation_data, get_price_data
+from .metrics import timed
 
 logger = logging.getLogger(__name__)
 
+# 予測の間隔（秒）
+STEP_SECONDS = 1800
+
+
+def to_points(start: datetime, values) -> list:
+    """
+    予測値の配列を [{"timestamp": ISO文字列, "value": 値}] 形式に変換
+
+    Args:
+        start: 先頭の予測対象時刻
+        values: 予測値の配列（STEP_SECONDS 間隔）
+
+    Returns:
+        予測データポイントのリスト
+    """
+    step = timedelta(seconds=STEP_SECONDS)
+    return [
+        {"timestamp": (start + step * i).isoformat(), "value": value}
+        for i, value in enumerate(np.asarray(values).tolist())
+    ]
+
+
+def forecast_info(area: str, forecast: dict) -> dict:
+    """
+    予測のレスポンスに共通の項目
+
+    Args:
+        area: エリア名
+        forecast: 予測（"generated_at" を含む）
+
+    Returns:
+        {"area", "stale_inputs", "weather_fetched_at", "generated_at"}
+    """
+    weather = forecast["weather"]
+    return {
+        "area": area,
+        "stale_inputs": weather["stale"],
+        "weather_fetched_at": weather["fetched_at"],
+        "generated_at": forecast["generated_at"]
+    }
+
+
+def to_columnar(area: str, forecast: dict) -> dict:
+    """
+    予測を columnar 形式（先頭時刻・間隔と値の配列）の辞書に変換
+
+    Args:
+        area: エリア名
+        forecast: 予測（"generated_at" を含む）
+
+    Returns:
+        /latest?format=columnar と同じ形の辞書（値は numpy配列のまま）
+    """
+    return {
+        **forecast_info(area, forecast),
+        "start": forecast["start"].isoformat(),
+        "step_seconds": forecast["step_seconds"],
+        "format": "columnar",
+        "predictions": {"generation": forecast["generation"], "price": forecast["price"]}
+    }
+
 
 class Predictor:
     """予測実行サービス"""
@@ -16,50 +79,78 @@ class Predictor:
         self.model_loader = model_loader
         self.weather_service = WeatherService()
 
-    async def predict(self, area: str = "tokyo", hours: int = 48):
+    async def predict(self, area: str = "tokyo", hours: int = 48, deadline: Optional[float] = None):
         """
         48時間予測を実行
 
         Args:
             area: 対象エリア
             hours: 予測時間数
+            deadline: リクエスト全体の期限（time.monotonic() 基準）
 
         Returns:
-            予測結果の辞書
+            予測結果の辞書。"start"（先頭の予測対象時刻）、"step_seconds"、
+            "generation" / "price"（予測値の float32 配列）と、気象予報の取得状況 "weather" を含む
         """
         try:
-            # 気象予報取得
-            weather_df = await self.weather_service.fetch_forecast(area, hours)
+            with timed("predict.total"):
+                return await self._predict(area, hours, deadline)
 
-            # 過去データ取得（Lag特徴量用）
+        except Exception as e:
+            logger.error(f"Prediction failed: {e}")
+            raise
+
+    async def _predict(self, area: str, hours: int, deadline: Optional[float]) -> dict:
+        """predict() の本体（段階ごとの所要時間を記録）"""
+        # 予報は当日0時から始まるため、経過した時間数だけ多く取得して現在の30分枠から hours 時間分を使う
+        slot = pd.Timestamp(datetime.now()).floor(f"{STEP_SECONDS}s")
+        elapsed_hours = slot.hour + 1
+
+        # 気象予報取得（期限切れの場合はキャッシュした予報で代替）
+        with timed("predict.weather_fetch"):
+            weather_df = await self.weather_service.fetch_forecast(area, hours + elapsed_hours, deadline=deadline)
+        weather = {
+            "fetched_at": weather_df.attrs.get("fetched_at"),
+            "stale": weather_df.attrs.get("stale", False)
+        }
+
+        weather_df = weather_df[weather_df['timestamp'] >= slot].head(hours * 3600 // STEP_SECONDS)
+        weather_df = weather_df.reset_index(drop=True)
+        if weather_df.empty:
+            raise RuntimeError(f"Weather forecast for {area} does not cover {slot.isoformat()}")
+
+        # 過去データ取得（Lag特徴量用）
+        with timed("predict.db_read"):
             db = get_db()
             historical_generation = get_generation_data(db, area, limit=200)
             historical_price = get_price_data(db, area, limit=200)
             db.close()
 
-            # 発電量予測
-            generation_pred = await self._predict_generation(
-                weather_df,
-                historical_generation
-            )
-
-            # 価格予測
-            price_pred = await self._predict_price(
-                weather_df,
-                historical_price
-            )
-
-            return {
-                "generation": generation_pred,
-                "price": price_pred
-            }
-
-        except Exception as e:
-            logger.error(f"Prediction failed: {e}")
-            raise
-
-    async def _predict_generation(self, weather_df: pd.DataFrame, historical_data: list):
-        """発電量を予測（再エネ合計）"""
+        # 発電量予測
+        generation_pred = await self._predict_generation(
+            weather_df,
+            historical_generation
+        )
+
+        # 価格予測
+        price_pred = await self._predict_price(
+            weather_df,
+            historical_price
+        )
+
+        # 予測値 i は気象予報の i 番目の時刻（現在の30分枠から30分間隔）に対応する
+        start = pd.Timestamp(weather_df['timestamp'].iloc[0]).to_pydatetime()
+
+        return {
+            "start": start,
+            "step_seconds": STEP_SECONDS,
+            "generation": generation_pred,
+            "price": price_pred,
+            "weather": weather
+        }
+
+    async def _predict_generation(self, weather_df: pd.DataFrame, historical_data: list) -> np.ndarray:
+        """発電量を予測（再エネ合計、気象予報の各時刻の予測値の配列）"""
         if not self.model_loader.is_loaded("generation"):
             raise ValueError("Generation model not loaded")
 
@@ -68,28 +159,19 @@ class Predictor:
         feature_cols = model_data['feature_cols']
 
         # 特徴量生成（学習時と同じ列名 'total_mw' を使用）
-        features = self._create_features(weather_df, historical_data, 'total_mw')
+        with timed("predict.generation.features"):
+            features = self._create_features(weather_df, historical_data, 'total_mw')
 
         # 予測実行（ONNX）
-        input_name = ort_session.get_inputs()[0].name
-        predictions = ort_session.run(None, {input_name: features[feature_cols].astype('float32').values})[0]
+        with timed("predict.generation.onnx"):
+            input_name = ort_session.get_inputs()[0].name
+            predictions = ort_session.run(None, {input_name: features[feature_cols].astype('float32').values})[0]
 
-        # ONNX出力を1次元配列に変換
-        predictions = predictions.flatten()
+        # ONNX出力（float32）を1次元配列に変換（負の値は0にする）
+        return np.maximum(predictions.flatten(), 0)
 
-        # 結果をフォーマット
-        timestamps = [
-            (datetime.now() + timedelta(minutes=30 * i)).isoformat()
-            for i in range(len(predictions))
-        ]
-
-        return [
-            {"timestamp": ts, "value": max(0, float(val))}
-            for ts, val in zip(timestamps, predictions)
-        ]
-
-    async def _predict_price(self, weather_df: pd.DataFrame, historical_data: list):
-        """価格を予測"""
+    async def _predict_price(self, weather_df: pd.DataFrame, historical_data: list) -> np.ndarray:
+        """価格を予測（気象予報の各時刻の予測値の配列）"""
         if not self.model_loader.is_loaded("price"):
             raise ValueError("Price model not loaded")
 
@@ -98,25 +180,16 @@ class Predictor:
         feature_cols = model_data['feature_cols']
 
         # 特徴量生成（学習時と同じ列名 'price_yen' を使用）
-        features = self._create_features(weather_df, historical_data, 'price_yen')
+        with timed("predict.price.features"):
+            features = self._create_features(weather_df, historical_data, 'price_yen')
 
         # 予測実行（ONNX）
-        input_name = ort_session.get_inputs()[0].name
-        predictions = ort_session.run(None, {input_name: features[feature_cols].astype('float32').values})[0]
-
-        # ONNX出力を1次元配列に変換
-        predictions = predictions.flatten()
-
-        # 結果をフォーマット
-        timestamps = [
-            (datetime.now() + timedelta(minutes=30 * i)).isoformat()
-            for i in range(len(predictions))
-        ]
-
-        return [
-            {"timestamp": ts, "value": max(0, float(val))}
-            for ts, val in zip(timestamps, predictions)
-        ]
+        with timed("predict.price.onnx"):
+            input_name = ort_session.get_inputs()[0].name
+            predictions = ort_session.run(None, {input_name: features[feature_cols].astype('float32').values})[0]
+
+        # ONNX出力（float32）を1次元配列に変換（負の値は0にする）
+        return np.maximum(predictions.flatten(), 0)
 
     def _rename_features_for_onnx(self, features: pd.DataFrame, old_prefix: str, new_prefix: str) -> pd.DataFrame:
         """
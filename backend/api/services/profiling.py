@@ -0,0 +1,206 @@
+"""
+リクエスト単位のプロファイリング（オプトイン）
+
+環境変数 REQUEST_PROFILING=1 の場合だけミドルウェアを登録し、X-Profile ヘッダー
+または profile クエリを付けたリクエストを計測します。無効な場合はミドルウェア自体を
+登録しないため、通常のリクエストには何の処理も加わりません。
+
+計測したリクエストでは
+- リクエストを処理するスレッド（イベントループ）のスタックを PROFILE_INTERVAL_SECONDS ごとに
+  サンプリングし、flamegraph.pl / speedscope で読める collapsed 形式（"a;b;c 回数"）で保存する。
+  サンプルはイベントループ全体のもので、同時に処理中の他のリクエストも含む
+  （重なったリクエストの数を overlapping_requests に記録する）
+- 計測は同時に1リクエストだけ。計測中に指定されたリクエストは計測せず X-Profile-Skipped を返す
+- metrics に記録される段階（predict.weather_fetch など）の所要時間を Server-Timing ヘッダーで返す
+- 保存したプロファイルのIDを X-Profile-Id ヘッダーで返す（GET /api/profiles/{id} で取得）
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from urllib.parse import parse_qs
+
+from . import metrics
+
+# プロファイリングを有効にするか（本番では通常無効）
+PROFILING_ENABLED = os.getenv("REQUEST_PROFILING", "0") == "1"
+
+# 設定した場合、X-Profile ヘッダー（または profile クエリ）の値がこれと一致するリクエストだけ計測する
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+
+# スタックのサンプリング間隔（秒）
+PROFILE_INTERVAL_SECONDS = 0.001
+
+# メモリに残すプロファイルの数（古いものから消す）
+MAX_STORED_PROFILES = 20
+
+# プロファイルID → {"path", "duration", "stages", "folded", ...}
+_profiles = OrderedDict()
+_lock = threading.Lock()
+
+# 処理中のリクエスト数と、計測中のプロファイル（{"overlapping": 重なったリクエスト数}、なければNone）
+# どちらもイベントループのスレッドからだけ更新する
+_active_requests = 0
+_current = None
+
+
+class StackSampler:
+    """1つのスレッドのスタックを一定間隔でサンプリング"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame) -> str:
+        """外側から内側への "関数 (ファイル:行)" を ; でつないだ文字列"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def folded(self) -> str:
+        """collapsed 形式（1行に "スタック 回数"）"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def get_profile(profile_id: str):
+    """保存したプロファイルを取得（なければNone）"""
+    with _lock:
+        return _profiles.get(profile_id)
+
+
+def _store(profile_id: str, profile: dict):
+    with _lock:
+        _profiles[profile_id] = profile
+        while len(_profiles) > MAX_STORED_PROFILES:
+            _profiles.popitem(last=False)
+
+
+def _server_timing(stages: list, total: float) -> str:
+    """段階ごとの合計時間の Server-Timing ヘッダー（ミリ秒）"""
+    totals = OrderedDict()
+    for stage, seconds in stages:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    entries = [f'{stage.replace(".", "-")};dur={seconds * 1000:.2f};desc="{stage}"'
+               for stage, seconds in totals.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def _requested(scope) -> bool:
+    """X-Profile ヘッダーまたは profile クエリで計測が指定されたか"""
+    value = None
+    for name, header in scope.get("headers", []):
+        if name == b"x-profile":
+            value = header.decode("latin-1")
+            break
+    if value is None and scope.get("query_string"):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        if values:
+            value = values[0]
+
+    if not value:
+        return False
+    if PROFILING_TOKEN:
+        return value == PROFILING_TOKEN
+    return value.lower() in ("1", "true", "yes")
+
+
+class ProfilingMiddleware:
+    """X-Profile / profile を付けたリクエストをプロファイリングするASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active_requests
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        _active_requests += 1
+        try:
+            requested = _requested(scope)
+            if requested and _current is None:
+                await self._profile(scope, receive, send)
+                return
+
+            if _current is not None:
+                _current["overlapping"] += 1
+            await self.app(scope, receive, _skipped(send) if requested else send)
+        finally:
+            _active_requests -= 1
+
+    async def _profile(self, scope, receive, send):
+        """リクエストを計測して保存"""
+        global _current
+        profile_id = uuid.uuid4().hex[:12]
+        stages = []
+        _current = {"overlapping": _active_requests - 1}
+        token = metrics.start_recording(stages)
+        sampler = StackSampler(threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                headers.append((b"server-timing", _server_timing(stages, elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            sampler.stop()
+            metrics.stop_recording(token)
+            duration = time.perf_counter() - start
+            overlapping = _current["overlapping"]
+            _current = None
+            _store(profile_id, {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "duration_ms": round(duration * 1000, 3),
+                "interval_ms": PROFILE_INTERVAL_SECONDS * 1000,
+                "samples": sum(sampler.counts.values()),
+                # サンプルはイベントループ全体のもの（overlapping_requests が0ならこのリクエストだけ）
+                "scope": "event_loop",
+                "overlapping_requests": overlapping,
+                "stages": [{"stage": stage, "duration_ms": round(seconds * 1000, 3)} for stage, seconds in stages],
+                "folded": sampler.folded()
+            })
+
+
+def _skipped(send):
+    """他のリクエストを計測中のため計測しなかったことを X-Profile-Skipped ヘッダーで返す send"""
+    async def send_with_header(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-skipped", b"busy")]}
+        await send(message)
+    return send_with_header
@@ -0,0 +1,322 @@
+"""
+SQLの実行時間の計測とスロークエリログ
+
+get_db() / get_readonly_db() の接続を InstrumentedConnection にして、すべての文の
+実行時間（execute と結果の fetch* の合計）を文ごとに集計します。文は空白を詰めたSQLで
+区別するため、パラメーター（?）だけが違う実行は同じ文として数えます。
+
+- 初めて実行した文は EXPLAIN QUERY PLAN を1回だけ取得し、インデックスを使わない
+  全件スキャン（"SCAN テーブル"）を含むか判定する
+- 1回の実行が SLOW_QUERY_SECONDS を超えたら、SQL・実行計画をログに出す（パラメーターは
+  利用者の入力を含むため、SLOW_QUERY_LOG_PARAMS=1 の場合だけ出す）
+- 集計は statement_stats() で取得できる（/api/admin/queries。QUERY_LOG_ENDPOINT=1 かつ
+  QUERY_LOG_TOKEN を設定した場合だけ登録し、X-Admin-Token ヘッダーでトークンを確認する）
+
+カーソルを直接 for で回した場合の読み出し時間は数えません（fetchone / fetchmany / fetchall のみ）。
+"""
+
+import hmac
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 計測するか（QUERY_LOG=0 で無効にすると通常の sqlite3.Connection を使う）
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG", "1") == "1"
+
+# この時間（秒）を超えた実行をログに出す
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", "100")) / 1000
+
+# スロークエリのログにパラメーターを出すか（既定では件数だけ出す）
+LOG_QUERY_PARAMS = os.getenv("SLOW_QUERY_LOG_PARAMS", "0") == "1"
+
+# /api/admin/queries を登録するか（QUERY_LOG_TOKEN も設定した場合のみ）
+QUERY_LOG_ENDPOINT_ENABLED = os.getenv("QUERY_LOG_ENDPOINT", "0") == "1"
+
+# /api/admin/queries の X-Admin-Token ヘッダーと一致させるトークン
+QUERY_LOG_TOKEN = os.getenv("QUERY_LOG_TOKEN")
+
+# 集計する文の数の上限（超えた分は集計しない）
+MAX_STATEMENTS = 500
+
+# ログに出すSQL・パラメーターの最大文字数
+MAX_LOGGED_CHARS = 500
+
+# 全件スキャンを表す実行計画の行（"SCAN predictions" など。"SCAN ... USING INDEX" は除く）
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class StatementStats:
+    """1つの文の集計"""
+
+    __slots__ = ("sql", "count", "total", "max", "rows", "slow", "plan")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+        # 実行計画（取得前はNone、取得できなければ空のリスト）
+        self.plan = None
+
+    @property
+    def full_scan(self) -> bool:
+        return any(_FULL_SCAN.match(detail) for detail in self.plan or [])
+
+    def to_dict(self) -> dict:
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "slow": self.slow,
+            "full_scan": self.full_scan,
+            "plan": self.plan
+        }
+
+
+# 文 → StatementStats
+_statements = {}
+# 実行したSQL → 空白を詰めた文（同じSQLを毎回正規化しないため）
+_normalized = {}
+# MAX_STATEMENTS を超えて集計しなかった実行の数
+_dropped = 0
+_lock = threading.Lock()
+
+
+def normalize(sql: str) -> str:
+    """空白（改行・インデント）を詰めたSQL"""
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def _explain(conn: sqlite3.Connection, sql: str, parameters) -> list:
+    """EXPLAIN QUERY PLAN の detail 列（取得できない文は空のリスト）"""
+    try:
+        # 計測しないカーソルで実行する
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    return [row[3] for row in rows]
+
+
+def _shorten(value) -> str:
+    text = repr(value)
+    return text if len(text) <= MAX_LOGGED_CHARS else text[:MAX_LOGGED_CHARS] + "..."
+
+
+def _loggable_params(parameters) -> str:
+    """ログに出すパラメーター（LOG_QUERY_PARAMS でなければ個数だけ）"""
+    if LOG_QUERY_PARAMS:
+        return _shorten(parameters)
+    try:
+        return f"<{len(parameters)} redacted>"
+    except TypeError:
+        return "<redacted>"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """実行時間を集計するカーソル"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = None
+        self._parameters = ()
+        # 現在の文の実行にかかった時間（execute + fetch*）
+        self._elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        # パラメーターはイテレーター（zip など）のこともあるため、実行計画用に先頭だけ取り出しておく
+        iterator = iter(seq_of_parameters)
+        first = next(iterator, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, iterator if first is None else itertools.chain((first,), iterator))
+        finally:
+            self._begin(sql, () if first is None else first, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _begin(self, sql: str, parameters, elapsed: float):
+        """文の実行を集計に加える"""
+        global _dropped
+        key = _normalized.get(sql)
+        if key is None:
+            key = normalize(sql)
+            if len(_normalized) < MAX_STATEMENTS * 2:
+                _normalized[sql] = key
+        with _lock:
+            stats = _statements.get(key)
+            if stats is None:
+                if len(_statements) >= MAX_STATEMENTS:
+                    _dropped += 1
+                    return
+                stats = _statements[key] = StatementStats(key)
+            stats.count += 1
+
+        if stats.plan is None:
+            stats.plan = _explain(self.connection, sql, parameters)
+
+        self._stats = stats
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._add(elapsed, 0)
+
+    def _add(self, elapsed: float, rows: int):
+        """現在の文の実行時間と行数を加え、しきい値を超えたらログに出す"""
+        stats = self._stats
+        if stats is None:
+            return
+
+        previous = self._elapsed
+        self._elapsed += elapsed
+        with _lock:
+            stats.total += elapsed
+            stats.rows += rows
+            stats.max = max(stats.max, self._elapsed)
+            # 1回の実行につき、しきい値を超えたときに1度だけ数える
+            crossed = previous <= SLOW_QUERY_SECONDS < self._elapsed
+            if crossed:
+                stats.slow += 1
+
+        if crossed:
+            logger.warning(
+                f"Slow query ({self._elapsed * 1000:.1f} ms so far): {_shorten(stats.sql)} "
+                f"params={_loggable_params(self._parameters)} plan={' / '.join(stats.plan or []) or 'n/a'}"
+            )
+
+    def _finish(self):
+        """前の文の計測を終える"""
+        self._stats = None
+        self._parameters = ()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """カーソルを InstrumentedCursor にする接続"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute は（Pythonのバージョンによっては）cursor() を経由しないため明示的に委譲する
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database: str, **kwargs) -> sqlite3.Connection:
+    """
+    sqlite3.connect（QUERY_LOG が有効なら InstrumentedConnection を使う）
+
+    Args:
+        database: DBのパスまたはURI
+        kwargs: sqlite3.connect に渡す引数
+
+    Returns:
+        接続
+    """
+    if QUERY_LOG_ENABLED:
+        kwargs.setdefault("factory", InstrumentedConnection)
+    return sqlite3.connect(database, **kwargs)
+
+
+def check_token(token) -> bool:
+    """
+    /api/admin/queries のトークンを確認
+
+    Args:
+        token: X-Admin-Token ヘッダーの値（なければNone）
+
+    Returns:
+        QUERY_LOG_TOKEN と一致すればTrue（QUERY_LOG_TOKEN が未設定なら常にFalse）
+    """
+    if not QUERY_LOG_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), QUERY_LOG_TOKEN.encode("utf-8"))
+
+
+def statement_stats(sort: str = "total", limit: int = 50) -> dict:
+    """
+    文ごとの集計
+
+    Args:
+        sort: 並べ替えの基準（total / mean / max / count / slow）
+        limit: 返す文の数
+
+    Returns:
+        {"enabled", "slow_query_ms", "statement_count", "dropped", "statements": [...]}
+    """
+    keys = {
+        "total": lambda stats: stats.total,
+        "mean": lambda stats: stats.total / stats.count if stats.count else 0.0,
+        "max": lambda stats: stats.max,
+        "count": lambda stats: stats.count,
+        "slow": lambda stats: stats.slow
+    }
+    if sort not in keys:
+        raise ValueError(f"sort must be one of {', '.join(keys)}")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+
+    with _lock:
+        statements = sorted(_statements.values(), key=keys[sort], reverse=True)[:limit]
+        result = [stats.to_dict() for stats in statements]
+        total = len(_statements)
+        dropped = _dropped
+
+    return {
+        "enabled": QUERY_LOG_ENABLED,
+        "slow_query_ms": SLOW_QUERY_SECONDS * 1000,
+        "statement_count": total,
+        "dropped": dropped,
+        "statements": result
+    }
+
+
+def reset():
+    """集計を消去（テスト・ベンチマーク用）"""
+    global _dropped
+    with _lock:
+        _statements.clear()
+        _normalized.clear()
+        _dropped = 0
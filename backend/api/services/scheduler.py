@@ -0,0 +1,325 @@
+"""
+予測の事前計算スケジューラー
+
+30分枠の開始（+ SCHEDULE_DELAY_SECONDS）ごとに FORECAST_AREAS の各エリアで
+SNAPSHOT_HOURS 時間の予測を計算し、predictions にまとめて保存したうえで
+メモリ上のスナップショットに公開します。/latest は既定の時間数ならこれをそのまま返します。
+
+- 単一実行: 同じプロセス内では枠ごとの計算を1つのタスクで共有し、複数のワーカー間では
+  forecast_runs の行（db.claim_forecast_run）を取れた1つだけが保存する
+- 取りこぼし: 起動時や処理が遅れて枠をまたいだ場合は現在の枠をすぐに計算し、
+  過ぎた枠は計算しない（過去の時刻からの予測は使われないため）
+- 無効化: スナップショットは公開したときの db.data_version() を覚えておき、DBが書き換えられたら
+  （他のワーカーへのアップロードを含む）forecast_runs を読み直し、枠の予測が消されていれば計算し直す
+
+公開した予測は broadcast.forecast_broadcaster から /api/predict/stream の購読者に配信されます。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from .db import get_db, data_version, claim_forecast_run, release_forecast_run, save_forecast_run, get_latest_forecast_run
+from .broadcast import forecast_broadcaster
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# 予測を計算する間隔（秒）。枠は UNIX秒で30分に揃える（日本時間でも同じ境界）
+SLOT_SECONDS = 1800
+
+# 事前計算するエリア（カンマ区切り）
+FORECAST_AREAS = [area.strip() for area in os.getenv("FORECAST_AREAS", "tokyo").split(",") if area.strip()]
+
+# 事前計算する予測時間数（/latest の既定値と揃える）
+SNAPSHOT_HOURS = 48
+
+# スケジューラーが動いている間、前の枠のスナップショットを返してよい時間（秒）
+# 枠の開始直後の計算中に /latest が計算を待たないようにする
+SNAPSHOT_MAX_AGE_SECONDS = SLOT_SECONDS + 300
+
+# スケジューラーを動かすか（サーバーレス環境ではリクエストの外で処理が動かないため既定で無効）
+SCHEDULER_ENABLED = os.getenv("FORECAST_SCHEDULER", "0" if os.getenv("VERCEL") else "1") == "1"
+
+# 枠の開始から計算を始めるまでの待ち時間（秒）。直前に取り込まれた実績を使うため
+SCHEDULE_DELAY_SECONDS = 5
+
+# 実行権の有効期間（秒）。これを過ぎても 'running' の枠は他のワーカーが引き継ぐ
+RUN_LEASE_SECONDS = 300
+
+# 計算に失敗した場合に同じ枠を再試行するまでの待ち時間（秒）
+RETRY_SECONDS = 60
+
+# エリアごとの最新のスナップショット（グローバルキャッシュ）
+_snapshots = {}
+# スナップショットを公開したときのDBのバージョン（エリア → db.data_version()）
+_snapshot_versions = {}
+# 計算中の (エリア, 枠) → タスク
+_inflight = {}
+_scheduler_task = None
+_get_predictor = None
+
+
+def current_slot(now: Optional[float] = None) -> int:
+    """
+    現在の30分枠の開始時刻を取得
+
+    Args:
+        now: UNIX秒（Noneなら現在時刻）
+
+    Returns:
+        枠の開始時刻（UNIX秒）
+    """
+    if now is None:
+        now = time.time()
+    return int(now) // SLOT_SECONDS * SLOT_SECONDS
+
+
+def is_running() -> bool:
+    """スケジューラーが動いているか"""
+    return _scheduler_task is not None and not _scheduler_task.done()
+
+
+def publish(area: str, forecast: dict, version: str):
+    """
+    予測をスナップショットとして公開し、購読者に配信
+
+    Args:
+        area: エリア名
+        forecast: 予測（"slot" と "generated_at" を含む）
+        version: 予測の元にしたDBのバージョン（db.data_version()）
+    """
+    previous = _snapshots.get(area)
+    if previous is not None and (previous["slot"] > forecast["slot"]
+                                 or previous["generated_at"] > forecast["generated_at"]):
+        return
+    _snapshots[area] = forecast
+    _snapshot_versions[area] = version
+    # DBから読み直した同じ予測は配信しない
+    if previous is not None and previous["generated_at"] == forecast["generated_at"]:
+        return
+    forecast_broadcaster.publish(area, forecast)
+    logger.info(f"Published forecast snapshot for {area} (generated at {forecast['generated_at']})")
+
+
+def get_snapshot(area: str) -> Optional[dict]:
+    """
+    最新のスナップショットを取得
+
+    メモリ上のものが現在の枠より古ければ、他のワーカーが保存したものをDBから読む。
+
+    Args:
+        area: エリア名
+
+    Returns:
+        予測の辞書（なければNone）
+    """
+    snapshot = _snapshots.get(area)
+    version = data_version()
+    if snapshot is not None and snapshot["slot"] >= current_slot() and _snapshot_versions.get(area) == version:
+        return snapshot
+
+    try:
+        conn = get_db()
+        try:
+            stored = get_latest_forecast_run(conn, area)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"Failed to load forecast snapshot for {area}: {e}")
+        return snapshot
+
+    if stored is not None and stored["hours"] == SNAPSHOT_HOURS:
+        publish(area, stored, version)
+        return _snapshots[area]
+    return snapshot
+
+
+def is_fresh(area: str, snapshot: Optional[dict]) -> bool:
+    """
+    スナップショットをそのまま返してよいか
+
+    公開した後にDBが書き換えられていない（他のワーカーへのアップロードも含む）うえで、
+    現在の枠のものか、スケジューラーが動いていて SNAPSHOT_MAX_AGE_SECONDS 以内の枠のもの。
+    """
+    if snapshot is None or _snapshot_versions.get(area) != data_version():
+        return False
+    slot = current_slot()
+    if snapshot["slot"] >= slot:
+        return True
+    return is_running() and time.time() - snapshot["slot"] < SNAPSHOT_MAX_AGE_SECONDS
+
+
+async def _run_slot(area: str, slot: int, get_predictor, deadline: Optional[float],
+                    background: bool) -> Optional[dict]:
+    """
+    枠の予測を計算して公開
+
+    実行権を取れた場合だけ保存する。取れなかった場合、他のワーカーが計算済みならそれを使う。
+    他のワーカーが計算中なら、スケジューラーからの呼び出し（background）は何もせずNoneを返し、
+    リクエストからの呼び出しは待たせないよう保存せずにこのプロセスでも計算する。
+    """
+    conn = get_db()
+    try:
+        claimed = claim_forecast_run(conn, area, slot, RUN_LEASE_SECONDS)
+        # 実行権の記録より後の書き込み（新しい実績）があれば、公開した予測は古いものとして扱われる
+        version = data_version()
+        if not claimed:
+            stored = get_latest_forecast_run(conn, area)
+            if stored is not None and stored["slot"] >= slot and stored["hours"] == SNAPSHOT_HOURS:
+                logger.info(f"Forecast for {area} already computed by another worker")
+                publish(area, stored, version)
+                return stored
+            if background:
+                logger.info(f"Forecast for {area} is being computed by another worker")
+                return None
+
+        try:
+            predictor = get_predictor()
+            forecast = await predictor.predict(area=area, hours=SNAPSHOT_HOURS, deadline=deadline)
+            forecast["hours"] = SNAPSHOT_HOURS
+            forecast["slot"] = slot
+            forecast["generated_at"] = datetime.now().isoformat()
+
+            if claimed:
+                save_forecast_run(conn, area, slot, forecast)
+                # 自分の保存では古くしない
+                version = data_version()
+        except Exception:
+            if claimed:
+                release_forecast_run(conn, area, slot)
+            raise
+    finally:
+        conn.close()
+
+    publish(area, forecast, version)
+    return forecast
+
+
+async def refresh_forecast(area: str, get_predictor, deadline: Optional[float] = None,
+                           background: bool = False) -> Optional[dict]:
+    """
+    現在の枠の予測を計算（同じ枠の計算中なら完了を待つ）
+
+    Args:
+        area: エリア名
+        get_predictor: 予測サービスを返す関数
+        deadline: 期限（time.monotonic() 基準）
+        background: スケジューラーからの呼び出しか（他のワーカーが計算中ならNoneを返す）
+
+    Returns:
+        予測の辞書
+    """
+    key = (area, current_slot())
+    task = _inflight.get(key)
+    # 計算中のタスクに相乗りできたらヒット
+    record_cache("forecast_inflight", task is not None)
+    if task is None:
+        task = asyncio.ensure_future(_run_slot(area, key[1], get_predictor, deadline, background))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    # 待っている側がキャンセルされても他の待ち手のために計算は続ける
+    forecast = await asyncio.shield(task)
+    if forecast is None and not background:
+        forecast = await _run_slot(area, key[1], get_predictor, deadline, background=False)
+    return forecast
+
+
+async def _refresh_in_background(area: str):
+    """スケジューラーのタスクとして予測を計算（失敗はログのみ）"""
+    try:
+        await refresh_forecast(area, _get_predictor, background=True)
+    except Exception as e:
+        logger.error(f"Forecast refresh for {area} failed: {e}")
+
+
+def invalidate(area: str):
+    """
+    新しい実績が入ったエリアの現在の枠の予測を破棄
+
+    スケジューラーが動いていればすぐに計算し直して配信し、動いていなければ次の /latest で計算する。
+
+    Args:
+        area: エリア名
+    """
+    slot = current_slot()
+    try:
+        conn = get_db()
+        try:
+            release_forecast_run(conn, area, slot, status='done')
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"Failed to invalidate forecast run for {area}: {e}")
+
+    snapshot = _snapshots.get(area)
+    if snapshot is not None and snapshot["slot"] >= slot:
+        # 前の枠扱いにして、計算し直すまでは古い予測として扱う
+        _snapshots[area] = {**snapshot, "slot": slot - SLOT_SECONDS}
+
+    if is_running():
+        asyncio.ensure_future(_refresh_in_background(area))
+
+
+async def _scheduler_loop(get_predictor):
+    """枠ごとに全エリアの予測を計算"""
+    last_slot = None
+    while True:
+        slot = current_slot()
+        if last_slot is not None and slot - last_slot > SLOT_SECONDS:
+            logger.warning(f"Skipped {(slot - last_slot) // SLOT_SECONDS - 1} missed forecast slot(s); "
+                           f"computing the current one")
+
+        failed = False
+        for area in FORECAST_AREAS:
+            snapshot = _snapshots.get(area)
+            if snapshot is not None and snapshot["slot"] >= slot:
+                continue
+            try:
+                await refresh_forecast(area, get_predictor, background=True)
+            except Exception as e:
+                failed = True
+                logger.error(f"Scheduled forecast for {area} failed: {e}")
+        last_slot = slot
+
+        now = time.time()
+        if failed:
+            wait = RETRY_SECONDS
+        else:
+            wait = slot + SLOT_SECONDS + SCHEDULE_DELAY_SECONDS - now
+        await asyncio.sleep(max(wait, 1))
+
+
+def start_scheduler(get_predictor):
+    """
+    スケジューラーを開始（SCHEDULER_ENABLED が無効なら何もしない）
+
+    起動直後に現在の枠を計算し、以降は30分ごとに計算する。
+
+    Args:
+        get_predictor: 予測サービスを返す関数
+    """
+    global _scheduler_task, _get_predictor
+    if not SCHEDULER_ENABLED or is_running():
+        return
+    _get_predictor = get_predictor
+    _scheduler_task = asyncio.ensure_future(_scheduler_loop(get_predictor))
+    logger.info(f"Forecast scheduler started for {', '.join(FORECAST_AREAS)}")
+
+
+async def stop_scheduler():
+    """スケジューラーを停止"""
+    global _scheduler_task
+    if _scheduler_task is None:
+        return
+    _scheduler_task.cancel()
+    try:
+        await _scheduler_task
+    except asyncio.CancelledError:
+        pass
+    _scheduler_task = None
+    logger.info("Forecast scheduler stopped")
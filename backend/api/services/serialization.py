@@ -0,0 +1,97 @@
+"""
+レスポンスのシリアライズ
+
+numpy配列を含む辞書のJSON化と、Arrow IPC形式への変換を行います。
+orjson / pyarrow は requirements.txt に含めていますが、なくても起動できるよう読み込みは任意にしています。
+orjson がなければ標準の json、pyarrow がなければArrow形式は使えません（ValueErrorになる）。
+"""
+
+import json
+import numpy as np
+from fastapi.responses import Response
+from .metrics import timed, timed_function
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _to_builtin(value):
+    """標準の json で扱えるように numpy配列をリストに変換"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: _to_builtin(item) for key, item in value.items()}
+    return value
+
+
+@timed_function("serialize.json")
+def dumps(content: dict) -> bytes:
+    """
+    numpy配列を含む辞書をJSONのバイト列に変換
+
+    orjson があれば配列を直接シリアライズする（NaNはnullになる）。
+
+    Args:
+        content: 辞書（値に numpy配列を含められる）
+
+    Returns:
+        UTF-8のJSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_to_builtin(content), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(content: dict, headers: dict = None) -> Response:
+    """
+    numpy配列を含む辞書をJSONレスポンスに変換
+
+    Args:
+        content: レスポンスの辞書（値に numpy配列を含められる）
+        headers: 追加のレスポンスヘッダー
+
+    Returns:
+        Response
+    """
+    return Response(content=dumps(content), media_type="application/json", headers=headers)
+
+
+def require_arrow():
+    """pyarrow がなければ ValueError"""
+    if pa is None:
+        raise ValueError("Arrow format requires pyarrow (pip install pyarrow)")
+
+
+def arrow_response(columns: dict, metadata: dict = None, headers: dict = None) -> Response:
+    """
+    列の配列を1つのレコードバッチにしてArrow IPCストリーム形式のレスポンスに変換
+
+    Args:
+        columns: {列名: numpy配列}（長さはすべて同じ）
+        metadata: スキーマのメタデータ（値は文字列に変換される）
+        headers: 追加のレスポンスヘッダー
+
+    Returns:
+        Response
+    """
+    require_arrow()
+
+    with timed("serialize.arrow"):
+        batch = pa.RecordBatch.from_pydict({name: pa.array(values) for name, values in columns.items()})
+        if metadata:
+            batch = batch.replace_schema_metadata({key: str(value) for key, value in metadata.items()})
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
@@ -1,10 +1,23 @@
+import asyncio
 import httpx
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Optional
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# リクエスト全体の時間予算（backend/vercel.json の maxDuration と揃える）
+REQUEST_BUDGET_SECONDS = 10.0
+
+# 気象予報取得に割り当てる残り予算の割合と上限
+WEATHER_BUDGET_RATIO = 0.5
+WEATHER_TIMEOUT_SECONDS = 10.0
+
+# この割合の時間が経っても応答がなければ2本目のリクエストを投げる（ヘッジ）
+HEDGE_DELAY_RATIO = 0.4
+
 
 class WeatherService:
     """Open-Meteo API連携サービス"""
@@ -18,13 +31,42 @@ class WeatherService:
         "nagoya": {"lat": 35.1815, "lon": 136.9066, "name": "名古屋"},
     }
 
-    async def fetch_forecast(self, area: str = "tokyo", hours: int = 48) -> pd.DataFrame:
+    # 最後に取得できた気象予報（エリア → (時間単位DataFrame, 取得時刻)）
+    _forecast_cache = {}
+
+    @classmethod
+    def cached_fetched_at(cls, area: str) -> Optional[str]:
+        """
+        キャッシュした気象予報の取得時刻を取得（上流には問い合わせない）
+
+        Args:
+            area: 対象エリア
+
+        Returns:
+            取得時刻（attrs["fetched_at"] と同じ形式、キャッシュがなければNone）
+        """
+        cached = cls._forecast_cache.get(area)
+        if cached is None:
+            return None
+        return cached[1].isoformat()
+
+    async def fetch_forecast(
+        self,
+        area: str = "tokyo",
+        hours: int = 48,
+        deadline: Optional[float] = None
+    ) -> pd.DataFrame:
         """
         気象予報を取得
 
+        deadline までに取得できない場合は、直近にキャッシュした予報で代替する。
+        代替したかどうかは戻り値の attrs["stale"] に、
+        予報の取得時刻は attrs["fetched_at"] に入る。
+
         Args:
             area: 対象エリア（tokyo, osaka, nagoya）
             hours: 予報時間数（デフォルト48時間）
+            deadline: リクエスト全体の期限（time.monotonic() 基準、None なら制限なし）
 
         Returns:
             気象予報データのDataFrame
@@ -42,11 +84,13 @@ class WeatherService:
             "timezone": "Asia/Tokyo"
         }
 
+        timeout = self._weather_timeout(deadline)
+
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(self.BASE_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
+            if timeout <= 0:
+                raise asyncio.TimeoutError("No time budget left for weather fetch")
+
+            data = await self._get_with_hedge(params, timeout)
 
             logger.info(f"Fetched weather forecast for {area}")
 
@@ -59,21 +103,129 @@ class WeatherService:
                 "solar_radiation": hourly.get("shortwave_radiation", [0] * len(hourly["time"]))
             })
 
-            # 指定時間数分のみ返す
-            df = df.head(hours)
-
-            # 30分単位に変換（時間単位のデータを補間）
-            df_30min = self._resample_to_30min(df)
-
-            return df_30min
-
-        except httpx.HTTPError as e:
-            logger.error(f"Failed to fetch weather data: {e}")
-            raise
+            fetched_at = datetime.now()
+            self._forecast_cache[area] = (df, fetched_at)
+
+            return self._to_forecast(df, hours, fetched_at, stale=False)
+
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            cached = self._forecast_cache.get(area)
+            if cached is None:
+                logger.error(f"Failed to fetch weather data: {e}")
+                raise
+
+            df, fetched_at = cached
+            # 予報の先頭を当日0時に揃える（新規取得時と同じ起点）
+            today = pd.Timestamp(datetime.now()).normalize()
+            df = df[df["timestamp"] >= today]
+            if df.empty:
+                logger.error(f"Failed to fetch weather data and cached forecast is outdated: {e}")
+                raise
+
+            logger.warning(
+                f"Weather fetch for {area} failed ({e!r}); "
+                f"using cached forecast fetched at {fetched_at.isoformat()}"
+            )
+            return self._to_forecast(df, hours, fetched_at, stale=True)
         except Exception as e:
             logger.error(f"Unexpected error in weather fetch: {e}")
             raise
 
+    def _weather_timeout(self, deadline: Optional[float]) -> float:
+        """
+        気象予報取得に使うタイムアウト秒数を残り予算から決める
+
+        Args:
+            deadline: リクエスト全体の期限（time.monotonic() 基準）
+
+        Returns:
+            タイムアウト秒数（予算切れなら0以下）
+        """
+        if deadline is None:
+            return WEATHER_TIMEOUT_SECONDS
+
+        remaining = deadline - time.monotonic()
+        return min(WEATHER_TIMEOUT_SECONDS, remaining * WEATHER_BUDGET_RATIO)
+
+    async def _get_with_hedge(self, params: dict, timeout: float) -> dict:
+        """
+        Open-Meteo へのリクエストを、遅い場合は2本目を並走させて実行
+
+        1本目が timeout * HEDGE_DELAY_RATIO 秒以内に応答しない、または失敗した場合に
+        2本目を投げ、先に成功した方の結果を使う。
+
+        Args:
+            params: クエリパラメータ
+            timeout: 全体のタイムアウト秒数
+
+        Returns:
+            レスポンスJSON
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + timeout
+        hedge_at = loop.time() + timeout * HEDGE_DELAY_RATIO
+
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async def attempt():
+                response = await client.get(self.BASE_URL, params=params)
+                response.raise_for_status()
+                return response.json()
+
+            pending = {asyncio.ensure_future(attempt())}
+            hedged = False
+            last_error = None
+
+            try:
+                while pending:
+                    wait_until = end if hedged else min(end, hedge_at)
+                    wait_for = wait_until - loop.time()
+                    if wait_for > 0:
+                        done, pending = await asyncio.wait(
+                            pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            if task.exception() is None:
+                                return task.result()
+                            last_error = task.exception()
+
+                    if loop.time() >= end:
+                        break
+                    if not hedged:
+                        hedged = True
+                        logger.info("Weather fetch is slow; sending hedged request")
+                        pending.add(asyncio.ensure_future(attempt()))
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if last_error is not None:
+            raise last_error
+        raise asyncio.TimeoutError(f"Weather fetch exceeded {timeout:.2f}s budget")
+
+    def _to_forecast(self, df: pd.DataFrame, hours: int, fetched_at: datetime, stale: bool) -> pd.DataFrame:
+        """
+        時間単位の予報を指定時間数・30分単位に整形
+
+        Args:
+            df: 時間単位のDataFrame
+            hours: 予報時間数
+            fetched_at: 予報の取得時刻
+            stale: キャッシュで代替したかどうか
+
+        Returns:
+            30分単位のDataFrame
+        """
+        # 指定時間数分のみ返す
+        df = df.head(hours)
+
+        # 30分単位に変換（時間単位のデータを補間）
+        df_30min = self._resample_to_30min(df)
+        df_30min.attrs["fetched_at"] = fetched_at.isoformat()
+        df_30min.attrs["stale"] = stale
+
+        return df_30min
+
     def _resample_to_30min(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         時間単位のデータを30分単位に補間
@@ -0,0 +1,61 @@
+-- 時刻を DATETIME 文字列から UNIX秒（INTEGER）に変更し、
+-- 実績テーブルを (area, timestamp) でクラスタ化した WITHOUT ROWID テーブルにする
+-- （日本時間の文字列は -32400秒 してUNIX秒に変換、created_at はUTCのまま変換）
+
+DROP INDEX IF EXISTS idx_generation_area_time;
+DROP INDEX IF EXISTS idx_price_area_time;
+DROP INDEX IF EXISTS idx_predictions_area_type_time;
+ALTER TABLE generation_actual RENAME TO generation_actual_old;
+ALTER TABLE price_actual RENAME TO price_actual_old;
+ALTER TABLE predictions RENAME TO predictions_old;
+
+CREATE TABLE generation_actual (
+    area TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    pv_mw REAL,
+    wind_mw REAL,
+    total_mw REAL,
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    PRIMARY KEY (area, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX idx_generation_time ON generation_actual(timestamp);
+
+CREATE TABLE price_actual (
+    area TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    price_yen REAL NOT NULL,
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    PRIMARY KEY (area, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX idx_price_time ON price_actual(timestamp);
+
+CREATE TABLE predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    area TEXT NOT NULL,
+    target_type TEXT NOT NULL,
+    forecast_timestamp INTEGER NOT NULL,
+    predicted_value REAL NOT NULL,
+    actual_value REAL,
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+);
+CREATE INDEX idx_predictions_area_type_time ON predictions(area, target_type, forecast_timestamp);
+
+INSERT OR REPLACE INTO generation_actual (area, timestamp, pv_mw, wind_mw, total_mw, created_at)
+    SELECT area, CAST(strftime('%s', timestamp) AS INTEGER) - 32400, pv_mw, wind_mw, total_mw,
+           COALESCE(CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+    FROM generation_actual_old ORDER BY id;
+
+INSERT OR REPLACE INTO price_actual (area, timestamp, price_yen, created_at)
+    SELECT area, CAST(strftime('%s', timestamp) AS INTEGER) - 32400, price_yen,
+           COALESCE(CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+    FROM price_actual_old ORDER BY id;
+
+INSERT INTO predictions (id, area, target_type, forecast_timestamp, predicted_value, actual_value, created_at)
+    SELECT id, area, target_type, CAST(strftime('%s', forecast_timestamp) AS INTEGER) - 32400,
+           predicted_value, actual_value,
+           COALESCE(CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+    FROM predictions_old;
+
+DROP TABLE generation_actual_old;
+DROP TABLE price_actual_old;
+DROP TABLE predictions_old;
@@ -0,0 +1,5 @@
+-- シードスナップショットのバージョン管理用のメタ情報テーブル
+CREATE TABLE IF NOT EXISTS db_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
@@ -0,0 +1,133 @@
+"""
+ロールアップテーブルを追加し、既存の実績・予測誤差を集計する
+
+元テーブルを主キーの順に batch_size 行ずつ読み、その行を含むエリア・日（日本時間）を
+元データから集計し直す。進み具合（最後に読んだ行の主キー）を db_meta の
+rollups_backfill_cursor に記録する（途中で止まっても続きから再開できる）。
+"""
+
+import json
+
+CURSOR_KEY = 'rollups_backfill_cursor'
+JST_OFFSET_SECONDS = 9 * 3600
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS rollups (
+        metric TEXT NOT NULL,
+        area TEXT NOT NULL,
+        resolution INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        value_count INTEGER NOT NULL,
+        value_sum REAL NOT NULL,
+        value_min REAL NOT NULL,
+        value_max REAL NOT NULL,
+        PRIMARY KEY (metric, area, resolution, bucket)
+    ) WITHOUT ROWID
+"""
+
+ERROR_EXPR = "ABS(actual_value - predicted_value) * 100.0 / ABS(actual_value)"
+ERROR_CONDITION = "AND target_type = '{}' AND actual_value IS NOT NULL AND actual_value != 0"
+
+# 元テーブルごとの (時刻の列, 主キーの列, [(metric, 値の式, 条件)])
+SOURCES = [
+    ('generation_actual', 'timestamp', ['area', 'timestamp'], [
+        ('pv_mw', 'pv_mw', ''),
+        ('wind_mw', 'wind_mw', ''),
+        ('total_mw', 'total_mw', '')
+    ]),
+    ('price_actual', 'timestamp', ['area', 'timestamp'], [
+        ('price_yen', 'price_yen', '')
+    ]),
+    ('predictions', 'forecast_timestamp', ['id'], [
+        ('generation_error', ERROR_EXPR, ERROR_CONDITION.format('generation')),
+        ('price_error', ERROR_EXPR, ERROR_CONDITION.format('price'))
+    ])
+]
+
+
+def upgrade(conn):
+    conn.execute(CREATE_SQL)
+
+
+def _day_start(epoch: int) -> int:
+    """日本時間の0時に切り捨て"""
+    return (epoch + JST_OFFSET_SECONDS) // 86400 * 86400 - JST_OFFSET_SECONDS
+
+
+def _aggregate(conn, table: str, ts_col: str, metrics: list, area: str, start: int, end: int):
+    """エリアの [start, end) の1時間・1日のバケットを集計（期間は日の境界に揃っている）"""
+    for metric, value_expr, condition in metrics:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO rollups
+                (metric, area, resolution, bucket, value_count, value_sum, value_min, value_max)
+            SELECT ?, ?, 3600, {ts_col} / 3600 * 3600 AS bucket, COUNT(v), SUM(v), MIN(v), MAX(v)
+            FROM (
+                SELECT {ts_col}, {value_expr} AS v FROM {table}
+                WHERE area = ? AND {ts_col} >= ? AND {ts_col} < ? {condition}
+            )
+            WHERE v IS NOT NULL
+            GROUP BY bucket
+        """, (metric, area, area, start, end))
+
+        conn.execute(f"""
+            INSERT OR REPLACE INTO rollups
+                (metric, area, resolution, bucket, value_count, value_sum, value_min, value_max)
+            SELECT metric, area, 86400,
+                   (bucket + {JST_OFFSET_SECONDS}) / 86400 * 86400 - {JST_OFFSET_SECONDS} AS day,
+                   SUM(value_count), SUM(value_sum), MIN(value_min), MAX(value_max)
+            FROM rollups
+            WHERE metric = ? AND area = ? AND resolution = 3600 AND bucket >= ? AND bucket < ?
+            GROUP BY day
+        """, (metric, area, start, end))
+
+
+def _read_cursor(conn):
+    """(元テーブルの番号, 最後に読んだ行の主キー) を取得（読めなければ先頭から）"""
+    row = conn.execute("SELECT value FROM db_meta WHERE key = ?", (CURSOR_KEY,)).fetchone()
+    try:
+        index, last_key = json.loads(row[0])
+        return int(index), last_key
+    except (TypeError, ValueError):
+        return 0, None
+
+
+def backfill(conn, batch_size: int) -> int:
+    """
+    元テーブルの次の batch_size 行を含むエリア・日を集計
+
+    主キーの範囲で読むため、バッチごとにテーブル全体を走査しない。
+
+    Returns:
+        読んだ元データの行数（すべて終わったら0）
+    """
+    index, last_key = _read_cursor(conn)
+
+    while index < len(SOURCES):
+        table, ts_col, key_cols, metrics = SOURCES[index]
+        keys = ', '.join(key_cols)
+        if last_key is None:
+            where, params = '', ()
+        else:
+            where, params = f"WHERE ({keys}) > ({', '.join('?' * len(key_cols))})", tuple(last_key)
+        rows = conn.execute(
+            f"SELECT {keys}, area, {ts_col} FROM {table} {where} ORDER BY {keys} LIMIT ?",
+            params + (batch_size,)
+        ).fetchall()
+
+        if not rows:
+            index, last_key = index + 1, None
+            continue
+
+        days = sorted({(row[-2], _day_start(row[-1])) for row in rows})
+        for area, day in days:
+            _aggregate(conn, table, ts_col, metrics, area, day, day + 86400)
+
+        last_key = list(rows[-1][:len(key_cols)])
+        conn.execute(
+            "INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)",
+            (CURSOR_KEY, json.dumps([index, last_key]))
+        )
+        return len(rows)
+
+    conn.execute("DELETE FROM db_meta WHERE key = ?", (CURSOR_KEY,))
+    return 0
@@ -0,0 +1,16 @@
+-- 予測の事前計算の実行状況と最新の予測（スナップショット）
+CREATE TABLE IF NOT EXISTS forecast_runs (
+    area TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    lease_until INTEGER NOT NULL,
+    hours INTEGER,
+    start INTEGER,
+    step_seconds INTEGER,
+    generation BLOB,
+    price BLOB,
+    stale_inputs INTEGER,
+    weather_fetched_at TEXT,
+    generated_at TEXT,
+    PRIMARY KEY (area, slot)
+) WITHOUT ROWID;
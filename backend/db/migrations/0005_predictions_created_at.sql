@@ -0,0 +1,2 @@
+-- 予測の登録時刻での絞り込み（/history・/accuracy と保持期間を過ぎた予測の削除）用
+CREATE INDEX IF NOT EXISTS idx_predictions_area_created ON predictions(area, created_at);
@@ -1,39 +1,48 @@
--- 発電量実績
-CREATE TABLE generation_actual (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
+-- 新規DB用の最新スキーマ
+-- スキーマを変更する場合は db/migrations/ にマイグレーションを追加し、このファイルも同じ内容に更新する
+
+-- 実績・予測の時刻は UNIX秒（INTEGER）で保存する
+-- timestamp / forecast_timestamp は日本時間（UTC+9）の30分単位、created_at は登録時刻
+
+-- 発電量実績（area, timestamp でクラスタ化）
+CREATE TABLE IF NOT EXISTS generation_actual (
     area TEXT NOT NULL,           -- 'tokyo'
-    timestamp DATETIME NOT NULL,  -- 30分単位
+    timestamp INTEGER NOT NULL,   -- 30分単位
     pv_mw REAL,                   -- 太陽光発電量 (MW)
     wind_mw REAL,                 -- 風力発電量 (MW)
     total_mw REAL,                -- PV+Wind合計
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-);
-CREATE INDEX idx_generation_area_time ON generation_actual(area, timestamp);
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    PRIMARY KEY (area, timestamp)
+) WITHOUT ROWID;
+-- 全エリアの最新時刻（MAX(timestamp)）用
+CREATE INDEX IF NOT EXISTS idx_generation_time ON generation_actual(timestamp);
 
--- 価格実績
-CREATE TABLE price_actual (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
+-- 価格実績（area, timestamp でクラスタ化）
+CREATE TABLE IF NOT EXISTS price_actual (
     area TEXT NOT NULL,
-    timestamp DATETIME NOT NULL,  -- 30分単位
+    timestamp INTEGER NOT NULL,   -- 30分単位
     price_yen REAL NOT NULL,      -- スポット価格 (円/kWh)
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-);
-CREATE INDEX idx_price_area_time ON price_actual(area, timestamp);
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    PRIMARY KEY (area, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_price_time ON price_actual(timestamp);
 
 -- 予測結果
-CREATE TABLE predictions (
+CREATE TABLE IF NOT EXISTS predictions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     area TEXT NOT NULL,
     target_type TEXT NOT NULL,     -- 'generation' or 'price'
-    forecast_timestamp DATETIME NOT NULL,  -- 予測対象時刻
+    forecast_timestamp INTEGER NOT NULL,  -- 予測対象時刻
     predicted_value REAL NOT NULL,
     actual_value REAL,             -- 実績が入ったら更新
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
 );
-CREATE INDEX idx_predictions_area_type_time ON predictions(area, target_type, forecast_timestamp);
+CREATE INDEX IF NOT EXISTS idx_predictions_area_type_time ON predictions(area, target_type, forecast_timestamp);
+-- 登録時刻での絞り込み（/history・/accuracy と保持期間を過ぎた予測の削除）用
+CREATE INDEX IF NOT EXISTS idx_predictions_area_created ON predictions(area, created_at);
 
 -- 気象予報データ
-CREATE TABLE weather_forecast (
+CREATE TABLE IF NOT EXISTS weather_forecast (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     area TEXT NOT NULL,
     timestamp DATETIME NOT NULL,
@@ -42,4 +51,41 @@ CREATE TABLE weather_forecast (
     temperature REAL,              -- ℃
     fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
-CREATE INDEX idx_weather_area_time ON weather_forecast(area, timestamp);
+CREATE INDEX IF NOT EXISTS idx_weather_area_time ON weather_forecast(area, timestamp);
+
+-- DBのメタ情報（シードスナップショットのバージョンなど）
+CREATE TABLE IF NOT EXISTS db_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- 長期間のグラフ用のロールアップ（1時間・1日ごとの件数・合計・最小・最大）
+CREATE TABLE IF NOT EXISTS rollups (
+    metric TEXT NOT NULL,          -- 'pv_mw' / 'wind_mw' / 'total_mw' / 'price_yen' / 'generation_error' / 'price_error'
+    area TEXT NOT NULL,
+    resolution INTEGER NOT NULL,   -- バケット幅（秒）: 3600 / 86400
+    bucket INTEGER NOT NULL,       -- バケットの開始時刻（1日は日本時間の0時）
+    value_count INTEGER NOT NULL,
+    value_sum REAL NOT NULL,
+    value_min REAL NOT NULL,
+    value_max REAL NOT NULL,
+    PRIMARY KEY (metric, area, resolution, bucket)
+) WITHOUT ROWID;
+
+-- 予測の事前計算の実行状況と最新の予測（スナップショット）
+-- 各エリア・30分枠を実行権を取った1つのワーカーだけが計算する
+CREATE TABLE IF NOT EXISTS forecast_runs (
+    area TEXT NOT NULL,
+    slot INTEGER NOT NULL,         -- 30分枠の開始時刻
+    status TEXT NOT NULL,          -- 'running' / 'done'
+    lease_until INTEGER NOT NULL,  -- 'running' のまま止まった枠を他のワーカーが引き継げる時刻
+    hours INTEGER,                 -- 予測時間数
+    start INTEGER,                 -- 先頭の予測対象時刻
+    step_seconds INTEGER,          -- 予測の間隔（秒）
+    generation BLOB,               -- 発電量予測（float32 の配列）
+    price BLOB,                    -- 価格予測（float32 の配列）
+    stale_inputs INTEGER,          -- キャッシュした気象予報で代替したか
+    weather_fetched_at TEXT,
+    generated_at TEXT,
+    PRIMARY KEY (area, slot)
+) WITHOUT ROWID;
@@ -0,0 +1,210 @@
+"""
+実績テーブルの代表的なクエリのベンチマーク
+
+一時DBにスキーマを作成して合成データ（全エリア・30分単位）を投入し、
+最新N件・期間指定の範囲スキャン・MAX(timestamp)・1年分の日次集計（元データ / ロールアップ）の
+実行時間と、1週間・1か月・1年の範囲取得（列ごとの配列 / 行の辞書 / 発電量と価格の結合）の
+実行時間を計測します。
+"""
+
+import numpy as np
+import pandas as pd
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.services.db import (
+    save_generation_data, save_price_data, to_epoch, get_actuals_range, align_actuals,
+    DAILY_SECONDS, JST_OFFSET_SECONDS
+)
+from api.services.migrations import create_schema
+
+AREAS = ['hokkaido', 'tohoku', 'tokyo', 'chubu', 'hokuriku', 'kansai', 'chugoku', 'shikoku', 'kyushu']
+
+
+def populate(conn, years: int):
+    """
+    合成データを投入
+
+    Args:
+        conn: DB接続
+        years: 投入する年数
+
+    Returns:
+        投入した期間の終了時刻
+    """
+    end = pd.Timestamp('2026-01-01')
+    timestamps = pd.date_range(end - pd.DateOffset(years=years), end, freq='30min', inclusive='left')
+    rng = np.random.default_rng(0)
+
+    for area in AREAS:
+        values = rng.random(len(timestamps)) * 1000
+        save_generation_data(conn, pd.DataFrame({
+            'timestamp': timestamps,
+            'pv_mw': values,
+            'wind_mw': values / 10,
+            'total_mw': values * 1.1
+        }), area)
+        save_price_data(conn, pd.DataFrame({
+            'timestamp': timestamps,
+            'price_yen': rng.random(len(timestamps)) * 30
+        }), area)
+
+    return end
+
+
+def measure(conn, sql: str, params: tuple, repeat: int) -> float:
+    """
+    クエリの実行時間を計測（最小値、ミリ秒）
+
+    Args:
+        conn: DB接続
+        sql: SQL
+        params: パラメータ
+        repeat: 繰り返し回数
+
+    Returns:
+        最小実行時間（ミリ秒）
+    """
+    return measure_call(lambda: conn.execute(sql, params).fetchall(), repeat)
+
+
+def measure_call(func, repeat: int) -> float:
+    """
+    関数の実行時間を計測（最小値、ミリ秒）
+
+    Args:
+        func: 引数なしの関数
+        repeat: 繰り返し回数
+
+    Returns:
+        最小実行時間（ミリ秒）
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def fetch_row_dicts(conn, area: str, start: int, end: int) -> list:
+    """比較用: 範囲の発電量を sqlite3.Row で読んで行ごとの辞書にする"""
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("""
+            SELECT timestamp, pv_mw, wind_mw, total_mw FROM generation_actual
+            WHERE area = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp
+        """, (area, start, end)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.row_factory = None
+
+
+def run_range_benchmark(conn, end, repeat: int):
+    """
+    1週間・1か月・1年の範囲取得を計測して表示
+
+    Args:
+        conn: DB接続
+        end: 範囲の終了時刻
+        repeat: 繰り返し回数
+    """
+    range_end = to_epoch(end)
+
+    print(f"\n{'range (tokyo)':<14} {'rows':>6} {'columnar ms':>12} {'row dicts ms':>13} {'joined ms':>10}")
+    for name, offset in [('week', pd.DateOffset(weeks=1)), ('month', pd.DateOffset(months=1)),
+                         ('year', pd.DateOffset(years=1))]:
+        range_start = to_epoch(end - offset)
+        rows = len(get_actuals_range(conn, 'generation', 'tokyo', range_start, range_end)['timestamp'])
+
+        columnar = measure_call(
+            lambda: get_actuals_range(conn, 'generation', 'tokyo', range_start, range_end), repeat)
+        row_dicts = measure_call(lambda: fetch_row_dicts(conn, 'tokyo', range_start, range_end), repeat)
+        joined = measure_call(lambda: align_actuals(
+            get_actuals_range(conn, 'generation', 'tokyo', range_start, range_end),
+            get_actuals_range(conn, 'price', 'tokyo', range_start, range_end)
+        ), repeat)
+
+        print(f"{name:<14} {rows:>6} {columnar:>12.3f} {row_dicts:>13.3f} {joined:>10.3f}")
+
+    for table in ('generation_actual', 'price_actual'):
+        plan = '; '.join(row[3] for row in conn.execute(f"""
+            EXPLAIN QUERY PLAN SELECT * FROM {table}
+            WHERE area = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp
+        """, ('tokyo', 0, range_end)))
+        print(f"plan {table}: {plan}")
+
+
+def run_benchmark(years: int = 3, repeat: int = 20):
+    """
+    ベンチマークを実行して結果を表示
+
+    Args:
+        years: 投入する年数
+        repeat: クエリごとの繰り返し回数
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(str(Path(tmp_dir) / 'benchmark.db'))
+        create_schema(conn)
+
+        start = time.perf_counter()
+        end = populate(conn, years)
+        count = conn.execute("SELECT COUNT(*) FROM generation_actual").fetchone()[0]
+        print(f"Populated {count} generation rows x 2 tables ({len(AREAS)} areas, {years} years) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        range_start = to_epoch(end - pd.DateOffset(months=1))
+        range_end = to_epoch(end)
+        year_start = to_epoch(end - pd.DateOffset(years=1))
+
+        queries = [
+            ('latest-200 (generation, tokyo)', """
+                SELECT area, timestamp, pv_mw, wind_mw, total_mw FROM generation_actual
+                WHERE area = ? ORDER BY timestamp DESC LIMIT 200
+            """, ('tokyo',)),
+            ('range 1 month (price, tokyo)', """
+                SELECT timestamp, price_yen FROM price_actual
+                WHERE area = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp
+            """, ('tokyo', range_start, range_end)),
+            ('MAX(timestamp) (generation, tokyo)', """
+                SELECT MAX(timestamp) FROM generation_actual WHERE area = ?
+            """, ('tokyo',)),
+            ('MAX(timestamp) (generation, all)', """
+                SELECT MAX(timestamp) FROM generation_actual
+            """, ()),
+            ('daily 1 year, raw (generation, tokyo)', f"""
+                SELECT (timestamp + {JST_OFFSET_SECONDS}) / 86400 AS day, MIN(total_mw), AVG(total_mw), MAX(total_mw)
+                FROM generation_actual
+                WHERE area = ? AND timestamp >= ? AND timestamp < ? GROUP BY day
+            """, ('tokyo', year_start, range_end)),
+            ('daily 1 year, rollups (generation, tokyo)', """
+                SELECT bucket, value_min, value_sum / value_count, value_max FROM rollups
+                WHERE metric = 'total_mw' AND area = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+            """, ('tokyo', DAILY_SECONDS, year_start, range_end)),
+        ]
+
+        print(f"\n{'query':<42} {'ms (min of ' + str(repeat) + ')':>16}  plan")
+        for name, sql, params in queries:
+            elapsed = measure(conn, sql, params, repeat)
+            plan = '; '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            print(f"{name:<42} {elapsed:>16.3f}  {plan}")
+
+        run_range_benchmark(conn, end, repeat)
+
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='実績テーブルのクエリベンチマーク')
+    parser.add_argument('--years', type=int, default=3, help='投入する年数（デフォルト: 3）')
+    parser.add_argument('--repeat', type=int, default=20, help='クエリごとの繰り返し回数（デフォルト: 20）')
+    args = parser.parse_args()
+
+    run_benchmark(args.years, args.repeat)
@@ -0,0 +1,121 @@
+"""
+シードデータを取り込んだSQLiteスナップショットを作成
+
+ml/data/seed のCSVをスキーマ適用済みのDBに取り込み、VACUUMして
+backend/db/seed.db に保存します。サーバーレス関数のコールドスタート時は
+init_database() がこのファイルを /tmp にコピーするだけで済みます。
+
+バージョンはスキーマと入力ファイルの内容のハッシュで、データの最終時刻と一緒に
+db_meta テーブルに記録されます（既存のDBは置き換えず、バージョンが変わったときに足りない時刻の行だけを追加します）。
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SEED_DIR = Path(__file__).parent.parent.parent / 'ml' / 'data' / 'seed'
+
+DEFAULT_SPECS = [
+    str(SEED_DIR / 'generation_tokyo_tepco.csv'),
+    str(SEED_DIR / 'price_tokyo_sample.csv')
+]
+
+from api.services.db import SEED_DB_PATH
+from api.services.migrations import SCHEMA_PATH, create_schema, list_migrations
+from bulk_import import expand_specs, parse_file, merge_frames, write_data
+
+
+def seed_version(files: list) -> str:
+    """
+    スキーマ・マイグレーションと入力ファイルの内容からバージョンを計算
+
+    Args:
+        files: expand_specs() の戻り値
+
+    Returns:
+        バージョン文字列（MD5の先頭16文字）
+    """
+    md5_hash = hashlib.md5()
+    migration_paths = [path for _, _, path in list_migrations()]
+    for path in [SCHEMA_PATH] + migration_paths + [Path(path) for path, _ in files]:
+        md5_hash.update(path.read_bytes())
+    return md5_hash.hexdigest()[:16]
+
+
+def build_seed_db(specs: list, output: Path, default_area: str = 'tokyo'):
+    """
+    スナップショットを作成
+
+    Args:
+        specs: [AREA=]GLOB 形式のファイル指定（bulk_import.py と同じ）
+        output: 出力先のDBファイル
+        default_area: エリア指定がないファイルのエリア名
+    """
+    files = expand_specs(specs, default_area)
+    if not files:
+        print("Error: No input files")
+        sys.exit(1)
+
+    version = seed_version(files)
+    tmp_path = output.with_suffix('.db.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        create_schema(conn)
+
+        parsed = {}
+        for path, area in files:
+            for source, parsed_area, df in parse_file(path, area):
+                parsed.setdefault((source, parsed_area), []).append(df)
+
+        for (source, area), frames in sorted(parsed.items()):
+            df = merge_frames(frames)
+            if df.empty:
+                continue
+            write_data(conn, source, area, df, lambda rows: None)
+            print(f"  {source}/{area}: {len(df)} rows ({df['timestamp'].iloc[0]} to {df['timestamp'].iloc[-1]})")
+
+        data_until = conn.execute("""
+            SELECT MAX(latest) FROM (
+                SELECT MAX(timestamp) AS latest FROM generation_actual
+                UNION ALL
+                SELECT MAX(timestamp) AS latest FROM price_actual
+            )
+        """).fetchone()[0]
+
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", [
+                ('seed_version', version),
+                ('data_until', str(data_until or 0)),
+                ('built_at', datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+            ])
+
+        # コピーだけで開けるように1ファイルにまとめて詰める
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, output)
+    print(f"\n✓ Seed snapshot written to {output} "
+          f"(version {version}, {output.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='シードデータのSQLiteスナップショットを作成')
+    parser.add_argument('specs', nargs='*', default=DEFAULT_SPECS,
+                        help='[AREA=]GLOB 形式のファイル指定（デフォルト: ml/data/seed の東京データ）')
+    parser.add_argument('--area', default='tokyo', help='エリア指定がないファイルのエリア名（デフォルト: tokyo）')
+    parser.add_argument('--output', type=Path, default=SEED_DB_PATH,
+                        help='出力先（デフォルト: backend/db/seed.db）')
+    args = parser.parse_args()
+
+    build_seed_db(args.specs, args.output, args.area)
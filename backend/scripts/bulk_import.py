@@ -0,0 +1,301 @@
+"""
+複数のCSVファイルをまとめてデータベースにインポート
+
+ファイル形式（東京電力需給実績 / JEPXスポット / 価格CSV / 旧形式の発電量CSV）は
+1行目から自動判定します。パースは複数プロセスで並列に行い、同じソース・エリアで
+期間が重なるデータは後のファイルを優先して重複を除いたうえで、1つの接続から
+大きなトランザクションで書き込みます。
+"""
+
+import pandas as pd
+import argparse
+import glob
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# JEPXスポットCSVの抽出（ml/scripts/fetch_jepx_price.py）のパス
+ML_SCRIPTS_DIR = Path(__file__).parent.parent.parent / 'ml' / 'scripts'
+
+from api.services.db import init_database, get_db, series_to_epoch, refresh_rollups
+
+# 1トランザクションで書き込む行数
+BATCH_ROWS = 50000
+
+TEPCO_HEADER_MARKER = '単位[MW平均]'
+JEPX_HEADER_MARKER = '年月日'
+
+# ソースごとの列（timestamp以外、ロールアップの指標名と同じ）
+SOURCE_COLUMNS = {
+    'generation': ['pv_mw', 'wind_mw', 'total_mw'],
+    'price': ['price_yen']
+}
+
+INSERT_SQL = {
+    'generation': """
+        INSERT OR REPLACE INTO generation_actual (area, timestamp, pv_mw, wind_mw, total_mw)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    'price': """
+        INSERT OR REPLACE INTO price_actual (area, timestamp, price_yen)
+        VALUES (?, ?, ?)
+    """
+}
+
+def expand_specs(specs: list, default_area: str) -> list:
+    """
+    [AREA=]GLOB 形式の指定をファイルのリストに展開
+
+    Args:
+        specs: 指定のリスト（例: 'hokkaido=data/gen_hokkaido_*.csv'）
+        default_area: エリア指定がない場合のエリア名
+
+    Returns:
+        (ファイルパス, エリア名) のリスト（指定順、同じファイルは1回だけ）
+    """
+    files = []
+    seen = set()
+
+    for spec in specs:
+        area, pattern = spec.split('=', 1) if '=' in spec else (default_area, spec)
+        paths = sorted(glob.glob(pattern)) or ([pattern] if Path(pattern).exists() else [])
+        if not paths:
+            print(f"⚠ No files matched: {pattern}")
+
+        for path in paths:
+            if path not in seen:
+                seen.add(path)
+                files.append((path, area))
+
+    return files
+
+
+def detect_format(path: str) -> str:
+    """
+    1行目からファイル形式を判定
+
+    Args:
+        path: CSVファイルのパス
+
+    Returns:
+        'tepco' / 'jepx' / 'price' / 'generation'
+    """
+    with open(path, 'rb') as f:
+        first_line = f.readline()
+
+    if TEPCO_HEADER_MARKER.encode('utf-8') in first_line:
+        return 'tepco'
+    if JEPX_HEADER_MARKER.encode('shift-jis') in first_line:
+        return 'jepx'
+
+    columns = first_line.decode('utf-8').strip().split(',')
+    if 'price_yen' in columns:
+        return 'price'
+    if 'pv_mw' in columns:
+        return 'generation'
+
+    raise ValueError(f"Unknown file format: {path}")
+
+
+def parse_file(path: str, area: str) -> list:
+    """
+    1ファイルをパースしてソース・エリアごとのデータに変換（ワーカープロセスで実行）
+
+    Args:
+        path: CSVファイルのパス
+        area: エリア名（JEPXスポットCSVは全エリアを含むため無視）
+
+    Returns:
+        (source, area, DataFrame) のリスト。DataFrameは timestamp とソースの列を持つ
+    """
+    file_format = detect_format(path)
+
+    if file_format == 'tepco':
+        df = pd.read_csv(path, skiprows=1, usecols=['DATE', 'TIME', '太陽光発電実績', '風力発電実績'])
+        pv = df['太陽光発電実績'].astype(float)
+        wind = df['風力発電実績'].astype(float)
+        return [('generation', area, pd.DataFrame({
+            'timestamp': pd.to_datetime(df['DATE'] + ' ' + df['TIME'], format='%Y/%m/%d %H:%M'),
+            'pv_mw': pv,
+            'wind_mw': wind,
+            'total_mw': pv + wind
+        }))]
+
+    if file_format == 'jepx':
+        sys.path.insert(0, str(ML_SCRIPTS_DIR))
+        from fetch_jepx_price import extract_all_area_prices
+
+        prices = extract_all_area_prices(path)
+        return [
+            ('price', str(jepx_area), area_prices[['timestamp', 'price_yen']].reset_index(drop=True))
+            for jepx_area, area_prices in prices.groupby('area', observed=True)
+        ]
+
+    df = pd.read_csv(path, parse_dates=['timestamp'])
+
+    if file_format == 'price':
+        return [('price', area, df[['timestamp', 'price_yen']])]
+
+    # 旧形式の発電量CSV
+    if 'total_mw' not in df.columns:
+        df['total_mw'] = df.get('renewable_total_mw', df['pv_mw'] + df['wind_mw'])
+    return [('generation', area, df[['timestamp', 'pv_mw', 'wind_mw', 'total_mw']])]
+
+
+def parse_files(files: list, workers: int) -> dict:
+    """
+    ファイルを並列にパースしてソース・エリアごとにまとめる
+
+    Args:
+        files: expand_specs() の戻り値
+        workers: ワーカープロセス数
+
+    Returns:
+        ({(source, area): DataFrame のリスト（ファイル指定順）}, パースできなかったファイルのリスト)
+    """
+    results = {}
+    failed = []
+    total_rows = 0
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(parse_file, path, area): i for i, (path, area) in enumerate(files)}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            path = files[index][0]
+            try:
+                parts = future.result()
+            except Exception as e:
+                print(f"  [{done}/{len(files)}] ✗ {path}: {e}")
+                failed.append(path)
+                continue
+
+            rows = sum(len(df) for _, _, df in parts)
+            total_rows += rows
+            for source, area, df in parts:
+                results.setdefault((source, area), []).append((index, df))
+
+            elapsed = time.time() - start
+            print(f"  [{done}/{len(files)}] {path}: {rows} rows "
+                  f"({total_rows / max(elapsed, 1e-6):,.0f} rows/sec)")
+
+    # 後で指定したファイルを優先するため、指定順に並べ直す
+    ordered = {key: [df for _, df in sorted(parts, key=lambda part: part[0])] for key, parts in results.items()}
+    return ordered, failed
+
+
+def merge_frames(frames: list) -> pd.DataFrame:
+    """
+    期間が重なるデータを統合（同じ時刻は後のファイルの値を使う）
+
+    Args:
+        frames: DataFrameのリスト（ファイル指定順）
+
+    Returns:
+        DataFrame: timestamp で重複を除いて時系列順に並べたデータ
+    """
+    df = pd.concat(frames, ignore_index=True)
+    df = df.dropna(subset=['timestamp']).drop_duplicates(subset='timestamp', keep='last')
+    return df.sort_values('timestamp', ignore_index=True)
+
+
+def write_data(conn, source: str, area: str, df: pd.DataFrame, progress):
+    """
+    1ソース・エリア分のデータを書き込む
+
+    BATCH_ROWS 行ずつ1トランザクションで挿入（同じ時刻は上書き）し、同じトランザクションで
+    そのバッチの範囲のロールアップを更新する。取り込むファイルにない時刻の既存データは残すため、
+    途中で失敗しても、コミット済みのバッチの時刻が新しい値になるだけで既存データは失われない。
+
+    Args:
+        conn: DB接続
+        source: 'generation' または 'price'
+        area: エリア名
+        df: merge_frames() の戻り値
+        progress: 挿入した行数を受け取るコールバック
+    """
+    timestamps = series_to_epoch(df['timestamp']).tolist()
+    values = [df[col].astype(float).tolist() for col in SOURCE_COLUMNS[source]]
+    rows = list(zip([area] * len(df), timestamps, *values))
+
+    for offset in range(0, len(rows), BATCH_ROWS):
+        batch = rows[offset:offset + BATCH_ROWS]
+        with conn:
+            conn.executemany(INSERT_SQL[source], batch)
+            refresh_rollups(conn, SOURCE_COLUMNS[source], area,
+                            timestamps[offset], timestamps[offset + len(batch) - 1])
+        progress(len(batch))
+
+
+def bulk_import(specs: list, default_area: str = 'tokyo', workers: int = None):
+    """
+    複数ファイルをまとめてインポート
+
+    Args:
+        specs: [AREA=]GLOB 形式の指定のリスト
+        default_area: エリア指定がない場合のエリア名
+        workers: パースのワーカープロセス数（Noneならコア数）
+    """
+    files = expand_specs(specs, default_area)
+    if not files:
+        print("Error: No input files")
+        sys.exit(1)
+
+    print(f"Parsing {len(files)} files...")
+    parsed, failed = parse_files(files, workers)
+
+    merged = {key: merge_frames(frames) for key, frames in sorted(parsed.items())}
+    total_rows = sum(len(df) for df in merged.values())
+
+    print(f"\nWriting {total_rows} rows ({len(merged)} source/area pairs)...")
+
+    init_database()
+    conn = get_db()
+
+    written = 0
+    start = time.time()
+
+    def progress(rows: int):
+        nonlocal written
+        written += rows
+        elapsed = time.time() - start
+        print(f"  {written}/{total_rows} rows ({written / max(elapsed, 1e-6):,.0f} rows/sec)")
+
+    try:
+        for (source, area), df in merged.items():
+            if df.empty:
+                continue
+            print(f"  {source}/{area}: {len(df)} rows "
+                  f"({df['timestamp'].iloc[0]} to {df['timestamp'].iloc[-1]})")
+            write_data(conn, source, area, df, progress)
+    finally:
+        conn.close()
+
+    elapsed = time.time() - start
+    print(f"\n✓ Imported {written} rows in {elapsed:.2f}s ({written / max(elapsed, 1e-6):,.0f} rows/sec)")
+
+    # パースできなかったファイルがあれば、他のファイルを取り込んだうえで失敗として終了する
+    if failed:
+        print(f"\nError: Failed to parse {len(failed)} file(s):")
+        for path in failed:
+            print(f"  {path}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='複数のCSVファイルをまとめてデータベースにインポート',
+        epilog="Example: python bulk_import.py '../ml/data/raw/tepco/*.csv' "
+               "'../ml/data/seed/jepx_spot_*.csv' 'hokkaido=../ml/data/seed/generation_hokkaido*.csv'"
+    )
+    parser.add_argument('specs', nargs='+', help='[AREA=]GLOB 形式のファイル指定（後の指定ほど優先）')
+    parser.add_argument('--area', default='tokyo', help='エリア指定がないファイルのエリア名（デフォルト: tokyo）')
+    parser.add_argument('--workers', type=int, default=None, help='パースのワーカープロセス数（デフォルト: CPUコア数）')
+    args = parser.parse_args()
+
+    bulk_import(args.specs, args.area, args.workers)
@@ -3,14 +3,43 @@ JEPX価格データをデータベースにインポート
 """
 
 import pandas as pd
+import argparse
 import sys
 from pathlib import Path
 
 # バックエンドのパスを追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# 列指向ストア（ml/scripts/datastore.py）のパス
+ML_SCRIPTS_DIR = Path(__file__).parent.parent.parent / 'ml' / 'scripts'
+
 from api.services.db import init_database, get_db, save_price_data, clear_price_data
 
+
+def _write(df: pd.DataFrame, area: str):
+    """
+    エリアの価格データを df で置き換える
+
+    Args:
+        df: 価格データ（timestamp / price_yen 列）
+        area: エリア名
+    """
+    init_database()
+    conn = get_db()
+
+    try:
+        # 既存データをクリア
+        clear_price_data(conn, area)
+
+        # 新しいデータを保存
+        save_price_data(conn, df, area)
+
+        print(f"\n✓ Successfully imported {len(df)} records to database for area: {area}")
+
+    finally:
+        conn.close()
+
+
 def import_price_csv(csv_path: str, area: str = "tokyo"):
     """
     価格CSVをインポート
@@ -30,35 +59,59 @@ def import_price_csv(csv_path: str, area: str = "tokyo"):
     print(f"Price range: {df['price_yen'].min():.2f} - {df['price_yen'].max():.2f} 円/kWh")
     print(f"Average price: {df['price_yen'].mean():.2f} 円/kWh")
 
-    # データベースに保存
-    init_database()
-    conn = get_db()
+    _write(df, area)
 
-    try:
-        # 既存データをクリア
-        clear_price_data(conn, area)
 
-        # 新しいデータを保存
-        save_price_data(conn, df, area)
+def import_from_store(area: str = "tokyo", start: str = None, end: str = None):
+    """
+    列指向ストアから指定期間の価格データをインポート
 
-        print(f"\n✓ Successfully imported {len(df)} records to database for area: {area}")
+    Args:
+        area: エリア名
+        start: 開始日時（Noneなら先頭から）
+        end: 終了日時（Noneなら末尾まで）
+    """
+    sys.path.insert(0, str(ML_SCRIPTS_DIR))
+    import datastore
 
-    finally:
-        conn.close()
+    # 必要な月のパーティションだけ読み込み
+    df = datastore.read_range('price', area, start, end)
+
+    if df.empty:
+        print(f"Error: No price data in store for area: {area}")
+        sys.exit(1)
+
+    print(f"Loaded {len(df)} records from store")
+    print(f"Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
+    print(f"Price range: {df['price_yen'].min():.2f} - {df['price_yen'].max():.2f} 円/kWh")
+    print(f"Average price: {df['price_yen'].mean():.2f} 円/kWh")
+
+    _write(df, area)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python import_price_data.py <csv_file> [area]")
-        print("\nExample:")
-        print("  python import_price_data.py ../ml/data/seed/price_tokyo_sample.csv tokyo")
+    parser = argparse.ArgumentParser(
+        description='JEPX価格データをデータベースにインポート',
+        epilog='Example: python import_price_data.py ../ml/data/seed/price_tokyo_sample.csv tokyo'
+    )
+    parser.add_argument('csv_file', nargs='?', help='CSVファイルのパス')
+    parser.add_argument('area', nargs='?', default='tokyo', help='エリア名（デフォルト: tokyo）')
+    parser.add_argument('--from-store', action='store_true', help='CSVの代わりに列指向ストアから読み込む')
+    parser.add_argument('--start', default=None, help='ストアから読む開始日時（例: 2026-01-01）')
+    parser.add_argument('--end', default=None, help='ストアから読む終了日時（例: 2026-01-31）')
+    args = parser.parse_args()
+
+    if args.from_store:
+        # --from-store の場合、位置引数はエリア名として扱う
+        import_from_store(args.csv_file or args.area, args.start, args.end)
+        sys.exit(0)
+
+    if args.csv_file is None:
+        parser.print_help()
         sys.exit(1)
 
-    csv_file = sys.argv[1]
-    area = sys.argv[2] if len(sys.argv) > 2 else "tokyo"
-
-    if not Path(csv_file).exists():
-        print(f"Error: File not found: {csv_file}")
+    if not Path(args.csv_file).exists():
+        print(f"Error: File not found: {args.csv_file}")
         sys.exit(1)
 
-    import_price_csv(csv_file, area)
+    import_price_csv(args.csv_file, args.area)
@@ -3,14 +3,43 @@
 """
 
 import pandas as pd
+import argparse
 import sys
 from pathlib import Path
 
 # バックエンドのパスを追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# 列指向ストア（ml/scripts/datastore.py）のパス
+ML_SCRIPTS_DIR = Path(__file__).parent.parent.parent / 'ml' / 'scripts'
+
 from api.services.db import init_database, get_db, save_generation_data, clear_generation_data
 
+
+def _write(df: pd.DataFrame, area: str):
+    """
+    エリアの発電量データを df で置き換える
+
+    Args:
+        df: 発電量データ（東京電力形式または pv_mw / wind_mw 列）
+        area: エリア名
+    """
+    init_database()
+    conn = get_db()
+
+    try:
+        # 既存データをクリア
+        clear_generation_data(conn, area)
+
+        # 新しいデータを保存
+        save_generation_data(conn, df, area)
+
+        print(f"\n✓ Successfully imported {len(df)} records to database for area: {area}")
+
+    finally:
+        conn.close()
+
+
 def import_tepco_csv(csv_path: str, area: str = "tokyo"):
     """
     東京電力形式のCSVをインポート
@@ -30,35 +59,59 @@ def import_tepco_csv(csv_path: str, area: str = "tokyo"):
     print(f"Solar range: {df['太陽光発電実績'].min()} - {df['太陽光発電実績'].max()} MW")
     print(f"Wind range: {df['風力発電実績'].min()} - {df['風力発電実績'].max()} MW")
 
-    # データベースに保存
-    init_database()
-    conn = get_db()
+    _write(df, area)
 
-    try:
-        # 既存データをクリア
-        clear_generation_data(conn, area)
 
-        # 新しいデータを保存
-        save_generation_data(conn, df, area)
+def import_from_store(area: str = "tokyo", start: str = None, end: str = None):
+    """
+    列指向ストアから指定期間の発電量データをインポート
 
-        print(f"\n✓ Successfully imported {len(df)} records to database for area: {area}")
+    Args:
+        area: エリア名
+        start: 開始日時（Noneなら先頭から）
+        end: 終了日時（Noneなら末尾まで）
+    """
+    sys.path.insert(0, str(ML_SCRIPTS_DIR))
+    import datastore
 
-    finally:
-        conn.close()
+    # 必要な月のパーティションだけ読み込み
+    df = datastore.read_range('generation', area, start, end)
+
+    if df.empty:
+        print(f"Error: No generation data in store for area: {area}")
+        sys.exit(1)
+
+    print(f"Loaded {len(df)} records from store")
+    print(f"Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
+    print(f"Solar range: {df['pv_mw'].min()} - {df['pv_mw'].max()} MW")
+    print(f"Wind range: {df['wind_mw'].min()} - {df['wind_mw'].max()} MW")
+
+    _write(df, area)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python import_tepco_data.py <csv_file> [area]")
-        print("\nExample:")
-        print("  python import_tepco_data.py ../ml/data/seed/generation_tokyo_tepco.csv tokyo")
+    parser = argparse.ArgumentParser(
+        description='東京電力形式のCSVデータをデータベースにインポート',
+        epilog='Example: python import_tepco_data.py ../ml/data/seed/generation_tokyo_tepco.csv tokyo'
+    )
+    parser.add_argument('csv_file', nargs='?', help='CSVファイルのパス')
+    parser.add_argument('area', nargs='?', default='tokyo', help='エリア名（デフォルト: tokyo）')
+    parser.add_argument('--from-store', action='store_true', help='CSVの代わりに列指向ストアから読み込む')
+    parser.add_argument('--start', default=None, help='ストアから読む開始日時（例: 2026-01-01）')
+    parser.add_argument('--end', default=None, help='ストアから読む終了日時（例: 2026-01-31）')
+    args = parser.parse_args()
+
+    if args.from_store:
+        # --from-store の場合、位置引数はエリア名として扱う
+        import_from_store(args.csv_file or args.area, args.start, args.end)
+        sys.exit(0)
+
+    if args.csv_file is None:
+        parser.print_help()
         sys.exit(1)
 
-    csv_file = sys.argv[1]
-    area = sys.argv[2] if len(sys.argv) > 2 else "tokyo"
-
-    if not Path(csv_file).exists():
-        print(f"Error: File not found: {csv_file}")
+    if not Path(args.csv_file).exists():
+        print(f"Error: File not found: {args.csv_file}")
         sys.exit(1)
 
-    import_tepco_csv(csv_file, area)
+    import_tepco_csv(args.csv_file, args.area)
@@ -0,0 +1,95 @@
+"""
+/api/data/export/{dataset} のテスト
+
+シードスナップショットの実績を Arrow IPCストリーム / Parquet でエクスポートし、
+pyarrow で読み戻して件数と値を確認します（pyarrow は requirements.txt に含まれる）。
+
+実行: python -m pytest backend/tests
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 事前計算のスケジューラーは使わない
+os.environ.setdefault("FORECAST_SCHEDULER", "0")
+
+from fastapi.testclient import TestClient
+
+from api.services import db
+from api.main import app
+
+# シードスナップショットの実績を含む期間
+PARAMS = {"start": "2026-01-01", "end": "2026-02-01", "area": "tokyo"}
+
+
+class ExportTest(unittest.TestCase):
+    """エクスポートしたファイルをpyarrowで読み戻せる"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.db_path = mock.patch.object(db, "DB_PATH", os.path.join(cls.tmp_dir, "elect.db"))
+        cls.db_path.start()
+        cls.client = TestClient(app).__enter__()
+
+        conn = db.get_db()
+        cls.expected = {
+            dataset: conn.execute(f"""
+                SELECT COUNT(*), SUM({column}) FROM {dataset}_actual
+                WHERE area = 'tokyo' AND timestamp >= ? AND timestamp < ?
+            """, (db.to_epoch(PARAMS["start"]), db.to_epoch(PARAMS["end"]))).fetchone()
+            for dataset, column in (("generation", "total_mw"), ("price", "price_yen"))
+        }
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+        cls.db_path.stop()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def _assert_table(self, dataset: str, table: pa.Table, column: str):
+        count, total = self.expected[dataset]
+        self.assertGreater(count, 0)
+        self.assertEqual(table.num_rows, count)
+        self.assertAlmostEqual(sum(table.column(column).to_pylist()), total, places=3)
+
+    def test_arrow_stream(self):
+        for compression in (None, "zstd"):
+            params = dict(PARAMS, format="arrow")
+            if compression:
+                params["compression"] = compression
+            response = self.client.get("/api/data/export/generation", params=params)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "application/vnd.apache.arrow.stream")
+            table = pa.ipc.open_stream(response.content).read_all()
+            self._assert_table("generation", table, "total_mw")
+
+    def test_parquet(self):
+        response = self.client.get("/api/data/export/price", params=dict(PARAMS, format="parquet"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(".parquet", response.headers["content-disposition"])
+        table = pq.read_table(io.BytesIO(response.content))
+        self._assert_table("price", table, "price_yen")
+
+    def test_invalid_format(self):
+        response = self.client.get("/api/data/export/price", params=dict(PARAMS, format="csv"))
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+/api/metrics（Prometheusのテキスト形式）のテスト
+
+timed()・record_cache()・set_gauge() で記録した値が分位点・_sum/_count・
+ヒット率・ゲージの行として出力されることを確認します。
+
+実行: python -m pytest backend/tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 事前計算のスケジューラーは使わない
+os.environ.setdefault("FORECAST_SCHEDULER", "0")
+
+from fastapi.testclient import TestClient
+
+from api.services import db, metrics
+from api.main import app
+
+STAGE = "test.stage"
+
+# timed() で記録する所要時間（秒）
+DURATIONS = [1.0, 2.0, 3.0, 4.0]
+
+
+class MetricsEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.db_path = mock.patch.object(db, "DB_PATH", os.path.join(cls.tmp_dir, "elect.db"))
+        cls.db_path.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_path.stop()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_render_recorded_values(self):
+        # perf_counter を開始・終了の組で返し、所要時間を DURATIONS にする
+        ticks = [tick for duration in DURATIONS for tick in (0.0, duration)]
+        with mock.patch.object(metrics.time, "perf_counter", side_effect=ticks):
+            for _ in DURATIONS:
+                with metrics.timed(STAGE):
+                    pass
+
+        for hit in (True, True, True, False):
+            metrics.record_cache("test_cache", hit)
+        metrics.set_gauge("test_load_seconds", 1.5, "Test load time", target="price")
+
+        with TestClient(app) as client:
+            response = client.get("/api/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith(metrics.PROMETHEUS_MEDIA_TYPE))
+        lines = response.text.splitlines()
+
+        name = "elect_stage_duration_seconds"
+        self.assertIn(f"# TYPE {name} summary", lines)
+        self.assertIn(f'{name}{{stage="{STAGE}",quantile="0.5"}} 2.5', lines)
+        self.assertIn(f'{name}{{stage="{STAGE}",quantile="0.95"}} 3.85', lines)
+        self.assertIn(f'{name}{{stage="{STAGE}",quantile="0.99"}} 3.97', lines)
+        self.assertIn(f'{name}_sum{{stage="{STAGE}"}} 10', lines)
+        self.assertIn(f'{name}_count{{stage="{STAGE}"}} 4', lines)
+
+        self.assertIn('elect_cache_requests_total{cache="test_cache",result="hit"} 3', lines)
+        self.assertIn('elect_cache_requests_total{cache="test_cache",result="miss"} 1', lines)
+        self.assertIn('elect_cache_hit_ratio{cache="test_cache"} 0.75', lines)
+
+        self.assertIn("# HELP elect_test_load_seconds Test load time", lines)
+        self.assertIn('elect_test_load_seconds{target="price"} 1.5', lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
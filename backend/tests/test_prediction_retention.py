@@ -0,0 +1,97 @@
+"""
+予測の保持期間のテスト
+
+save_forecast_run() が古い予測を消すときに、アップロードで作った仮想予測
+（予測対象時刻は過去・登録時刻は新しい）を消さず、MAPE が残ることを確認します。
+
+実行: python -m pytest backend/tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 事前計算のスケジューラーは使わない
+os.environ.setdefault("FORECAST_SCHEDULER", "0")
+
+from fastapi.testclient import TestClient
+
+from api.services import db, scheduler
+from api.main import app
+
+PRICE_CSV = Path(__file__).parent.parent.parent / "ml" / "data" / "seed" / "price_tokyo_sample.csv"
+
+
+class PredictionRetentionTest(unittest.TestCase):
+    """保持期間を過ぎた予測だけを消す"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = mock.patch.object(db, "DB_PATH", os.path.join(self.tmp_dir, "elect.db"))
+        self.db_path.start()
+
+    def tearDown(self):
+        self.db_path.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _save_run(self):
+        """現在の枠の予測を1回保存"""
+        slot = scheduler.current_slot()
+        conn = db.get_db()
+        try:
+            self.assertTrue(db.claim_forecast_run(conn, "tokyo", slot, 60))
+            db.save_forecast_run(conn, "tokyo", slot, {
+                "start": db.from_epoch(slot),
+                "step_seconds": 1800,
+                "generation": np.ones(4),
+                "price": np.ones(4),
+                "hours": 2,
+                "weather": {"stale": False, "fetched_at": None},
+                "generated_at": "2026-01-01T00:00:00"
+            })
+        finally:
+            conn.close()
+
+    def test_uploaded_predictions_survive_forecast_run(self):
+        with TestClient(app) as client:
+            with open(PRICE_CSV, "rb") as f:
+                response = client.post("/api/data/upload", files={"price_file": ("price.csv", f, "text/csv")})
+            self.assertEqual(response.status_code, 200)
+
+            before = client.get("/api/predict/accuracy").json()["price_mape"]
+            self.assertIsNotNone(before)
+
+            # 保持期間を過ぎた予測（登録時刻が古い）
+            old_created_at = int(time.time()) - db.PREDICTION_RETENTION_SECONDS - 3600
+            conn = db.get_db()
+            with conn:
+                conn.execute("""
+                    INSERT INTO predictions (area, target_type, forecast_timestamp, predicted_value, created_at)
+                    VALUES ('tokyo', 'price', 0, 1.0, ?)
+                """, (old_created_at,))
+            conn.close()
+
+            self._save_run()
+
+            after = client.get("/api/predict/accuracy").json()["price_mape"]
+            self.assertEqual(after, before)
+
+            conn = db.get_db()
+            old_rows = conn.execute("SELECT COUNT(*) FROM predictions WHERE created_at = ?",
+                                    (old_created_at,)).fetchone()[0]
+            conn.close()
+            self.assertEqual(old_rows, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+気象予報の取得が遅い場合のレイテンシー（時間予算とヘッジ）のテスト
+
+Open-Meteo への通信は httpx.MockTransport に差し替え、応答を遅らせます。
+REQUEST_BUDGET_SECONDS（本番は10秒）はテストを短くするため縮めて実行します。
+
+実行: python -m pytest backend/tests
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import numpy as np
+import pandas as pd
+
+# バックエンドのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 事前計算のスケジューラーは使わない（リクエストごとに予測を計算させる）
+os.environ.setdefault("FORECAST_SCHEDULER", "0")
+
+from fastapi.testclient import TestClient
+
+from api.services import db, weather
+from api.routers import predict
+from api.main import app
+
+# テスト用の時間予算（秒）
+TEST_BUDGET_SECONDS = 1.0
+
+# 遅延させる上流の応答時間（予算より十分長い）
+SLOW_UPSTREAM_SECONDS = 30.0
+
+# 予算内に収まったかを見る繰り返し回数
+REQUESTS = 10
+
+
+def _open_meteo_json() -> dict:
+    """Open-Meteo の hourly 形式の応答（今日0時から72時間）"""
+    timestamps = pd.date_range(pd.Timestamp(datetime.now()).normalize(), periods=72, freq="h")
+    return {
+        "hourly": {
+            "time": [ts.strftime("%Y-%m-%dT%H:%M") for ts in timestamps],
+            "temperature_2m": (10 + np.sin(np.arange(72) / 4)).tolist(),
+            "wind_speed_10m": [3.0] * 72,
+            "shortwave_radiation": (np.clip(np.sin((np.arange(72) % 24 - 6) / 12 * np.pi), 0, None) * 600).tolist()
+        }
+    }
+
+
+def _seed_forecast_cache():
+    """前回取得できた予報としてキャッシュを埋める"""
+    hourly = _open_meteo_json()["hourly"]
+    df = pd.DataFrame({
+        "timestamp": pd.to_datetime(hourly["time"]),
+        "temperature": hourly["temperature_2m"],
+        "wind_speed": hourly["wind_speed_10m"],
+        "solar_radiation": hourly["shortwave_radiation"]
+    })
+    weather.WeatherService._forecast_cache["tokyo"] = (df, datetime.now())
+
+
+def _patch_transport(handler):
+    """weather.py が作る httpx.AsyncClient の通信を handler に差し替える"""
+    real_client = httpx.AsyncClient
+
+    def client(**kwargs):
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    return mock.patch.object(weather.httpx, "AsyncClient", client)
+
+
+class WeatherBudgetTest(unittest.TestCase):
+    """上流が応答しなくても時間予算内にキャッシュで応答する"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.db_path = mock.patch.object(db, "DB_PATH", os.path.join(cls.tmp_dir, "elect.db"))
+        cls.db_path.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_path.stop()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_latest_returns_within_budget_with_stale_inputs(self):
+        async def never_responds(request):
+            await asyncio.sleep(SLOW_UPSTREAM_SECONDS)
+            return httpx.Response(200, json=_open_meteo_json())
+
+        _seed_forecast_cache()
+        with _patch_transport(never_responds), \
+                mock.patch.object(predict, "REQUEST_BUDGET_SECONDS", TEST_BUDGET_SECONDS), \
+                TestClient(app) as client:
+            latencies = []
+            for _ in range(REQUESTS):
+                start = time.monotonic()
+                response = client.get("/api/predict/latest", params={"hours": 24})
+                latencies.append(time.monotonic() - start)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.json()["stale_inputs"])
+
+        p99 = float(np.quantile(latencies, 0.99))
+        self.assertLess(p99, TEST_BUDGET_SECONDS, f"p99 {p99:.3f}s exceeds budget (latencies: {latencies})")
+
+
+class ConditionalLatestTest(unittest.TestCase):
+    """スナップショット以外の予測も If-None-Match が一致すれば気象予報を取得せずに 304 を返す"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.db_path = mock.patch.object(db, "DB_PATH", os.path.join(cls.tmp_dir, "elect.db"))
+        cls.db_path.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_path.stop()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_not_modified_skips_weather_fetch(self):
+        requests = []
+
+        async def respond(request):
+            requests.append(request)
+            return httpx.Response(200, json=_open_meteo_json())
+
+        params = {"hours": 24}
+        with _patch_transport(respond), TestClient(app) as client:
+            first = client.get("/api/predict/latest", params=params)
+            self.assertEqual(first.status_code, 200)
+            etag = first.headers["ETag"]
+            fetched = len(requests)
+            self.assertGreater(fetched, 0)
+
+            second = client.get("/api/predict/latest", params=params, headers={"If-None-Match": etag})
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second.headers["ETag"], etag)
+            self.assertEqual(len(requests), fetched)
+
+            # 気象予報を取得し直すと ETag が変わる
+            weather.WeatherService._forecast_cache["tokyo"] = (
+                weather.WeatherService._forecast_cache["tokyo"][0], datetime.now()
+            )
+            third = client.get("/api/predict/latest", params=params, headers={"If-None-Match": etag})
+            self.assertEqual(third.status_code, 200)
+            self.assertGreater(len(requests), fetched)
+
+
+class HedgeTest(unittest.TestCase):
+    """1本目が遅いと HEDGE_DELAY_RATIO の時点で2本目を投げる"""
+
+    def test_hedge_fires_after_delay_ratio(self):
+        timeout = 1.0
+        started = []
+
+        async def first_slow(request):
+            started.append(time.monotonic())
+            if len(started) == 1:
+                await asyncio.sleep(SLOW_UPSTREAM_SECONDS)
+            return httpx.Response(200, json=_open_meteo_json())
+
+        async def run():
+            start = time.monotonic()
+            data = await weather.WeatherService()._get_with_hedge({}, timeout)
+            return start, time.monotonic(), data
+
+        with _patch_transport(first_slow):
+            start, end, data = asyncio.run(run())
+
+        self.assertEqual(len(started), 2)
+        hedge_delay = started[1] - start
+        self.assertGreaterEqual(hedge_delay, timeout * weather.HEDGE_DELAY_RATIO)
+        self.assertLess(hedge_delay, timeout * weather.HEDGE_DELAY_RATIO + 0.2)
+        # 2本目の応答を待たずに1本目を待ち続けない
+        self.assertLess(end - start, timeout)
+        self.assertIn("hourly", data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,18 +1,18 @@
 import { ForecastChart } from './ForecastChart'
 import { AccuracyChart } from './AccuracyChart'
 import { UploadPanel } from './UploadPanel'
-import { usePrediction } from '../hooks/usePrediction'
-import { useAccuracy } from '../hooks/useAccuracy'
+import { useDashboard } from '../hooks/useDashboard'
 import './Dashboard.css'
 
 export const Dashboard = () => {
-  const { data: predictions, loading: predictLoading, error: predictError, refetch: refetchPrediction } = usePrediction()
-  const { data: accuracy, loading: accuracyLoading, refetch: refetchAccuracy } = useAccuracy()
+  // データ状態・予測・精度を1回のリクエストで取得
+  const { data, loading: predictLoading, error: predictError, refetch } = useDashboard()
+  const predictions = data?.prediction ?? null
+  const accuracy = data?.accuracy ?? null
 
   const handleUploadSuccess = () => {
     // アップロード成功後、予測と精度を再取得
-    refetchPrediction()
-    refetchAccuracy()
+    refetch()
   }
 
   if (predictLoading) {
@@ -32,7 +32,7 @@ export const Dashboard = () => {
         <div className="error-container">
           <h2>エラーが発生しました</h2>
           <p>{predictError}</p>
-          <button onClick={refetchPrediction} className="retry-button">再試行</button>
+          <button onClick={refetch} className="retry-button">再試行</button>
           <div className="error-hint">
             <p><strong>ヒント:</strong></p>
             <ul>
@@ -62,11 +62,7 @@ export const Dashboard = () => {
 
         <div className="dashboard-panel right-panel">
           <h3>🎯 過去7日間の精度（MAPE）</h3>
-          {accuracyLoading ? (
-            <div className="loading-small">読み込み中...</div>
-          ) : (
-            <AccuracyChart data={accuracy} />
-          )}
+          <AccuracyChart data={accuracy} />
         </div>
       </div>
 
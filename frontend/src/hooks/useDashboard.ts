@@ -0,0 +1,38 @@
+import { useState, useEffect, useCallback } from 'react'
+import { getDashboard } from '../services/api'
+import type { DashboardResponse } from '../types'
+
+export const useDashboard = (area: string = 'tokyo', hours: number = 48, days: number = 7) => {
+  const [data, setData] = useState<DashboardResponse | null>(null)
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<string | null>(null)
+
+  const fetchData = useCallback(async () => {
+    try {
+      setLoading(true)
+      setError(null)
+
+      const result = await getDashboard(area, hours, days)
+      setData(result)
+      if (result.prediction_error) {
+        setError(result.prediction_error)
+      }
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'ダッシュボードの取得に失敗しました')
+      console.error('Failed to fetch dashboard:', err)
+    } finally {
+      setLoading(false)
+    }
+  }, [area, hours, days])
+
+  useEffect(() => {
+    fetchData()
+  }, [fetchData])
+
+  return {
+    data,
+    loading,
+    error,
+    refetch: fetchData
+  }
+}
@@ -1,8 +1,29 @@
 import { useState, useEffect, useCallback } from 'react'
-import { getLatestPrediction } from '../services/api'
-import type { PredictionResponse } from '../types'
+import { getLatestPrediction, subscribePrediction } from '../services/api'
+import type { PredictionResponse, ColumnarPredictionResponse } from '../types'
 
-export const usePrediction = (area: string = 'tokyo', hours: number = 48) => {
+// columnar 形式の予測を時刻と値の組に変換
+const toPredictionResponse = (data: ColumnarPredictionResponse): PredictionResponse => {
+  const start = new Date(`${data.start}Z`).getTime()
+  const toPoints = (values: number[]) => values.map((value, i) => ({
+    timestamp: new Date(start + i * data.step_seconds * 1000).toISOString().slice(0, 19),
+    value
+  }))
+  return {
+    area: data.area,
+    predictions: {
+      generation: toPoints(data.predictions.generation),
+      price: toPoints(data.predictions.price)
+    },
+    generated_at: data.generated_at
+  }
+}
+
+/**
+ * 予測データを取得
+ * live が true の場合は、サーバーが新しい予測を計算するたびに更新する（48時間予測のみ）
+ */
+export const usePrediction = (area: string = 'tokyo', hours: number = 48, live: boolean = false) => {
   const [data, setData] = useState<PredictionResponse | null>(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
@@ -26,6 +47,16 @@ export const usePrediction = (area: string = 'tokyo', hours: number = 48) => {
     fetchData()
   }, [fetchData])
 
+  useEffect(() => {
+    if (!live || hours !== 48) {
+      return
+    }
+    return subscribePrediction(area, (result) => {
+      setData(toPredictionResponse(result))
+      setError(null)
+    })
+  }, [area, hours, live])
+
   return {
     data,
     loading,
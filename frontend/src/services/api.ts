@@ -2,7 +2,7 @@
  * APIクライアント
  */
 
-import type { DataStatus, PredictionResponse, AccuracyResponse } from '../types'
+import type { DataStatus, PredictionResponse, ColumnarPredictionResponse, AccuracyResponse, DashboardResponse } from '../types'
 
 const API_BASE = '/api'
 
@@ -39,6 +39,24 @@ export const getLatestPrediction = async (area: string = 'tokyo', hours: number
   return response.json()
 }
 
+/**
+ * 予測の更新を購読（Server-Sent Events）
+ * 接続時に最新の予測、以降は新しい予測が届くたびに onUpdate を呼ぶ
+ * 切断された場合はブラウザが自動で再接続する
+ *
+ * @returns 購読を終了する関数
+ */
+export const subscribePrediction = (
+  area: string,
+  onUpdate: (data: ColumnarPredictionResponse) => void
+): (() => void) => {
+  const source = new EventSource(`${API_BASE}/predict/stream?area=${area}`)
+  source.addEventListener('forecast', (event) => {
+    onUpdate(JSON.parse((event as MessageEvent).data))
+  })
+  return () => source.close()
+}
+
 /**
  * 精度データを取得
  */
@@ -49,3 +67,14 @@ export const getAccuracy = async (area: string = 'tokyo', days: number = 7): Pro
   }
   return response.json()
 }
+
+/**
+ * ダッシュボードの表示に必要なデータ（データ状態・最新予測・精度）をまとめて取得
+ */
+export const getDashboard = async (area: string = 'tokyo', hours: number = 48, days: number = 7): Promise<DashboardResponse> => {
+  const response = await fetch(`${API_BASE}/dashboard?area=${area}&hours=${hours}&days=${days}`)
+  if (!response.ok) {
+    throw new Error('Failed to fetch dashboard')
+  }
+  return response.json()
+}
@@ -18,6 +18,18 @@ export interface PredictionResponse {
   generated_at: string
 }
 
+// 予測レスポンス（columnar 形式、/predict/stream のイベント）
+export interface ColumnarPredictionResponse {
+  area: string
+  start: string
+  step_seconds: number
+  predictions: {
+    generation: number[]
+    price: number[]
+  }
+  generated_at: string
+}
+
 // 精度データ
 export interface AccuracyResponse {
   area: string
@@ -27,6 +39,15 @@ export interface AccuracyResponse {
   note: string
 }
 
+// ダッシュボード（/dashboard）
+export interface DashboardResponse {
+  area: string
+  status: DataStatus
+  prediction: PredictionResponse | null
+  prediction_error: string | null
+  accuracy: AccuracyResponse
+}
+
 // データ状態
 export interface DataStatus {
   generation: {
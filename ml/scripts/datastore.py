@@ -0,0 +1,185 @@
+"""
+取得データの列指向ストア
+
+TEPCO発電量・JEPX価格を Parquet でソース/エリア/月ごとに分割して保存します。
+
+    data/store/{source}/area={area}/month={YYYY-MM}/data.parquet
+
+取得スクリプトは月単位のパーティションを冪等に追記し、学習・インポートは
+必要な期間のパーティションだけを型付きの列で読み込みます。
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+from pathlib import Path
+from datetime import date, datetime
+import os
+
+STORE_DIR = Path(__file__).parent.parent / 'data' / 'store'
+
+# ソースごとの列と型（timestamp以外）
+SCHEMAS = {
+    'generation': {
+        'pv_mw': np.float32,
+        'wind_mw': np.float32,
+        'total_mw': np.float32
+    },
+    'price': {
+        'price_yen': np.float32
+    }
+}
+
+
+def _area_dir(source: str, area: str) -> Path:
+    """ソース・エリアのディレクトリ"""
+    if source not in SCHEMAS:
+        raise ValueError(f"Unknown source: {source}")
+    return STORE_DIR / source / f'area={area}'
+
+
+def _partition_path(source: str, area: str, month: str) -> Path:
+    """月パーティションのファイルパス"""
+    return _area_dir(source, area) / f'month={month}' / 'data.parquet'
+
+
+def _normalize(source: str, df: pd.DataFrame) -> pd.DataFrame:
+    """列を絞り込んで型を揃え、timestampで重複除去・ソート"""
+    columns = SCHEMAS[source]
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(df['timestamp']).astype('datetime64[ns]'),
+        **{col: df[col].astype(dtype) for col, dtype in columns.items()}
+    })
+    df = df.drop_duplicates(subset='timestamp', keep='last')
+    return df.sort_values('timestamp', ignore_index=True)
+
+
+def has_partitions(source: str, area: str) -> bool:
+    """
+    ストアにデータがあるか確認
+
+    Args:
+        source: 'generation' または 'price'
+        area: エリア名
+
+    Returns:
+        パーティションが1つ以上あればTrue
+    """
+    return any(_area_dir(source, area).glob('month=*/data.parquet'))
+
+
+def append_partitions(source: str, area: str, df: pd.DataFrame) -> list:
+    """
+    データを月ごとのパーティションに追記（冪等）
+
+    既存のパーティションとは timestamp で統合し、同じ時刻は新しい値で上書きする。
+    同じデータを何度追記しても結果は変わらない。
+
+    Args:
+        source: 'generation' または 'price'
+        area: エリア名
+        df: timestamp列とスキーマの列を含むDataFrame
+
+    Returns:
+        内容が変わったパーティションの月（YYYY-MM）のリスト
+    """
+    df = _normalize(source, df)
+    months = df['timestamp'].dt.strftime('%Y-%m')
+    updated = []
+
+    for month, part in df.groupby(months, sort=True):
+        path = _partition_path(source, area, month)
+
+        if path.exists():
+            existing = pd.read_parquet(path)
+            merged = _normalize(source, pd.concat([existing, part], ignore_index=True))
+            if merged.equals(existing):
+                continue
+            part = merged
+        else:
+            part = part.reset_index(drop=True)
+
+        # 一時ファイルに書いてから置き換える（書き込み途中のファイルを読ませない）
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.parquet.tmp')
+        part.to_parquet(tmp_path, index=False, compression='zstd')
+        os.replace(tmp_path, path)
+        updated.append(month)
+
+    return updated
+
+
+def list_months(source: str, area: str) -> list:
+    """
+    ストアにある月（YYYY-MM）のリストを取得
+
+    Args:
+        source: 'generation' または 'price'
+        area: エリア名
+
+    Returns:
+        月のリスト（昇順）
+    """
+    return sorted(
+        path.parent.name.split('=', 1)[1]
+        for path in _area_dir(source, area).glob('month=*/data.parquet')
+    )
+
+
+def before_end(timestamps: pd.Series, end) -> pd.Series:
+    """
+    終了日時までの行のマスク
+
+    '2026-03-31' のように日付だけの終了日時はその日の終わりまで（翌日0時より前）、
+    時刻を含む場合はその時刻まで（含む）とする。
+
+    Args:
+        timestamps: timestamp列
+        end: 終了日時（文字列・Timestamp・date）
+
+    Returns:
+        終了日時までの行が True のマスク
+    """
+    date_only = (isinstance(end, str) and ':' not in end) or \
+        (isinstance(end, date) and not isinstance(end, datetime))
+    if date_only:
+        return timestamps < pd.Timestamp(end) + pd.Timedelta(1, unit='D')
+    return timestamps <= pd.Timestamp(end)
+
+
+def read_range(source: str, area: str, start=None, end=None) -> pd.DataFrame:
+    """
+    指定期間のデータを読み込む（必要な月のパーティションだけを読む）
+
+    Args:
+        source: 'generation' または 'price'
+        area: エリア名
+        start: 開始時刻（含む、Noneなら先頭から）
+        end: 終了時刻（含む、日付だけならその日の終わりまで、Noneなら末尾まで）
+
+    Returns:
+        timestamp列とスキーマの列を含むDataFrame（時系列順）
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end_month = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+
+    months = [
+        month for month in list_months(source, area)
+        if (start is None or month >= start.strftime('%Y-%m'))
+        and (end_month is None or month <= end_month)
+    ]
+
+    if not months:
+        return _normalize(source, pd.DataFrame({'timestamp': [], **{col: [] for col in SCHEMAS[source]}}))
+
+    # 複数パーティションを1つのテーブルとしてまとめて読む
+    paths = [str(_partition_path(source, area, month)) for month in months]
+    table = pq.ParquetDataset(paths, partitioning=None).read()
+    df = table.to_pandas()
+
+    if start is not None:
+        df = df[df['timestamp'] >= start]
+    if end is not None:
+        df = df[before_end(df['timestamp'], end)]
+
+    return df.reset_index(drop=True)
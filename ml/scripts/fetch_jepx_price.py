@@ -3,43 +3,117 @@ JEPXスポット価格CSVから指定期間・エリアのデータを抽出
 """
 
 import pandas as pd
-import subprocess
+import numpy as np
 from pathlib import Path
 from datetime import datetime
+import asyncio
 import sys
 
+import datastore
+import http_fetch
+
+BASE_URL = "https://www.jepx.jp/market/excel/"
+
+# エリア名とJEPX CSVの列名のマッピング
+AREA_COLUMNS = {
+    'hokkaido': 'エリアプライス北海道(円/kWh)',
+    'tohoku': 'エリアプライス東北(円/kWh)',
+    'tokyo': 'エリアプライス東京(円/kWh)',
+    'chubu': 'エリアプライス中部(円/kWh)',
+    'hokuriku': 'エリアプライス北陸(円/kWh)',
+    'kansai': 'エリアプライス関西(円/kWh)',
+    'chugoku': 'エリアプライス中国(円/kWh)',
+    'shikoku': 'エリアプライス四国(円/kWh)',
+    'kyushu': 'エリアプライス九州(円/kWh)'
+}
+
+# システムプライスは area='system' として扱う
+SYSTEM_PRICE_COLUMN = 'システムプライス(円/kWh)'
+
 def fetch_jepx_spot_data(year: int, output_dir: Path):
     """
-    JEPXスポット価格CSVをダウンロード（curlを使用）
+    JEPXスポット価格CSVを条件付きでダウンロード
+
+    前回から更新がなければ304だけで終了し、既存ファイルをそのまま使う。
 
     Args:
         year: 年度（例: 2025）
         output_dir: 出力ディレクトリ
+
+    Returns:
+        Path: CSVファイルのパス（失敗したらNone）
     """
-    url = f"https://www.jepx.jp/market/excel/spot_{year}.csv"
+    url = f"{BASE_URL}spot_{year}.csv"
     output_file = output_dir / f"jepx_spot_{year}.csv"
 
     print(f"Downloading JEPX spot data for {year}...")
     print(f"URL: {url}")
 
-    try:
-        # curlでダウンロード
-        result = subprocess.run(
-            ['curl', '-o', str(output_file), url],
-            capture_output=True,
-            text=True
-        )
-
-        if result.returncode == 0:
-            print(f"✓ Downloaded to {output_file}")
-            return output_file
-        else:
-            print(f"Error: {result.stderr}")
-            return None
-
-    except Exception as e:
-        print(f"Error downloading: {e}")
-        return None
+    async def fetch():
+        async with http_fetch.create_client() as client:
+            return await http_fetch.fetch_file(
+                client, url, output_file, header_marker='年月日'.encode('shift-jis')
+            )
+
+    result = asyncio.run(fetch())
+
+    if result['status'] in ('not_modified', 'unchanged', 'updated'):
+        return output_file
+    return None
+
+
+def extract_all_area_prices(
+    jepx_file: Path,
+    start_date: str = None,
+    end_date: str = None
+) -> pd.DataFrame:
+    """
+    JEPXデータから全エリア＋システムプライスを1回の読み込みで縦持ちに変換
+
+    時刻コード（1=0:00, 2=0:30, ..., 48=23:30）は datetime64 の整数演算で
+    タイムスタンプに変換する（行ごとのPython処理や文字列の再パースはしない）。
+    列は price_actual テーブルと同じ (area, timestamp, price_yen)。
+
+    Args:
+        jepx_file: JEPXのCSVファイル
+        start_date: 開始日（YYYY-MM-DD）
+        end_date: 終了日（YYYY-MM-DD）
+
+    Returns:
+        area, timestamp, price_yen の縦持ちDataFrame（エリア順・時系列順）
+    """
+    areas = list(AREA_COLUMNS) + ['system']
+    price_columns = list(AREA_COLUMNS.values()) + [SYSTEM_PRICE_COLUMN]
+
+    # 必要な列だけ読み込み（Shift-JIS）
+    df = pd.read_csv(
+        jepx_file,
+        encoding='shift-jis',
+        usecols=['年月日', '時刻コード'] + price_columns,
+        dtype={'時刻コード': np.int64, **{col: np.float64 for col in price_columns}}
+    )
+
+    # 日付 + (時刻コード - 1) * 30分
+    dates = pd.to_datetime(df['年月日'], format='%Y/%m/%d').to_numpy(dtype='datetime64[m]')
+    timestamps = dates + (df['時刻コード'].to_numpy() - 1) * np.timedelta64(30, 'm')
+
+    # 期間でフィルタリング
+    mask = np.ones(len(df), dtype=bool)
+    if start_date:
+        mask &= dates >= np.datetime64(start_date, 'm')
+    if end_date:
+        mask &= dates <= np.datetime64(end_date, 'm')
+
+    timestamps = timestamps[mask].astype('datetime64[ns]')
+    prices = df[price_columns].to_numpy()[mask]
+    n = len(timestamps)
+
+    # エリアごとの列を縦に並べる（列優先で平坦化するとエリア順になる）
+    return pd.DataFrame({
+        'area': pd.Categorical.from_codes(np.repeat(np.arange(len(areas)), n), categories=areas),
+        'timestamp': np.tile(timestamps, len(areas)),
+        'price_yen': prices.ravel(order='F')
+    })
 
 
 def extract_area_price(
@@ -59,78 +133,37 @@ def extract_area_price(
         end_date: 終了日（YYYY-MM-DD）
         output_file: 出力ファイルパス
     """
-    # エリア名のマッピング
-    area_columns = {
-        'hokkaido': 'エリアプライス北海道(円/kWh)',
-        'tohoku': 'エリアプライス東北(円/kWh)',
-        'tokyo': 'エリアプライス東京(円/kWh)',
-        'chubu': 'エリアプライス中部(円/kWh)',
-        'hokuriku': 'エリアプライス北陸(円/kWh)',
-        'kansai': 'エリアプライス関西(円/kWh)',
-        'chugoku': 'エリアプライス中国(円/kWh)',
-        'shikoku': 'エリアプライス四国(円/kWh)',
-        'kyushu': 'エリアプライス九州(円/kWh)'
-    }
-
-    if area not in area_columns:
-        print(f"Error: Invalid area '{area}'. Valid areas: {list(area_columns.keys())}")
+    if area not in AREA_COLUMNS:
+        print(f"Error: Invalid area '{area}'. Valid areas: {list(AREA_COLUMNS.keys())}")
         return None
 
-    price_column = area_columns[area]
-
     print(f"\nExtracting {area} area price data...")
     print(f"Input file: {jepx_file}")
 
-    # CSVを読み込み（Shift-JIS）
-    df = pd.read_csv(jepx_file, encoding='shift-jis')
+    prices = extract_all_area_prices(jepx_file, start_date, end_date)
+    return save_area_price(prices, area, output_file or jepx_file.parent / f'price_{area}_sample.csv')
 
-    print(f"Loaded {len(df)} records")
-    print(f"Date range: {df['年月日'].min()} to {df['年月日'].max()}")
 
-    # 日付をパース
-    df['date'] = pd.to_datetime(df['年月日'], format='%Y/%m/%d')
-
-    # 期間でフィルタリング
-    if start_date:
-        start = pd.to_datetime(start_date)
-        df = df[df['date'] >= start]
-        print(f"Filtered from {start_date}: {len(df)} records")
+def save_area_price(prices: pd.DataFrame, area: str, output_file: Path) -> pd.DataFrame:
+    """
+    縦持ちの価格データから指定エリアを取り出してCSVに保存
 
-    if end_date:
-        end = pd.to_datetime(end_date)
-        df = df[df['date'] <= end]
-        print(f"Filtered to {end_date}: {len(df)} records")
-
-    # 時刻コードを時刻に変換（1=0:00, 2=0:30, ..., 48=23:30）
-    def time_code_to_time(code):
-        hour = (code - 1) // 2
-        minute = 0 if code % 2 == 1 else 30
-        return f"{hour:02d}:{minute:02d}"
-
-    df['time'] = df['時刻コード'].apply(time_code_to_time)
-
-    # timestampを作成
-    df['timestamp'] = pd.to_datetime(
-        df['年月日'].astype(str) + ' ' + df['time'],
-        format='%Y/%m/%d %H:%M'
-    )
+    Args:
+        prices: extract_all_area_prices() の戻り値
+        area: エリア名
+        output_file: 出力ファイルパス
 
-    # 必要な列だけ抽出
-    result = pd.DataFrame({
-        'timestamp': df['timestamp'],
-        'price_yen': df[price_column]
-    })
+    Returns:
+        timestamp, price_yen のDataFrame
+    """
+    result = prices.loc[prices['area'] == area, ['timestamp', 'price_yen']].reset_index(drop=True)
 
-    print(f"\nExtracted data:")
+    print(f"\nExtracted {area} data:")
     print(f"  Records: {len(result)}")
     print(f"  Date range: {result['timestamp'].min()} to {result['timestamp'].max()}")
     print(f"  Price range: {result['price_yen'].min():.2f} - {result['price_yen'].max():.2f} 円/kWh")
     print(f"  Average price: {result['price_yen'].mean():.2f} 円/kWh")
 
-    # 保存
-    if output_file is None:
-        output_file = jepx_file.parent / f'price_{area}_sample.csv'
-
     result.to_csv(output_file, index=False)
     print(f"\n✓ Saved to {output_file}")
 
@@ -163,23 +196,25 @@ if __name__ == '__main__':
     # JEPXデータをダウンロード
     jepx_file = data_dir / 'jepx_spot_2025.csv'
 
-    if not jepx_file.exists():
-        jepx_file = fetch_jepx_spot_data(2025, data_dir)
-        if jepx_file is None:
+    # 更新がなければ304で既存ファイルを使う（取得に失敗しても既存ファイルがあれば続行）
+    if fetch_jepx_spot_data(2025, data_dir) is None:
+        if not jepx_file.exists():
             print("Failed to download JEPX data")
             sys.exit(1)
-    else:
         print(f"Using existing file: {jepx_file}")
 
-    # 東京エリアの価格を抽出
-    output_file = data_dir / 'price_tokyo_sample.csv'
+    # 全エリアの価格を1回で抽出
+    print(f"\nExtracting all area prices from {jepx_file}...")
+    prices = extract_all_area_prices(jepx_file)
+    print(f"Extracted {len(prices)} records ({prices['area'].nunique()} areas)")
 
-    extract_area_price(
-        jepx_file=jepx_file,
-        area='tokyo',
-        start_date=start_date,
-        end_date=end_date,
-        output_file=output_file
-    )
+    # 東京エリアの価格（発電量データと同じ期間）をCSVに保存
+    in_period = prices['timestamp'].dt.normalize().between(start_date, end_date)
+    save_area_price(prices[in_period], 'tokyo', data_dir / 'price_tokyo_sample.csv')
+
+    # 列指向ストアに全エリアを月パーティションとして追記（同じデータなら変更なし）
+    for area, area_prices in prices.groupby('area', observed=True):
+        updated = datastore.append_partitions('price', area, area_prices)
+        print(f"Store partitions updated [{area}]: {updated or 'none'}")
 
     print("\n✓ JEPX price data extraction completed!")
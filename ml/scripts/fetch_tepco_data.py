@@ -1,14 +1,30 @@
 """
 TEPCOエリア需給実績CSVを自動取得
+
+引数なしで実行すると当月分（月初3日間は前月分も）を条件付きで取得します。
+--backfill で指定した月の範囲をまとめて並行取得し、列指向ストアに追記します。
 """
 
 import pandas as pd
-import subprocess
 from pathlib import Path
 from datetime import datetime, timedelta
+import argparse
+import asyncio
 import sys
-import time
-import hashlib
+
+import datastore
+import http_fetch
+
+BASE_URL = "https://www.tepco.co.jp/forecast/html/images/"
+RAW_DIR = Path(__file__).parent.parent / 'data' / 'raw' / 'tepco'
+
+HEADER_MARKER = '単位[MW平均]'
+REQUIRED_COLUMNS = ['DATE', 'TIME', '太陽光発電実績', '風力発電実績']
+MIN_FILE_SIZE = 1024
+MIN_RECORDS = 10
+
+# バックフィルの同時ダウンロード数
+BACKFILL_CONCURRENCY = 4
 
 
 def get_target_year_month():
@@ -29,176 +45,212 @@ def get_target_year_month():
     return year_months
 
 
-def fetch_tepco_data(year_month: str, output_file: Path, max_retries=3):
+def get_year_month_range(start: str, end: str):
+    """
+    開始年月から終了年月までの年月（YYYYMM）を取得
+
+    Args:
+        start: 開始年月（YYYYMM形式）
+        end: 終了年月（YYYYMM形式、含む）
+
+    Returns:
+        list[str]: 年月のリスト（昇順）
+    """
+    months = pd.period_range(pd.Period(start[:4] + '-' + start[4:], 'M'),
+                             pd.Period(end[:4] + '-' + end[4:], 'M'), freq='M')
+    return [month.strftime('%Y%m') for month in months]
+
+
+async def fetch_tepco_data(client, year_month: str, output_file: Path, force: bool = False):
     """
-    TEPCOエリア需給実績CSVをダウンロード
+    TEPCOエリア需給実績CSVを条件付きでダウンロード
+
+    前回と同じなら304（またはハッシュ一致）でパースせずに終了し、
+    変わっていれば1回だけパースして検証してから置き換える。
 
     Args:
+        client: HTTPクライアント（http_fetch.create_client()）
         year_month: 年月（YYYYMM形式）
         output_file: 出力ファイルパス
-        max_retries: 最大リトライ回数
+        force: Trueなら変更がなくてもダウンロードしてパースする
 
     Returns:
-        bool: 成功したらTrue、失敗したらFalse
+        dict: http_fetch.fetch_file() の結果（data はパースしたDataFrame）
     """
-    base_url = "https://www.tepco.co.jp/forecast/html/images/"
     filename = f"eria_jukyu_{year_month}_03.csv"
-    url = f"{base_url}{filename}"
+    url = f"{BASE_URL}{filename}"
 
     print(f"Fetching TEPCO data for {year_month}...")
     print(f"URL: {url}")
 
-    for attempt in range(max_retries):
-        try:
-            # curlでダウンロード（-f: HTTPエラーで失敗, -s: サイレント, -S: エラーは表示）
-            result = subprocess.run(
-                ['curl', '-f', '-s', '-S', '--connect-timeout', '30', '-o', str(output_file), url],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-
-            if result.returncode == 0:
-                # データ検証
-                if validate_tepco_csv(output_file):
-                    print(f"✓ Successfully downloaded to {output_file}")
-                    return True
-                else:
-                    print(f"⚠ Downloaded file is invalid")
-                    return False
-            elif result.returncode == 22:  # HTTP 404
-                print(f"✗ File not found (404): {url}")
-                return False
-            else:
-                print(f"⚠ Attempt {attempt + 1}/{max_retries} failed (exit code {result.returncode})")
-                if result.stderr:
-                    print(f"   Error: {result.stderr}")
-                time.sleep(2 ** attempt)  # 指数バックオフ: 1秒, 2秒, 4秒
-
-        except subprocess.TimeoutExpired:
-            print(f"⚠ Timeout on attempt {attempt + 1}/{max_retries}")
-            time.sleep(2 ** attempt)
-        except Exception as e:
-            print(f"⚠ Error on attempt {attempt + 1}/{max_retries}: {e}")
-            time.sleep(2 ** attempt)
-
-    return False
-
-
-def validate_tepco_csv(file_path: Path):
+    return await http_fetch.fetch_file(
+        client,
+        url,
+        output_file,
+        header_marker=HEADER_MARKER.encode('utf-8'),
+        min_size=MIN_FILE_SIZE,
+        parse=parse_tepco_csv,
+        force=force
+    )
+
+
+def parse_tepco_csv(file_path: Path):
     """
-    TEPCOデータの妥当性を検証
+    TEPCOデータを1回だけ読み込んで検証
 
     Args:
         file_path: CSVファイルパス
 
     Returns:
-        bool: 妥当ならTrue、不正ならFalse
+        DataFrame: timestamp列を追加したデータ（不正ならNone）
     """
     try:
-        # ファイルサイズチェック（最低1KB）
-        if file_path.stat().st_size < 1024:
-            print("✗ File is too small")
-            return False
-
-        # 1行目のヘッダーチェック
-        with open(file_path, 'r', encoding='utf-8') as f:
-            first_line = f.readline()
-            if '単位[MW平均]' not in first_line:
-                print("✗ Invalid header: '単位[MW平均]' not found")
-                return False
-
-        # データ読み込みテスト
         df = pd.read_csv(file_path, skiprows=1)
 
         # 必須カラムの存在確認
-        required_columns = ['DATE', 'TIME', '太陽光発電実績', '風力発電実績']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
         if missing_columns:
             print(f"✗ Missing required columns: {missing_columns}")
-            return False
+            return None
 
         # レコード数チェック（最低10レコード）
-        if len(df) < 10:
+        if len(df) < MIN_RECORDS:
             print(f"✗ Too few records: {len(df)}")
-            return False
+            return None
+
+        df['timestamp'] = pd.to_datetime(df['DATE'] + ' ' + df['TIME'], format='%Y/%m/%d %H:%M')
 
         print(f"✓ Validation passed: {len(df)} records")
-        return True
+        return df
 
     except Exception as e:
         print(f"✗ Validation error: {e}")
-        return False
+        return None
 
 
-def get_file_hash(file_path: Path):
+def to_store_frame(df: pd.DataFrame) -> pd.DataFrame:
     """
-    ファイルのMD5ハッシュを取得
+    パースしたデータをストアの列に変換
 
     Args:
-        file_path: ファイルパス
+        df: parse_tepco_csv() の戻り値
 
     Returns:
-        str: MD5ハッシュ（ファイルが存在しない場合はNone）
+        DataFrame: timestamp, pv_mw, wind_mw, total_mw
     """
-    if not file_path.exists():
-        return None
+    return pd.DataFrame({
+        'timestamp': df['timestamp'],
+        'pv_mw': df['太陽光発電実績'],
+        'wind_mw': df['風力発電実績'],
+        'total_mw': df['太陽光発電実績'] + df['風力発電実績']
+    })
+
+
+async def fetch_latest(output_file: Path, force: bool):
+    """当月分（月初は前月分も）を順に試行"""
+    year_months = get_target_year_month()
+    print(f"Target year-months: {year_months}")
+
+    async with http_fetch.create_client() as client:
+        for ym in year_months:
+            result = await fetch_tepco_data(client, ym, output_file, force)
+            if result['status'] in ('not_modified', 'unchanged', 'updated'):
+                return result
 
-    md5_hash = hashlib.md5()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            md5_hash.update(chunk)
+    return None
+
+
+async def backfill(year_months: list, concurrency: int):
+    """
+    複数月を並行ダウンロードしてストアに追記
+
+    Args:
+        year_months: 年月（YYYYMM形式）のリスト
+        concurrency: 最大同時ダウンロード数
+
+    Returns:
+        list[dict]: 月ごとの http_fetch.fetch_file() の結果
+    """
+    async with http_fetch.create_client() as client:
+        return await http_fetch.run_bounded([
+            fetch_tepco_data(client, ym, RAW_DIR / f"eria_jukyu_{ym}_03.csv")
+            for ym in year_months
+        ], concurrency)
+
+
+def run_backfill(start: str, end: str, concurrency: int):
+    """バックフィルを実行して結果を表示"""
+    year_months = get_year_month_range(start, end)
+    print(f"Backfilling {len(year_months)} months ({start} - {end}), concurrency {concurrency}")
+
+    results = asyncio.run(backfill(year_months, concurrency))
+
+    # ストアへの追記は並行ダウンロードが終わってから順に行う
+    print("\nBackfill results:")
+    for ym, result in zip(year_months, results):
+        line = f"  {ym}: {result['status']}"
+        if result['status'] == 'updated':
+            updated = datastore.append_partitions('generation', 'tokyo', to_store_frame(result['data']))
+            line += f" ({len(result['data'])} records, partitions updated: {updated or 'none'})"
+        print(line)
+
+    failed = [ym for ym, result in zip(year_months, results) if result['status'] in ('invalid', 'failed')]
+    if failed:
+        print(f"\n✗ Failed months: {failed}")
+        sys.exit(1)
 
-    return md5_hash.hexdigest()
+    print(f"\n✓ TEPCO backfill completed!")
 
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser(description='TEPCOエリア需給実績CSVの取得')
+    parser.add_argument('--backfill', nargs=2, metavar=('START', 'END'),
+                        help='指定した年月の範囲（YYYYMM YYYYMM）をまとめて取得')
+    parser.add_argument('--concurrency', type=int, default=BACKFILL_CONCURRENCY,
+                        help=f'バックフィルの同時ダウンロード数（デフォルト: {BACKFILL_CONCURRENCY}）')
+    args = parser.parse_args()
+
+    if args.backfill:
+        run_backfill(*args.backfill, args.concurrency)
+        return
+
     # データディレクトリ
     data_dir = Path(__file__).parent.parent / 'data' / 'seed'
     data_dir.mkdir(parents=True, exist_ok=True)
     output_file = data_dir / 'generation_tokyo_tepco.csv'
 
-    # 既存ファイルのハッシュを保存
-    old_hash = get_file_hash(output_file)
-    print(f"Old file hash: {old_hash or 'N/A (file does not exist)'}")
-
-    # 対象年月リストを取得
-    year_months = get_target_year_month()
-    print(f"Target year-months: {year_months}")
+    # ストアが空なら同じ内容でもパースして追記する
+    force = not datastore.has_partitions('generation', 'tokyo')
 
-    # ダウンロード試行
-    success = False
-    for ym in year_months:
-        if fetch_tepco_data(ym, output_file):
-            success = True
-            break
+    result = asyncio.run(fetch_latest(output_file, force))
 
-    if not success:
+    if result is None:
         print("\n✗ Failed to fetch TEPCO data")
         sys.exit(1)
 
-    # ハッシュ比較
-    new_hash = get_file_hash(output_file)
-    print(f"New file hash: {new_hash}")
+    print(f"File hash: {result['hash']}")
 
-    if old_hash == new_hash:
+    if result['status'] != 'updated':
         print("\nℹ No changes detected in TEPCO data")
-    else:
-        print("\n✓ TEPCO data updated successfully")
+        return
 
-    # データ統計を表示
-    try:
-        df = pd.read_csv(output_file, skiprows=1)
-        df['timestamp'] = pd.to_datetime(df['DATE'] + ' ' + df['TIME'], format='%Y/%m/%d %H:%M')
+    print("\n✓ TEPCO data updated successfully")
 
-        print(f"\nData statistics:")
-        print(f"  Records: {len(df)}")
-        print(f"  Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
-        print(f"  Solar range: {df['太陽光発電実績'].min():.0f} - {df['太陽光発電実績'].max():.0f} MW")
-        print(f"  Wind range: {df['風力発電実績'].min():.0f} - {df['風力発電実績'].max():.0f} MW")
-    except Exception as e:
-        print(f"⚠ Could not display statistics: {e}")
+    # ダウンロード時に読み込んだデータから統計を表示
+    df = result['data']
+    solar = df['太陽光発電実績'].agg(['min', 'max'])
+    wind = df['風力発電実績'].agg(['min', 'max'])
+
+    print(f"\nData statistics:")
+    print(f"  Records: {len(df)}")
+    print(f"  Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
+    print(f"  Solar range: {solar['min']:.0f} - {solar['max']:.0f} MW")
+    print(f"  Wind range: {wind['min']:.0f} - {wind['max']:.0f} MW")
+
+    # 列指向ストアに月パーティションとして追記（同じデータなら変更なし）
+    updated = datastore.append_partitions('generation', 'tokyo', to_store_frame(df))
+    print(f"\nStore partitions updated: {updated or 'none'}")
 
     print(f"\n✓ TEPCO data fetch completed!")
 
@@ -0,0 +1,287 @@
+"""
+取得スクリプト共通の非同期HTTPダウンローダー
+
+条件付きリクエスト（ETag / If-Modified-Since）で変更のないファイルは304だけで済ませ、
+途中で切れたダウンロードは Range リクエストで続きから再開します。
+検証情報は出力ファイルの隣に {ファイル名}.meta.json として保存します。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import httpx
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=30.0)
+MAX_RETRIES = 3
+
+
+def create_client() -> httpx.AsyncClient:
+    """ダウンロード用のHTTPクライアントを作成"""
+    return httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, follow_redirects=True)
+
+
+def _meta_path(output_file: Path) -> Path:
+    """検証情報ファイルのパス"""
+    return output_file.with_name(output_file.name + '.meta.json')
+
+
+def _part_path(output_file: Path) -> Path:
+    """ダウンロード途中のファイルのパス"""
+    return output_file.with_name(output_file.name + '.part')
+
+
+def load_meta(output_file: Path) -> dict:
+    """
+    保存済みの検証情報を読み込む
+
+    Args:
+        output_file: 出力ファイルパス
+
+    Returns:
+        url, etag, last_modified, hash などの辞書（なければ空）
+    """
+    path = _meta_path(output_file)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_meta(output_file: Path, meta: dict):
+    """検証情報を保存"""
+    with open(_meta_path(output_file), 'w') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+
+def file_hash(file_path: Path, md5_hash=None):
+    """
+    ファイルのMD5ハッシュを計算
+
+    Args:
+        file_path: ファイルパス
+        md5_hash: 続きから更新するハッシュオブジェクト（Noneなら新規）
+
+    Returns:
+        ハッシュオブジェクト（ファイルが存在しない場合はNone）
+    """
+    if not file_path.exists():
+        return None
+
+    md5_hash = md5_hash or hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            md5_hash.update(chunk)
+
+    return md5_hash
+
+
+def _validators(response: httpx.Response) -> dict:
+    """レスポンスの検証ヘッダー"""
+    return {
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified')
+    }
+
+
+def _request_headers(url: str, output_file: Path, meta: dict, force: bool) -> dict:
+    """再開・条件付きリクエストのヘッダーを組み立てる"""
+    part_file = _part_path(output_file)
+    partial = meta.get('partial') or {}
+
+    # 同じURLの途中ファイルがあれば続きから（サーバー側が変わっていれば If-Range で全体が返る）
+    if part_file.exists() and partial.get('url') == url:
+        validator = partial.get('etag') or partial.get('last_modified')
+        if validator:
+            return {'Range': f'bytes={part_file.stat().st_size}-', 'If-Range': validator}
+
+    part_file.unlink(missing_ok=True)
+
+    headers = {}
+    if not force and output_file.exists() and meta.get('url') == url:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+
+async def _download(client: httpx.AsyncClient, url: str, output_file: Path, meta: dict,
+                    headers: dict, header_marker: bytes):
+    """
+    1回分のダウンロード（途中ファイルに追記しながらハッシュを更新）
+
+    Returns:
+        (レスポンス, ハッシュ, サイズ)。304ならハッシュはNone
+    """
+    part_file = _part_path(output_file)
+
+    async with client.stream('GET', url, headers=headers) as response:
+        if response.status_code == 304:
+            return response, None, 0
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            md5_hash = file_hash(part_file)
+            size = part_file.stat().st_size
+            mode = 'ab'
+        else:
+            md5_hash = hashlib.md5()
+            size = 0
+            mode = 'wb'
+
+        # 再開用に検証情報を先に記録しておく
+        meta['partial'] = {'url': url, **_validators(response)}
+        _save_meta(output_file, meta)
+
+        # 1行目のヘッダーは届いた時点で確認（不正なら本体を読まない）
+        head = b'' if size == 0 and header_marker is not None else None
+
+        with open(part_file, mode) as f:
+            # 受信した分はすぐ書き込む（切断されても次の試行で続きから再開できる）
+            async for chunk in response.aiter_bytes():
+                if head is not None:
+                    head += chunk
+                    if b'\n' in head or len(head) >= CHUNK_SIZE:
+                        if header_marker not in head.split(b'\n', 1)[0]:
+                            raise ValueError(f"Invalid header: {header_marker!r} not found")
+                        head = None
+
+                md5_hash.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+
+    return response, md5_hash.hexdigest(), size
+
+
+async def fetch_file(
+    client: httpx.AsyncClient,
+    url: str,
+    output_file: Path,
+    header_marker: bytes = None,
+    min_size: int = 0,
+    parse=None,
+    force: bool = False,
+    max_retries: int = MAX_RETRIES
+) -> dict:
+    """
+    ファイルを条件付きでダウンロード
+
+    変更がなければ304で終了し、ダウンロードした内容が既存ファイルと同じなら
+    パースせずに破棄する。内容が変わっていれば parse で検証してから置き換える。
+    通信エラーはリトライし、途中まで取得した分は次の試行で続きから再開する。
+
+    Args:
+        client: HTTPクライアント
+        url: ダウンロードURL
+        output_file: 出力ファイルパス
+        header_marker: 1行目に含まれるべきバイト列（Noneならチェックしない）
+        min_size: 最小ファイルサイズ（バイト）
+        parse: ダウンロードしたファイルを読み込む関数（Noneを返したら不正として破棄）
+        force: Trueなら条件付きリクエストと同一内容のスキップをしない
+        max_retries: 最大リトライ回数
+
+    Returns:
+        dict: status（not_modified / unchanged / updated / not_found / invalid / failed）,
+              url, path, hash, data（parse の戻り値）
+    """
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    part_file = _part_path(output_file)
+    meta = load_meta(output_file)
+    result = {'status': 'failed', 'url': url, 'path': output_file, 'hash': meta.get('hash'), 'data': None}
+
+    for attempt in range(max_retries):
+        headers = _request_headers(url, output_file, meta, force)
+        try:
+            response, new_hash, size = await _download(client, url, output_file, meta, headers, header_marker)
+            break
+        except httpx.HTTPStatusError as e:
+            status_code = e.response.status_code
+            if status_code == 404:
+                print(f"✗ File not found (404): {url}")
+                result['status'] = 'not_found'
+                return result
+            if status_code == 416:
+                # 途中ファイルがサーバー側より大きい：最初から取り直す
+                part_file.unlink(missing_ok=True)
+            print(f"⚠ Attempt {attempt + 1}/{max_retries} failed (HTTP {status_code}): {url}")
+        except ValueError as e:
+            # 中身が不正なファイルはリトライしない
+            print(f"✗ {e}: {url}")
+            part_file.unlink(missing_ok=True)
+            result['status'] = 'invalid'
+            return result
+        except httpx.TimeoutException:
+            print(f"⚠ Timeout on attempt {attempt + 1}/{max_retries}: {url}")
+        except httpx.TransportError as e:
+            print(f"⚠ Error on attempt {attempt + 1}/{max_retries}: {e!r}")
+        await asyncio.sleep(2 ** attempt)  # 指数バックオフ: 1秒, 2秒, 4秒
+    else:
+        return result
+
+    if new_hash is None:
+        print(f"ℹ Not modified (304): {url}")
+        result['status'] = 'not_modified'
+        return result
+
+    meta.pop('partial', None)
+
+    if size < min_size:
+        print(f"✗ File is too small: {size} bytes: {url}")
+        part_file.unlink()
+        _save_meta(output_file, meta)
+        result['status'] = 'invalid'
+        return result
+
+    # 既存ファイルと同じ内容ならパースしない（検証情報だけ更新）
+    old_hash = meta.get('hash')
+    if old_hash is None and output_file.exists():
+        old_hash = file_hash(output_file).hexdigest()
+
+    validators = {'url': url, **_validators(response), 'hash': new_hash}
+
+    if new_hash == old_hash and not force:
+        part_file.unlink()
+        _save_meta(output_file, validators)
+        result.update(status='unchanged', hash=new_hash)
+        return result
+
+    if parse is not None:
+        data = parse(part_file)
+        if data is None:
+            print(f"⚠ Downloaded file is invalid: {url}")
+            part_file.unlink()
+            _save_meta(output_file, meta)
+            result['status'] = 'invalid'
+            return result
+        result['data'] = data
+
+    os.replace(part_file, output_file)
+    _save_meta(output_file, validators)
+    print(f"✓ Downloaded to {output_file}")
+
+    result.update(status='updated', hash=new_hash)
+    return result
+
+
+async def run_bounded(coroutines: list, concurrency: int) -> list:
+    """
+    コルーチンを同時実行数を制限して並行実行
+
+    Args:
+        coroutines: コルーチンのリスト
+        concurrency: 最大同時実行数
+
+    Returns:
+        結果のリスト（coroutines と同じ順序）
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
@@ -9,8 +9,61 @@ import numpy as np
 import lightgbm as lgb
 import joblib
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
 import json
+import os
+import time
+
+import datastore
+
+DATA_DIR = Path(__file__).parent.parent / 'data' / 'seed'
+MODEL_DIR = Path(__file__).parent.parent / 'models'
+
+# 学習対象ごとの設定
+TARGETS = {
+    'generation': {
+        'title': 'Generation Model (Renewable Energy)',
+        'target_col': 'renewable_total_mw',
+        'unit': 'MW'
+    },
+    'price': {
+        'title': 'Price Model',
+        'target_col': 'price_yen',
+        'unit': '円/kWh'
+    }
+}
+
+AREAS = ['tokyo']
+
+# フル学習のブースティング回数の上限（tune.py の探索結果があればその best_rounds を使う）
+NUM_BOOST_ROUND = 200
+
+# 増分学習で追加するブースティング回数
+INCREMENTAL_ROUNDS = 20
+
+# Lag特徴と移動統計量の窓（30分単位）
+LAGS = [1, 2, 48, 96]
+ROLLING_WINDOWS = [24, 48]
+
+# 増分学習時に新しい行の前に読み直す行数（最大のLag・移動窓）
+LAG_WINDOW = max(LAGS + ROLLING_WINDOWS)
+
+# この日数ごとにフル再学習する
+FULL_RETRAIN_INTERVAL_DAYS = 7
+
+# LightGBMパラメータ
+PARAMS = {
+    'objective': 'regression',
+    'metric': 'rmse',
+    'num_leaves': 31,
+    'learning_rate': 0.05,
+    'feature_fraction': 0.9,
+    'bagging_fraction': 0.8,
+    'bagging_freq': 5,
+    'verbose': -1
+}
 
 
 def load_tepco_csv(file_path: Path) -> pd.DataFrame:
@@ -23,8 +76,13 @@ def load_tepco_csv(file_path: Path) -> pd.DataFrame:
     Returns:
         読み込んだDataFrame
     """
-    # ヘッダー行（単位[MW平均],,,供給力）をスキップして読み込み
-    df = pd.read_csv(file_path, skiprows=1)
+    # ヘッダー行（単位[MW平均],,,供給力）をスキップして、使う列だけ読み込み
+    df = pd.read_csv(
+        file_path,
+        skiprows=1,
+        usecols=['DATE', 'TIME', '太陽光発電実績', '風力発電実績'],
+        dtype={'太陽光発電実績': np.float32, '風力発電実績': np.float32}
+    )
 
     # DATEとTIMEを結合してtimestampを作成
     df['timestamp'] = pd.to_datetime(df['DATE'] + ' ' + df['TIME'], format='%Y/%m/%d %H:%M')
@@ -35,104 +93,281 @@ def load_tepco_csv(file_path: Path) -> pd.DataFrame:
     return df
 
 
-def create_features(df: pd.DataFrame) -> pd.DataFrame:
+def load_target_data(target: str, area: str = 'tokyo', start: str = None, end: str = None) -> pd.DataFrame:
     """
-    特徴量を生成
+    学習対象のデータを読み込む
+
+    列指向ストア（datastore）にデータがあれば必要な月のパーティションだけを読み、
+    なければ data/seed のCSVを読む。
 
     Args:
-        df: 入力DataFrame（timestamp列が必要）
+        target: 'generation' または 'price'
+        area: エリア名
+        start: 開始日時（含む、Noneなら先頭から）
+        end: 終了日時（含む、日付だけならその日の終わりまで、Noneなら末尾まで）
 
     Returns:
-        特徴量が追加されたDataFrame
+        timestamp列とターゲット列を含むDataFrame
     """
-    df = df.copy()
+    if target not in TARGETS:
+        raise ValueError(f"Unknown target: {target}")
+
+    if datastore.has_partitions(target, area):
+        df = datastore.read_range(target, area, start, end)
+        source = 'store'
+    elif target == 'generation':
+        # 東京電力形式
+        df = load_tepco_csv(DATA_DIR / f'generation_{area}_tepco.csv')
+        source = 'csv'
+    else:
+        df = pd.read_csv(DATA_DIR / f'price_{area}_sample.csv', parse_dates=['timestamp'])
+        source = 'csv'
+
+    if source == 'csv':
+        if start is not None:
+            df = df[df['timestamp'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[datastore.before_end(df['timestamp'], end)]
+    elif target == 'generation':
+        df = df.rename(columns={
+            'pv_mw': '太陽光発電実績',
+            'wind_mw': '風力発電実績',
+            'total_mw': 'renewable_total_mw'
+        })
+
+    print(f"[{target}/{area}] Loaded {len(df)} records from {source}")
+
+    if target == 'generation':
+        print(f"[{target}/{area}] Solar range: {df['太陽光発電実績'].min():.0f} - {df['太陽光発電実績'].max():.0f} MW")
+        print(f"[{target}/{area}] Wind range: {df['風力発電実績'].min():.0f} - {df['風力発電実績'].max():.0f} MW")
+        print(f"[{target}/{area}] Renewable total range: {df['renewable_total_mw'].min():.0f} - {df['renewable_total_mw'].max():.0f} MW")
 
-    # timestampが文字列の場合のみ変換
-    if df['timestamp'].dtype == 'object':
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
 
-    # 時刻特徴（周期性を考慮）
-    df['hour'] = df['timestamp'].dt.hour
-    df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-    df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
 
-    # 曜日特徴
-    df['day_of_week'] = df['timestamp'].dt.dayofweek
-    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+def get_feature_cols(target_col: str) -> list:
+    """
+    学習に使う特徴量の列名リストを取得
 
-    # 月特徴（季節性）
-    df['month'] = df['timestamp'].dt.month
-    df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-    df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
+    Args:
+        target_col: ターゲット列名
+
+    Returns:
+        特徴量の列名リスト
+    """
+    return [
+        'hour_sin', 'hour_cos',
+        'day_of_week', 'is_weekend',
+        'month_sin', 'month_cos',
+        f'{target_col}_lag_1', f'{target_col}_lag_2',
+        f'{target_col}_lag_48', f'{target_col}_lag_96',
+        f'{target_col}_rolling_mean_24', f'{target_col}_rolling_std_24',
+        f'{target_col}_rolling_mean_48', f'{target_col}_rolling_std_48'
+    ]
 
-    # 年間通算日
-    df['day_of_year'] = df['timestamp'].dt.dayofyear
 
-    return df
+def _rolling_mean_std(values: np.ndarray, window: int, mean_out: np.ndarray, std_out: np.ndarray):
+    """
+    累積和で移動平均・移動標準偏差（ddof=1）を計算して出力先に書き込む
 
+    先頭 window - 1 行と、欠損（NaN）を含む窓はNaN（pandas の rolling(window) と同じ）。
+    欠損は0として累積し、窓内の欠損数も累積和で数えるため、欠損の後の窓には影響しない。
+    分散の桁落ちを避けるため、全体平均を引いてから累積する。
 
-def create_lag_features(df: pd.DataFrame, target_col: str, lags: list = [1, 2, 48, 96]) -> pd.DataFrame:
+    Args:
+        values: 入力系列（float）
+        window: 窓幅
+        mean_out: 移動平均の出力先（values と同じ長さ）
+        std_out: 移動標準偏差の出力先（values と同じ長さ）
+    """
+    centered = values.astype(np.float64)
+    missing = np.isnan(centered)
+    offset = np.nanmean(centered) if len(centered) and not missing.all() else 0.0
+    centered -= offset
+    centered[missing] = 0.0
+
+    csum = np.zeros(len(values) + 1)
+    np.cumsum(centered, out=csum[1:])
+    csum_sq = np.zeros(len(values) + 1)
+    np.cumsum(centered * centered, out=csum_sq[1:])
+    del centered
+
+    csum_missing = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(missing, out=csum_missing[1:])
+    window_missing = csum_missing[window:] - csum_missing[:-window]
+    del missing, csum_missing
+
+    window_sum = csum[window:] - csum[:-window]
+    window_sum_sq = csum_sq[window:] - csum_sq[:-window]
+    del csum, csum_sq
+
+    mean = window_sum / window + offset
+    var = (window_sum_sq - window_sum * window_sum / window) / (window - 1)
+    np.maximum(var, 0, out=var)
+    std = np.sqrt(var)
+    mean[window_missing > 0] = np.nan
+    std[window_missing > 0] = np.nan
+
+    mean_out[:window - 1] = np.nan
+    std_out[:window - 1] = np.nan
+    mean_out[window - 1:] = mean
+    std_out[window - 1:] = std
+
+
+def build_feature_matrix(df: pd.DataFrame, target_col: str):
     """
-    Lag特徴量を生成
+    特徴量行列を直接作成（pandas の shift / rolling で特徴量を作って dropna したのと同じ結果）
+
+    特徴量は get_feature_cols() の順に float32 の行列へ一度に確保して書き込み、
+    Lagはスライス、移動平均・標準偏差は累積和で計算する。中間DataFrameは作らない。
+    Lag・移動窓が揃わない先頭行は除く（欠損が途中にある場合のみ行をコピー）。
 
     Args:
-        df: 入力DataFrame
+        df: 入力DataFrame（timestamp列とターゲット列が必要、時系列順）
         target_col: ターゲット列名
-        lags: ラグのリスト（30分単位）
 
     Returns:
-        Lag特徴量が追加されたDataFrame
+        (X, y, timestamps) いずれもnumpy配列
     """
-    df = df.copy()
+    timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]')
+    values = df[target_col].to_numpy(dtype=np.float32)
+    n = len(values)
 
-    for lag in lags:
-        df[f'{target_col}_lag_{lag}'] = df[target_col].shift(lag)
+    feature_cols = get_feature_cols(target_col)
+    X = np.empty((n, len(feature_cols)), dtype=np.float32)
+    columns = {col: X[:, j] for j, col in enumerate(feature_cols)}
 
-    # 移動平均
-    for window in [24, 48]:
-        df[f'{target_col}_rolling_mean_{window}'] = df[target_col].rolling(window=window).mean()
-        df[f'{target_col}_rolling_std_{window}'] = df[target_col].rolling(window=window).std()
+    # 時刻特徴（周期性を考慮）
+    days = timestamps.astype('datetime64[D]')
+    hour = (timestamps - days).astype('timedelta64[h]').astype(np.int64)
+    columns['hour_sin'][:] = np.sin(2 * np.pi * hour / 24)
+    columns['hour_cos'][:] = np.cos(2 * np.pi * hour / 24)
+    del hour
+
+    # 曜日特徴（1970-01-01は木曜日）
+    day_of_week = (days.astype(np.int64) + 3) % 7
+    columns['day_of_week'][:] = day_of_week
+    columns['is_weekend'][:] = day_of_week >= 5
+    del day_of_week, days
 
-    return df
+    # 月特徴（季節性）
+    month = timestamps.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    columns['month_sin'][:] = np.sin(2 * np.pi * month / 12)
+    columns['month_cos'][:] = np.cos(2 * np.pi * month / 12)
+    del month
+
+    # Lag特徴
+    for lag in LAGS:
+        column = columns[f'{target_col}_lag_{lag}']
+        column[:lag] = np.nan
+        column[lag:] = values[:n - lag]
+
+    # 移動平均・標準偏差
+    for window in ROLLING_WINDOWS:
+        _rolling_mean_std(
+            values,
+            window,
+            columns[f'{target_col}_rolling_mean_{window}'],
+            columns[f'{target_col}_rolling_std_{window}']
+        )
+
+    # 欠損行を除く（通常は先頭のLag窓だけなのでビューで済む）
+    start = min(max(LAGS + [w - 1 for w in ROLLING_WINDOWS]), n)
+    X, values, timestamps = X[start:], values[start:], timestamps[start:]
+
+    valid = ~np.isnan(values) & ~np.isnan(X).any(axis=1)
+    if not valid.all():
+        X, values, timestamps = X[valid], values[valid], timestamps[valid]
+
+    return X, values, timestamps
+
+
+def build_training_data(target: str, area: str = 'tokyo', start: str = None, end: str = None):
+    """
+    学習用の特徴量とターゲットを作成
 
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        start: 開始日時（Noneなら先頭から）
+        end: 終了日時（Noneなら末尾まで）
 
-def train_generation_model():
-    """発電量予測モデルを学習（再エネ発電量）"""
-    print("=" * 60)
-    print("Training Generation Model (Renewable Energy)")
-    print("=" * 60)
+    Returns:
+        (X, y, timestamps, feature_cols)
+    """
+    target_col = TARGETS[target]['target_col']
 
-    # データロード（東京電力形式）
-    data_dir = Path(__file__).parent.parent / 'data' / 'seed'
-    df = load_tepco_csv(data_dir / 'generation_tokyo_tepco.csv')
+    # データロード・特徴量生成
+    X, y, timestamps = build_feature_matrix(load_target_data(target, area, start, end), target_col)
+    print(f"[{target}/{area}] After dropping NaN: {len(X)} records")
 
-    print(f"Loaded {len(df)} records")
-    print(f"Solar range: {df['太陽光発電実績'].min():.0f} - {df['太陽光発電実績'].max():.0f} MW")
-    print(f"Wind range: {df['風力発電実績'].min():.0f} - {df['風力発電実績'].max():.0f} MW")
-    print(f"Renewable total range: {df['renewable_total_mw'].min():.0f} - {df['renewable_total_mw'].max():.0f} MW")
+    return X, y, timestamps, get_feature_cols(target_col)
 
-    # 特徴量生成
-    df = create_features(df)
-    df = create_lag_features(df, 'renewable_total_mw')
 
-    # 欠損値削除
-    df = df.dropna()
-    print(f"After dropping NaN: {len(df)} records")
+def _load_tuning(target: str, area: str = 'tokyo') -> dict:
+    """tune.pyが保存した models/{target}_{area}.params.json の内容（なければ空）"""
+    params_path = MODEL_DIR / f'{target}_{area}.params.json'
+    if not params_path.exists():
+        return {}
+
+    with open(params_path) as f:
+        return json.load(f)
 
-    # 学習データ準備
-    feature_cols = [
-        'hour_sin', 'hour_cos',
-        'day_of_week', 'is_weekend',
-        'month_sin', 'month_cos',
-        'renewable_total_mw_lag_1', 'renewable_total_mw_lag_2',
-        'renewable_total_mw_lag_48', 'renewable_total_mw_lag_96',
-        'renewable_total_mw_rolling_mean_24', 'renewable_total_mw_rolling_std_24',
-        'renewable_total_mw_rolling_mean_48', 'renewable_total_mw_rolling_std_48'
-    ]
 
-    X = df[feature_cols]
-    y = df['renewable_total_mw']
+def load_params(target: str, area: str = 'tokyo') -> dict:
+    """
+    LightGBMパラメータを取得
+
+    tune.pyが保存した models/{target}_{area}.params.json があれば既定値に上書きする。
+
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
 
+    Returns:
+        パラメータ辞書
+    """
+    params = dict(PARAMS)
+
+    tuning = _load_tuning(target, area)
+    if tuning:
+        params.update(tuning['params'])
+        print(f"[{target}/{area}] Using tuned params from {MODEL_DIR / f'{target}_{area}.params.json'}")
+
+    return params
+
+
+def load_num_boost_round(target: str, area: str = 'tokyo') -> int:
+    """
+    ブースティング回数の上限を取得
+
+    tune.pyの探索結果があれば、そのパラメータで交差検証したときの最適な回数（best_rounds）を使う
+    （探索と同じ回数で学習するため）。
+
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+
+    Returns:
+        回数
+    """
+    return int(_load_tuning(target, area).get('best_rounds', NUM_BOOST_ROUND))
+
+
+def fit_model(X, y, params: dict, feature_cols: list, num_boost_round: int = NUM_BOOST_ROUND):
+    """
+    時系列の80/20分割とEarly Stoppingでモデルを学習
+
+    Args:
+        X: 特徴量行列
+        y: ターゲット
+        params: LightGBMパラメータ
+        feature_cols: 特徴量の列名リスト
+        num_boost_round: ブースティング回数の上限（load_num_boost_round() の戻り値）
+
+    Returns:
+        (model, X_test, y_test)
+    """
     # 学習データとテストデータに分割（時系列なので単純分割）
     split_idx = int(len(X) * 0.8)
     X_train, X_test = X[:split_idx], X[split_idx:]
@@ -140,157 +375,429 @@ def train_generation_model():
 
     print(f"Train: {len(X_train)}, Test: {len(X_test)}")
 
-    # LightGBM学習
-    params = {
-        'objective': 'regression',
-        'metric': 'rmse',
-        'num_leaves': 31,
-        'learning_rate': 0.05,
-        'feature_fraction': 0.9,
-        'bagging_fraction': 0.8,
-        'bagging_freq': 5,
-        'verbose': -1
-    }
-
-    train_data = lgb.Dataset(X_train, label=y_train)
+    # 行列のスライス（ビュー）をそのまま渡す
+    train_data = lgb.Dataset(X_train, label=y_train, feature_name=feature_cols, free_raw_data=True)
     test_data = lgb.Dataset(X_test, label=y_test, reference=train_data)
 
     model = lgb.train(
         params,
         train_data,
-        num_boost_round=200,
+        num_boost_round=num_boost_round,
         valid_sets=[test_data],
         callbacks=[lgb.early_stopping(stopping_rounds=20), lgb.log_evaluation(period=50)]
     )
 
-    # 評価
-    y_pred = model.predict(X_test, num_iteration=model.best_iteration)
-    rmse = np.sqrt(np.mean((y_test - y_pred) ** 2))
-    mae = np.mean(np.abs(y_test - y_pred))
-    mape = np.mean(np.abs((y_test - y_pred) / y_test)) * 100
+    return model, X_test, y_test
 
-    print(f"\nTest Metrics:")
-    print(f"  RMSE: {rmse:.2f} MW")
-    print(f"  MAE: {mae:.2f} MW")
-    print(f"  MAPE: {mape:.2f}%")
 
-    # モデル保存
-    model_dir = Path(__file__).parent.parent / 'models'
-    model_dir.mkdir(parents=True, exist_ok=True)
+def evaluate_model(model, X, y) -> dict:
+    """
+    RMSE・MAE・MAPEを計算
 
-    model_path = model_dir / 'generation_tokyo.pkl'
+    Args:
+        model: LightGBMモデル
+        X: 特徴量
+        y: 正解値
+
+    Returns:
+        メトリクス辞書
+    """
+    y = np.asarray(y, dtype=np.float64)
+    y_pred = model.predict(X, num_iteration=model.best_iteration)
+    rmse = np.sqrt(np.mean((y - y_pred) ** 2))
+    mae = np.mean(np.abs(y - y_pred))
+    mape = np.mean(np.abs((y - y_pred) / y)) * 100
+
+    return {'rmse': rmse, 'mae': mae, 'mape': mape}
+
+
+def print_metrics(title: str, metrics: dict, unit: str):
+    """メトリクスを表示"""
+    print(f"\n{title}:")
+    print(f"  RMSE: {metrics['rmse']:.2f} {unit}")
+    print(f"  MAE: {metrics['mae']:.2f} {unit}")
+    print(f"  MAPE: {metrics['mape']:.2f}%")
+
+
+def save_model(target: str, area: str, model, feature_cols: list, metrics: dict,
+               data_until: pd.Timestamp, full_trained_at: str = None):
+    """
+    モデルを保存
+
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        model: LightGBMモデル
+        feature_cols: 特徴量の列名リスト
+        metrics: メトリクス辞書
+        data_until: 学習に使った最新データの時刻（増分学習のウォーターマーク）
+        full_trained_at: 最後にフル再学習した時刻（Noneなら現在時刻）
+    """
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+
+    trained_at = datetime.now().isoformat()
+    model_path = MODEL_DIR / f'{target}_{area}.pkl'
     joblib.dump({
         'model': model,
         'feature_cols': feature_cols,
-        'metrics': {'rmse': rmse, 'mae': mae, 'mape': mape},
-        'trained_at': datetime.now().isoformat()
+        'metrics': metrics,
+        'trained_at': trained_at,
+        'data_until': data_until.isoformat(),
+        'full_trained_at': full_trained_at or trained_at
     }, model_path)
 
     print(f"\n✓ Model saved to {model_path}")
 
-    return model, feature_cols
 
+def train_model(target: str, area: str = 'tokyo', num_threads: int = 0, start: str = None, end: str = None):
+    """
+    指定したターゲット・エリアのモデルを学習して保存
 
-def train_price_model():
-    """価格予測モデルを学習"""
-    print("\n" + "=" * 60)
-    print("Training Price Model")
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        num_threads: LightGBMのスレッド数（0ならLightGBMの既定値）
+        start: 学習データの開始日時（Noneなら先頭から）
+        end: 学習データの終了日時（Noneなら末尾まで）
+
+    Returns:
+        (model, feature_cols, metrics)
+    """
+    config = TARGETS[target]
+
+    print("=" * 60)
+    print(f"Training {config['title']} [{area}]")
     print("=" * 60)
 
-    # データロード
-    data_dir = Path(__file__).parent.parent / 'data' / 'seed'
-    df = pd.read_csv(data_dir / 'price_tokyo_sample.csv')
+    X, y, timestamps, feature_cols = build_training_data(target, area, start, end)
 
-    print(f"Loaded {len(df)} records")
+    # LightGBM学習（tune.pyの探索結果があれば使う）
+    params = load_params(target, area)
+    if num_threads > 0:
+        params['num_threads'] = num_threads
 
-    # 特徴量生成
-    df = create_features(df)
-    df = create_lag_features(df, 'price_yen')
+    model, X_test, y_test = fit_model(X, y, params, feature_cols, load_num_boost_round(target, area))
 
-    # 欠損値削除
-    df = df.dropna()
-    print(f"After dropping NaN: {len(df)} records")
+    # 評価
+    metrics = evaluate_model(model, X_test, y_test)
+    print_metrics(f"[{target}/{area}] Test Metrics", metrics, config['unit'])
 
-    # 学習データ準備
-    feature_cols = [
-        'hour_sin', 'hour_cos',
-        'day_of_week', 'is_weekend',
-        'month_sin', 'month_cos',
-        'price_yen_lag_1', 'price_yen_lag_2', 'price_yen_lag_48', 'price_yen_lag_96',
-        'price_yen_rolling_mean_24', 'price_yen_rolling_std_24',
-        'price_yen_rolling_mean_48', 'price_yen_rolling_std_48'
-    ]
+    # モデル保存
+    save_model(target, area, model, feature_cols, metrics, pd.Timestamp(timestamps[-1]))
 
-    X = df[feature_cols]
-    y = df['price_yen']
+    return model, feature_cols, metrics
 
-    # 学習データとテストデータに分割
-    split_idx = int(len(X) * 0.8)
-    X_train, X_test = X[:split_idx], X[split_idx:]
-    y_train, y_test = y[:split_idx], y[split_idx:]
 
-    print(f"Train: {len(X_train)}, Test: {len(X_test)}")
+def continue_training(model, X, y, params: dict, feature_cols: list):
+    """
+    既存モデルに新しいデータでブースティングを追加
 
-    # LightGBM学習
-    params = {
-        'objective': 'regression',
-        'metric': 'rmse',
-        'num_leaves': 31,
-        'learning_rate': 0.05,
-        'feature_fraction': 0.9,
-        'bagging_fraction': 0.8,
-        'bagging_freq': 5,
-        'verbose': -1
-    }
+    Args:
+        model: 既存のLightGBMモデル
+        X: 新しいデータの特徴量行列
+        y: 新しいデータの正解値
+        params: LightGBMパラメータ
+        feature_cols: 特徴量の列名リスト
 
-    train_data = lgb.Dataset(X_train, label=y_train)
-    test_data = lgb.Dataset(X_test, label=y_test, reference=train_data)
+    Returns:
+        更新後のモデル
+    """
+    # Early Stoppingのベスト反復までに切り詰めてから続きを学習
+    init_model = lgb.Booster(model_str=model.model_to_string())
 
-    model = lgb.train(
+    return lgb.train(
         params,
-        train_data,
-        num_boost_round=200,
-        valid_sets=[test_data],
-        callbacks=[lgb.early_stopping(stopping_rounds=20), lgb.log_evaluation(period=50)]
+        lgb.Dataset(X, label=y, feature_name=feature_cols),
+        num_boost_round=INCREMENTAL_ROUNDS,
+        init_model=init_model
     )
 
-    # 評価
-    y_pred = model.predict(X_test, num_iteration=model.best_iteration)
-    rmse = np.sqrt(np.mean((y_test - y_pred) ** 2))
-    mae = np.mean(np.abs(y_test - y_pred))
-    mape = np.mean(np.abs((y_test - y_pred) / y_test)) * 100
 
-    print(f"\nTest Metrics:")
-    print(f"  RMSE: {rmse:.2f} 円/kWh")
-    print(f"  MAE: {mae:.2f} 円/kWh")
-    print(f"  MAPE: {mape:.2f}%")
+def refresh_model(target: str, area: str = 'tokyo', num_threads: int = 0,
+                  full_retrain_days: int = FULL_RETRAIN_INTERVAL_DAYS):
+    """
+    前回学習以降の新しいデータで既存モデルを増分更新
 
-    # モデル保存
-    model_dir = Path(__file__).parent.parent / 'models'
-    model_dir.mkdir(parents=True, exist_ok=True)
+    前回のウォーターマーク（data_until、古いモデルでは trained_at）より新しい行と、
+    そのLag計算に必要な直前 LAG_WINDOW 行だけで特徴量を作り、既存モデルに
+    ブースティングを追加する。新しい行の末尾20%は評価用に残し、更新後のモデルの
+    メトリクスとして保存する（評価用の行は次回の更新で学習する）。モデルが無い場合や、
+    前回のフル再学習から full_retrain_days 日以上経っている場合はフル再学習する。
 
-    model_path = model_dir / 'price_tokyo.pkl'
-    joblib.dump({
-        'model': model,
-        'feature_cols': feature_cols,
-        'metrics': {'rmse': rmse, 'mae': mae, 'mape': mape},
-        'trained_at': datetime.now().isoformat()
-    }, model_path)
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        num_threads: LightGBMのスレッド数（0ならLightGBMの既定値）
+        full_retrain_days: フル再学習の間隔（日）
 
-    print(f"\n✓ Model saved to {model_path}")
+    Returns:
+        (model, feature_cols, metrics)
+    """
+    config = TARGETS[target]
+    target_col = config['target_col']
+    model_path = MODEL_DIR / f'{target}_{area}.pkl'
+
+    if not model_path.exists():
+        print(f"[{target}/{area}] No existing model; running full retrain")
+        return train_model(target, area, num_threads=num_threads)
+
+    saved = joblib.load(model_path)
+    full_trained_at = saved.get('full_trained_at', saved['trained_at'])
+
+    if datetime.now() - datetime.fromisoformat(full_trained_at) >= timedelta(days=full_retrain_days):
+        print(f"[{target}/{area}] Last full retrain at {full_trained_at}; running scheduled full retrain")
+        return train_model(target, area, num_threads=num_threads)
+
+    print("=" * 60)
+    print(f"Refreshing {config['title']} [{area}]")
+    print("=" * 60)
+
+    # ウォーターマークの直前（Lag窓）以降だけ読む
+    watermark = pd.Timestamp(saved.get('data_until', saved['trained_at']))
+    df = load_target_data(target, area, start=watermark - pd.Timedelta(30 * LAG_WINDOW, unit='min'))
+
+    new_mask = (df['timestamp'] > watermark).to_numpy()
+    if not new_mask.any():
+        print(f"[{target}/{area}] No new records since {watermark}; model is up to date")
+        return saved['model'], saved['feature_cols'], saved['metrics']
+
+    # 新しい行とLag計算に必要な直前の行だけで特徴量を作る
+    first_new = int(np.argmax(new_mask))
+    X_new, y_new, timestamps = build_feature_matrix(df.iloc[max(0, first_new - LAG_WINDOW):], target_col)
+    new_start = np.searchsorted(timestamps, np.datetime64(watermark), side='right')
+    X_new, y_new, timestamps = X_new[new_start:], y_new[new_start:], timestamps[new_start:]
+    print(f"[{target}/{area}] {int(new_mask.sum())} new records since {watermark} ({len(X_new)} usable)")
+
+    if len(X_new) == 0:
+        print(f"[{target}/{area}] Not enough history for lag features; running full retrain")
+        return train_model(target, area, num_threads=num_threads)
+
+    # 新しい行の末尾を評価用に残す（fit_model と同じ時系列の80/20分割）
+    split_idx = int(len(X_new) * 0.8)
+    if split_idx == 0:
+        print(f"[{target}/{area}] Too few new records to hold out; waiting for more data")
+        return saved['model'], saved['feature_cols'], saved['metrics']
+
+    X_train, X_holdout = X_new[:split_idx], X_new[split_idx:]
+    y_train, y_holdout = y_new[:split_idx], y_new[split_idx:]
+    feature_cols = saved['feature_cols']
+
+    before = evaluate_model(saved['model'], X_holdout, y_holdout)
+    print_metrics(f"[{target}/{area}] Holdout metrics (before refresh)", before, config['unit'])
+
+    params = load_params(target, area)
+    if num_threads > 0:
+        params['num_threads'] = num_threads
+
+    model = continue_training(saved['model'], X_train, y_train, params, feature_cols)
+    print(f"[{target}/{area}] Trees: {saved['model'].num_trees()} -> {model.num_trees()}")
+
+    # 保存するメトリクスは更新後のモデルのもの
+    metrics = evaluate_model(model, X_holdout, y_holdout)
+    print_metrics(f"[{target}/{area}] Holdout metrics (after refresh)", metrics, config['unit'])
+
+    # 評価用の行は学習していないため、ウォーターマークを学習した最後の行にして次回の更新で使う
+    save_model(target, area, model, feature_cols, metrics, pd.Timestamp(timestamps[split_idx - 1]), full_trained_at)
+
+    return model, feature_cols, metrics
 
+
+def compare_refresh(target: str, area: str = 'tokyo', new_records: int = 48, holdout: int = 48):
+    """
+    増分更新とフル再学習の所要時間・精度を比較
+
+    末尾 holdout 行を評価用に残し、その直前 new_records 行を「新しく取得したデータ」とみなす。
+    それより前のデータで学習したモデルを、増分更新した場合とフル再学習した場合で比較する。
+    モデルファイルは上書きしない。
+
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        new_records: 新しいデータの行数
+        holdout: 評価用に残す行数
+
+    Returns:
+        比較結果の辞書
+    """
+    config = TARGETS[target]
+    target_col = config['target_col']
+    feature_cols = get_feature_cols(target_col)
+    params = load_params(target, area)
+    num_boost_round = load_num_boost_round(target, area)
+
+    print("=" * 60)
+    print(f"Comparing refresh vs full retrain: {config['title']} [{area}]")
+    print("=" * 60)
+
+    raw = load_target_data(target, area)
+    X, y, timestamps = build_feature_matrix(raw, target_col)
+
+    t1 = len(X) - holdout
+    t0 = t1 - new_records
+    watermark = timestamps[t0 - 1]
+    cutoff = timestamps[t1]
+    X_holdout, y_holdout = X[t1:], y[t1:]
+
+    # ウォーターマーク時点のモデル
+    base_model, _, _ = fit_model(X[:t0], y[:t0], params, feature_cols, num_boost_round)
+
+    # 増分更新（新しい行＋Lag窓だけ特徴量を作り直す）
+    start = time.perf_counter()
+    known = raw[raw['timestamp'] < cutoff]
+    first_new = int(np.argmax((known['timestamp'] > watermark).to_numpy()))
+    X_tail, y_tail, tail_timestamps = build_feature_matrix(known.iloc[max(0, first_new - LAG_WINDOW):], target_col)
+    new_start = np.searchsorted(tail_timestamps, watermark, side='right')
+    X_tail, y_tail = X_tail[new_start:], y_tail[new_start:]
+    refreshed = continue_training(base_model, X_tail, y_tail, params, feature_cols)
+    refresh_sec = time.perf_counter() - start
+
+    # フル再学習
+    start = time.perf_counter()
+    X_full, y_full, _ = build_feature_matrix(raw[raw['timestamp'] < cutoff], target_col)
+    full_model, _, _ = fit_model(X_full, y_full, params, feature_cols, num_boost_round)
+    full_sec = time.perf_counter() - start
+
+    results = {
+        'base': evaluate_model(base_model, X_holdout, y_holdout),
+        'refresh': evaluate_model(refreshed, X_holdout, y_holdout),
+        'full': evaluate_model(full_model, X_holdout, y_holdout)
+    }
+
+    print(f"\n[{target}/{area}] new records: {len(X_tail)}, holdout: {len(X_holdout)}")
+    print(f"  {'':<10} {'time':>8} {'RMSE':>10} {'MAPE':>8}")
+    print(f"  {'no update':<10} {'-':>8} {results['base']['rmse']:10.2f} {results['base']['mape']:7.2f}%")
+    print(f"  {'refresh':<10} {refresh_sec:7.3f}s {results['refresh']['rmse']:10.2f} {results['refresh']['mape']:7.2f}%")
+    print(f"  {'full':<10} {full_sec:7.3f}s {results['full']['rmse']:10.2f} {results['full']['mape']:7.2f}%")
+
+    results['refresh']['elapsed_sec'] = refresh_sec
+    results['full']['elapsed_sec'] = full_sec
+
+    return results
+
+
+def train_generation_model():
+    """発電量予測モデルを学習（再エネ発電量）"""
+    model, feature_cols, _ = train_model('generation', 'tokyo')
+    return model, feature_cols
+
+
+def train_price_model():
+    """価格予測モデルを学習"""
+    model, feature_cols, _ = train_model('price', 'tokyo')
     return model, feature_cols
 
 
+def run_training_job(target: str, area: str, num_threads: int, incremental: bool = False,
+                     start: str = None, end: str = None) -> dict:
+    """
+    1件の学習ジョブを実行（ワーカープロセス用）
+
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        num_threads: LightGBMのスレッド数
+        incremental: Trueなら既存モデルを増分更新
+        start: 学習データの開始日時（フル再学習のみ）
+        end: 学習データの終了日時（フル再学習のみ）
+
+    Returns:
+        ジョブ結果の辞書（メトリクスと所要時間）
+    """
+    started = time.perf_counter()
+    if incremental:
+        _, _, metrics = refresh_model(target, area, num_threads=num_threads)
+    else:
+        _, _, metrics = train_model(target, area, num_threads=num_threads, start=start, end=end)
+
+    return {
+        'target': target,
+        'area': area,
+        'num_threads': num_threads,
+        'metrics': metrics,
+        'elapsed_sec': time.perf_counter() - started
+    }
+
+
+def train_parallel(targets: list, areas: list, workers: int = None, incremental: bool = False,
+                   start: str = None, end: str = None) -> list:
+    """
+    ターゲット×エリアの学習ジョブをプロセスプールで並列実行
+
+    CPUコアはジョブ間で分割し、各ジョブのLightGBMに num_threads として渡す。
+
+    Args:
+        targets: ターゲットのリスト
+        areas: エリアのリスト
+        workers: 並列プロセス数（Noneならジョブ数とコア数の小さい方）
+        incremental: Trueなら既存モデルを増分更新
+        start: 学習データの開始日時
+        end: 学習データの終了日時
+
+    Returns:
+        ジョブ結果のリスト
+    """
+    jobs = [(target, area) for target in targets for area in areas]
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, len(jobs)))
+    num_threads = max(1, cpu_count // workers)
+
+    print(f"Running {len(jobs)} jobs on {workers} workers ({num_threads} threads each)")
+
+    started = time.perf_counter()
+    results = []
+
+    if workers == 1:
+        for target, area in jobs:
+            results.append(run_training_job(target, area, num_threads, incremental, start, end))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(run_training_job, target, area, num_threads, incremental, start, end)
+                for target, area in jobs
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    total_sec = time.perf_counter() - started
+
+    print("\n" + "=" * 60)
+    print("Training summary")
+    print("=" * 60)
+    for result in sorted(results, key=lambda r: (r['target'], r['area'])):
+        print(
+            f"  {result['target']:<12} {result['area']:<10} "
+            f"{result['elapsed_sec']:7.2f}s  MAPE: {result['metrics']['mape']:.2f}%"
+        )
+    print(f"  Total wall-clock: {total_sec:.2f}s")
+
+    return results
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LightGBMモデル学習')
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS),
+                        help='学習するターゲット（デフォルト: すべて）')
+    parser.add_argument('--areas', nargs='+', default=AREAS,
+                        help='学習するエリア（デフォルト: tokyo）')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='並列プロセス数（デフォルト: ジョブ数とCPUコア数の小さい方）')
+    parser.add_argument('--mode', choices=['full', 'incremental', 'compare'], default='full',
+                        help='full: フル再学習, incremental: 新しいデータで増分更新, '
+                             'compare: 増分更新とフル再学習の比較（モデルは保存しない）')
+    parser.add_argument('--start', default=None, help='学習データの開始日時（例: 2025-04-01）')
+    parser.add_argument('--end', default=None, help='学習データの終了日時（例: 2026-03-31）')
+    args = parser.parse_args()
+
     print("Starting model training...")
     print(f"Timestamp: {datetime.now().isoformat()}\n")
 
-    # 発電量モデル学習
-    gen_model, gen_features = train_generation_model()
-
-    # 価格モデル学習
-    price_model, price_features = train_price_model()
+    if args.mode == 'compare':
+        for target in args.targets:
+            for area in args.areas:
+                compare_refresh(target, area)
+    else:
+        train_parallel(args.targets, args.areas, workers=args.workers,
+                       incremental=args.mode == 'incremental', start=args.start, end=args.end)
 
     print("\n" + "=" * 60)
     print("✓ All models trained successfully!")
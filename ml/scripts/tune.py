@@ -0,0 +1,345 @@
+"""
+LightGBMハイパーパラメータ探索スクリプト
+
+時系列のローリングオリジン交差検証でパラメータを評価します。
+各foldのLightGBM Datasetは最初に一度だけビン化してバイナリ保存し、
+すべての試行（ワーカープロセス）で再利用します。
+結果は models/{target}_{area}.params.json に保存され、train.py が使用します。
+"""
+
+import numpy as np
+import lightgbm as lgb
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from train import TARGETS, AREAS, PARAMS, MODEL_DIR, build_training_data
+
+# ビン化に関わるパラメータ（Dataset構築時に固定し、探索対象にしない）
+DATASET_PARAMS = {
+    'max_bin': 255,
+    'feature_pre_filter': False,
+    'verbose': -1
+}
+
+MAX_BOOST_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+
+# 途中のfoldでベスト試行のスコアをこの倍率以上上回ったら打ち切る
+PRUNE_RATIO = 1.2
+
+# ワーカープロセスごとに保持するfoldのDataset
+_folds = None
+_num_threads = 0
+
+
+def make_folds(n_rows: int, n_folds: int) -> list:
+    """
+    ローリングオリジンのfold境界を作成
+
+    データを n_folds + 1 個のブロックに分け、k番目のfoldは
+    先頭からk+1ブロックで学習し、次の1ブロックで検証する。
+
+    Args:
+        n_rows: 行数
+        n_folds: fold数
+
+    Returns:
+        (train_end, valid_end) のリスト
+    """
+    block = n_rows // (n_folds + 1)
+    if block < EARLY_STOPPING_ROUNDS:
+        raise ValueError(f"Not enough data for {n_folds} folds: {n_rows} records")
+
+    return [(block * (k + 1), block * (k + 2)) for k in range(n_folds)]
+
+
+def build_fold_datasets(X, y, feature_cols: list, folds: list, cache_dir: Path) -> list:
+    """
+    foldごとのDatasetをビン化してバイナリ保存
+
+    Args:
+        X: 特徴量行列
+        y: ターゲット
+        feature_cols: 特徴量の列名リスト
+        folds: make_folds() の戻り値
+        cache_dir: 保存先ディレクトリ
+
+    Returns:
+        (学習用バイナリのパス, 検証用バイナリのパス) のリスト
+    """
+    paths = []
+
+    for k, (train_end, valid_end) in enumerate(folds):
+        train_path = cache_dir / f'fold{k}_train.bin'
+        valid_path = cache_dir / f'fold{k}_valid.bin'
+
+        train_data = lgb.Dataset(X[:train_end], label=y[:train_end], feature_name=feature_cols,
+                                 params=DATASET_PARAMS)
+        valid_data = lgb.Dataset(X[train_end:valid_end], label=y[train_end:valid_end],
+                                 reference=train_data, params=DATASET_PARAMS)
+
+        train_data.save_binary(str(train_path))
+        valid_data.save_binary(str(valid_path))
+
+        paths.append((str(train_path), str(valid_path)))
+        print(f"  fold {k}: train {train_end}, valid {valid_end - train_end}")
+
+    return paths
+
+
+def init_worker(fold_paths: list, num_threads: int):
+    """
+    ワーカープロセスの初期化（foldのDatasetを一度だけロード）
+
+    Args:
+        fold_paths: build_fold_datasets() の戻り値
+        num_threads: 試行ごとのLightGBMスレッド数
+    """
+    global _folds, _num_threads
+
+    _folds = []
+    for train_path, valid_path in fold_paths:
+        train_data = lgb.Dataset(train_path, params=DATASET_PARAMS).construct()
+        valid_data = lgb.Dataset(valid_path, reference=train_data, params=DATASET_PARAMS).construct()
+        _folds.append((train_data, valid_data))
+
+    _num_threads = num_threads
+
+
+def sample_params(rng: np.random.RandomState) -> dict:
+    """
+    探索空間からパラメータをランダムに1組サンプリング
+
+    Args:
+        rng: 乱数生成器
+
+    Returns:
+        パラメータ辞書
+    """
+    return {
+        'num_leaves': int(np.exp(rng.uniform(np.log(8), np.log(128)))),
+        'learning_rate': float(np.exp(rng.uniform(np.log(0.01), np.log(0.2)))),
+        'feature_fraction': float(rng.uniform(0.5, 1.0)),
+        'bagging_fraction': float(rng.uniform(0.5, 1.0)),
+        'bagging_freq': int(rng.choice([0, 1, 5])),
+        'min_data_in_leaf': int(rng.randint(5, 101)),
+        'lambda_l2': float(np.exp(rng.uniform(np.log(1e-3), np.log(10.0))))
+    }
+
+
+def _deadline_callback(deadline: float, state: dict):
+    """時間予算を超えたらブースティングを打ち切るコールバック（打ち切ったら state["truncated"] をTrueにする）"""
+    def callback(env):
+        if time.time() > deadline:
+            state['truncated'] = True
+            raise lgb.callback.EarlyStopException(env.iteration, env.evaluation_result_list)
+    callback.order = 40
+    return callback
+
+
+def run_trial(trial_id: int, params: dict, best_fold_scores: list, deadline: float) -> dict:
+    """
+    1試行を全foldで評価
+
+    Args:
+        trial_id: 試行番号
+        params: 探索対象のパラメータ
+        best_fold_scores: 現時点のベスト試行のfoldごとのRMSE（なければNone）
+        deadline: 探索全体の期限（time.time() 基準）
+
+    Returns:
+        試行結果の辞書（status: complete / pruned / timeout / truncated）
+
+    時間予算でfoldの学習を途中で打ち切った試行は、最後まで学習した試行とスコアを
+    比べられないため truncated とし、ベスト試行の候補にしない。
+    """
+    train_params = dict(PARAMS)
+    train_params.update(params)
+    if _num_threads > 0:
+        train_params['num_threads'] = _num_threads
+
+    scores = []
+    rounds = []
+    state = {'truncated': False}
+
+    for k, (train_data, valid_data) in enumerate(_folds):
+        if time.time() > deadline:
+            return {'trial_id': trial_id, 'params': params, 'status': 'timeout', 'fold_scores': scores}
+
+        model = lgb.train(
+            train_params,
+            train_data,
+            num_boost_round=MAX_BOOST_ROUNDS,
+            valid_sets=[valid_data],
+            callbacks=[
+                lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS, verbose=False),
+                _deadline_callback(deadline, state)
+            ]
+        )
+
+        if state['truncated']:
+            return {'trial_id': trial_id, 'params': params, 'status': 'truncated', 'fold_scores': scores}
+
+        scores.append(model.best_score['valid_0']['rmse'])
+        rounds.append(model.best_iteration)
+
+        # ベスト試行より明らかに悪ければ残りのfoldを評価しない
+        if best_fold_scores is not None and scores[k] > best_fold_scores[k] * PRUNE_RATIO:
+            return {'trial_id': trial_id, 'params': params, 'status': 'pruned', 'fold_scores': scores}
+
+    return {
+        'trial_id': trial_id,
+        'params': params,
+        'status': 'complete',
+        'fold_scores': scores,
+        'cv_rmse': float(np.mean(scores)),
+        'best_rounds': int(np.mean(rounds))
+    }
+
+
+def search(target: str, area: str = 'tokyo', n_folds: int = 3, time_budget: float = 120.0,
+           max_trials: int = 100, workers: int = None, seed: int = 42) -> dict:
+    """
+    時間予算内でハイパーパラメータを探索
+
+    Args:
+        target: 'generation' または 'price'
+        area: エリア名
+        n_folds: fold数
+        time_budget: 探索の時間予算（秒）
+        max_trials: 最大試行数
+        workers: 並列プロセス数（Noneならコア数）
+        seed: 乱数シード
+
+    Returns:
+        ベスト試行の結果
+    """
+    print("=" * 60)
+    print(f"Searching {TARGETS[target]['title']} [{area}]")
+    print("=" * 60)
+
+    start = time.time()
+    deadline = start + time_budget
+
+    X, y, _, feature_cols = build_training_data(target, area)
+    folds = make_folds(len(X), n_folds)
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, max_trials))
+    num_threads = max(1, cpu_count // workers)
+
+    rng = np.random.RandomState(seed)
+    best = None
+    results = []
+
+    def record(result):
+        nonlocal best
+        results.append(result)
+        if result['status'] == 'complete' and (best is None or result['cv_rmse'] < best['cv_rmse']):
+            best = result
+        score = f"{result['cv_rmse']:.4f}" if result['status'] == 'complete' else '-'
+        print(f"  trial {result['trial_id']:3d}: {result['status']:<9} CV RMSE {score}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print(f"Building {n_folds} fold datasets...")
+        fold_paths = build_fold_datasets(X, y, feature_cols, folds, Path(cache_dir))
+        del X, y
+
+        print(f"Running trials on {workers} workers ({num_threads} threads each), budget {time_budget:.0f}s")
+
+        # 最初の試行は既定パラメータで評価し、比較の基準にする
+        base_params = {key: PARAMS[key] for key in ('num_leaves', 'learning_rate', 'feature_fraction',
+                                                    'bagging_fraction', 'bagging_freq')}
+        trial_params = [base_params] + [sample_params(rng) for _ in range(max_trials - 1)]
+
+        if workers == 1:
+            init_worker(fold_paths, num_threads)
+            for trial_id, params in enumerate(trial_params):
+                if time.time() > deadline:
+                    break
+                record(run_trial(trial_id, params, best and best['fold_scores'], deadline))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(fold_paths, num_threads)) as executor:
+                queue = list(enumerate(trial_params))
+                pending = set()
+
+                while queue or pending:
+                    while queue and len(pending) < workers and time.time() < deadline:
+                        trial_id, params = queue.pop(0)
+                        pending.add(executor.submit(
+                            run_trial, trial_id, params, best and best['fold_scores'], deadline
+                        ))
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+
+    elapsed = time.time() - start
+    counts = {status: sum(r['status'] == status for r in results)
+              for status in ('complete', 'pruned', 'timeout', 'truncated')}
+
+    print(f"\n[{target}/{area}] {len(results)} trials in {elapsed:.1f}s "
+          f"(complete {counts['complete']}, pruned {counts['pruned']}, timeout {counts['timeout']}, "
+          f"truncated {counts['truncated']})")
+
+    if best is None:
+        raise RuntimeError("No trial completed within the time budget")
+
+    print(f"[{target}/{area}] Best CV RMSE: {best['cv_rmse']:.4f} (trial {best['trial_id']})")
+    for key, value in best['params'].items():
+        print(f"  {key}: {value}")
+
+    # 探索結果を保存（train.pyが読み込む）
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    params_path = MODEL_DIR / f'{target}_{area}.params.json'
+    with open(params_path, 'w') as f:
+        json.dump({
+            'params': best['params'],
+            'cv_rmse': best['cv_rmse'],
+            'fold_scores': best['fold_scores'],
+            'best_rounds': best['best_rounds'],
+            'n_folds': n_folds,
+            'n_trials': len(results),
+            'tuned_at': datetime.now().isoformat()
+        }, f, indent=2)
+
+    print(f"\n✓ Params saved to {params_path}")
+
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LightGBMハイパーパラメータ探索')
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS),
+                        help='探索するターゲット（デフォルト: すべて）')
+    parser.add_argument('--areas', nargs='+', default=AREAS,
+                        help='探索するエリア（デフォルト: tokyo）')
+    parser.add_argument('--folds', type=int, default=3, help='fold数（デフォルト: 3）')
+    parser.add_argument('--time-budget', type=float, default=120.0,
+                        help='ターゲット・エリアごとの時間予算（秒、デフォルト: 120）')
+    parser.add_argument('--max-trials', type=int, default=100, help='最大試行数（デフォルト: 100）')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='並列プロセス数（デフォルト: CPUコア数）')
+    parser.add_argument('--seed', type=int, default=42, help='乱数シード')
+    args = parser.parse_args()
+
+    for target in args.targets:
+        for area in args.areas:
+            search(
+                target,
+                area,
+                n_folds=args.folds,
+                time_budget=args.time_budget,
+                max_trials=args.max_trials,
+                workers=args.workers,
+                seed=args.seed
+            )
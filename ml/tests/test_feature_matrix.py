@@ -0,0 +1,88 @@
+"""
+build_feature_matrix() のテスト
+
+以前の pandas の実装（shift / rolling で特徴量を作って dropna）を基準に、
+欠損を含む系列でも同じ行・同じ値になることを確認します。
+
+実行: python -m pytest ml/tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 学習スクリプトのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from train import LAGS, ROLLING_WINDOWS, build_feature_matrix, get_feature_cols
+
+TARGET_COL = 'price_yen'
+
+ROWS = 400
+
+
+def legacy_feature_matrix(df: pd.DataFrame, target_col: str):
+    """以前の create_features + create_lag_features + dropna による特徴量行列"""
+    df = df.copy()
+    df['hour'] = df['timestamp'].dt.hour
+    df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
+    df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
+    df['day_of_week'] = df['timestamp'].dt.dayofweek
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+    df['month'] = df['timestamp'].dt.month
+    df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
+    df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
+
+    for lag in LAGS:
+        df[f'{target_col}_lag_{lag}'] = df[target_col].shift(lag)
+    for window in ROLLING_WINDOWS:
+        df[f'{target_col}_rolling_mean_{window}'] = df[target_col].rolling(window=window).mean()
+        df[f'{target_col}_rolling_std_{window}'] = df[target_col].rolling(window=window).std()
+
+    feature_cols = get_feature_cols(target_col)
+    df = df.dropna(subset=feature_cols + [target_col])
+    return df[feature_cols].to_numpy(dtype=np.float32), df[target_col].to_numpy(dtype=np.float32)
+
+
+def make_series(nan_rows: list) -> pd.DataFrame:
+    """30分間隔の合成データ（nan_rows の行を欠損にする）"""
+    rng = np.random.RandomState(0)
+    values = 10 + 5 * np.sin(np.arange(ROWS) / 8) + rng.normal(0, 1, ROWS)
+    values[nan_rows] = np.nan
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2026-01-01', periods=ROWS, freq='30min'),
+        TARGET_COL: values.astype(np.float32)
+    })
+
+
+class BuildFeatureMatrixTest(unittest.TestCase):
+    """以前の pandas の実装と同じ結果になる"""
+
+    def assert_matches_legacy(self, df: pd.DataFrame):
+        X, y, _ = build_feature_matrix(df, TARGET_COL)
+        expected_X, expected_y = legacy_feature_matrix(df, TARGET_COL)
+
+        self.assertEqual(X.shape, expected_X.shape)
+        np.testing.assert_allclose(X, expected_X, rtol=1e-4, atol=1e-4)
+        np.testing.assert_array_equal(y, expected_y)
+
+    def test_without_missing_values(self):
+        self.assert_matches_legacy(make_series([]))
+
+    def test_single_missing_value_only_drops_windows_containing_it(self):
+        df = make_series([150])
+        self.assert_matches_legacy(df)
+
+        X, _, _ = build_feature_matrix(df, TARGET_COL)
+        # 欠損を含む窓（最大の窓・Lagの範囲）の行だけが落ちる
+        self.assertGreater(len(X), 200)
+
+    def test_multiple_missing_values(self):
+        self.assert_matches_legacy(make_series([120, 121, 300]))
+
+
+if __name__ == '__main__':
+    unittest.main()
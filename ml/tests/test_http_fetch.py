@@ -0,0 +1,149 @@
+"""
+http_fetch.fetch_file() のテスト
+
+ローカルの ThreadingHTTPServer に対して、新規取得（200）・変更なし（304）・
+途中ファイルからの再開（206）・HTMLのエラーページの扱いを確認します。
+
+実行: python -m pytest ml/tests
+"""
+
+import asyncio
+import hashlib
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 取得スクリプトのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import http_fetch
+
+HEADER_MARKER = '単位[MW平均]'.encode('utf-8')
+
+ETAG = '"v1"'
+
+CONTENT = (
+    '単位[MW平均]\nDATE,TIME,太陽光発電実績,風力発電実績\n'
+    + ''.join(f'2026/1/1,{hour}:00,{hour * 10},{hour}\n' for hour in range(24))
+).encode('utf-8')
+
+ERROR_PAGE = b'<!DOCTYPE html>\n<html><body>Service Unavailable</body></html>\n'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """/data.csv は ETag・Range に対応、/error.html は200でHTMLを返す"""
+
+    # 受け取ったリクエストヘッダー（テストで確認する）
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+
+        if self.path == '/error.html':
+            self._send(200, ERROR_PAGE, {'Content-Type': 'text/html'})
+            return
+
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range') == ETAG:
+            start = int(range_header.split('=')[1].rstrip('-'))
+            self._send(206, CONTENT[start:], {
+                'ETag': ETAG,
+                'Content-Range': f'bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}'
+            })
+            return
+
+        self._send(200, CONTENT, {'ETag': ETAG})
+
+    def _send(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchFileTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.output_file = self.tmp_dir / 'data.csv'
+        FileHandler.requests.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def fetch(self, path: str = '/data.csv') -> dict:
+        async def run():
+            async with http_fetch.create_client() as client:
+                return await http_fetch.fetch_file(client, self.base_url + path, self.output_file,
+                                                   header_marker=HEADER_MARKER, max_retries=1)
+
+        return asyncio.run(run())
+
+    def test_download_then_not_modified(self):
+        result = self.fetch()
+        self.assertEqual(result['status'], 'updated')
+        self.assertEqual(self.output_file.read_bytes(), CONTENT)
+        self.assertEqual(result['hash'], hashlib.md5(CONTENT).hexdigest())
+        meta = http_fetch.load_meta(self.output_file)
+        self.assertEqual(meta['etag'], ETAG)
+        self.assertNotIn('partial', meta)
+
+        result = self.fetch()
+        self.assertEqual(result['status'], 'not_modified')
+        self.assertEqual(FileHandler.requests[-1].get('If-None-Match'), ETAG)
+        self.assertEqual(self.output_file.read_bytes(), CONTENT)
+
+    def test_resume_partial_download(self):
+        # 途中で切れたダウンロード（前半だけの途中ファイルと再開用の検証情報）
+        offset = len(CONTENT) // 2
+        part_file = self.output_file.with_name(self.output_file.name + '.part')
+        part_file.write_bytes(CONTENT[:offset])
+        url = self.base_url + '/data.csv'
+        with open(self.output_file.with_name(self.output_file.name + '.meta.json'), 'w') as f:
+            json.dump({'partial': {'url': url, 'etag': ETAG, 'last_modified': None}}, f)
+
+        result = self.fetch()
+
+        self.assertEqual(FileHandler.requests[-1].get('Range'), f'bytes={offset}-')
+        self.assertEqual(result['status'], 'updated')
+        self.assertEqual(self.output_file.read_bytes(), CONTENT)
+        self.assertEqual(result['hash'], hashlib.md5(CONTENT).hexdigest())
+        self.assertFalse(part_file.exists())
+
+    def test_html_error_page_is_invalid(self):
+        result = self.fetch('/error.html')
+
+        self.assertEqual(result['status'], 'invalid')
+        self.assertFalse(self.output_file.exists())
+        self.assertFalse(self.output_file.with_name(self.output_file.name + '.part').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+load_target_data() の期間指定のテスト
+
+CSV と列指向ストア（Parquet）のどちらから読んでも、日付だけの終了日時は
+その日の終わりまで含むことを確認します。
+
+実行: python -m pytest ml/tests
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# 学習スクリプトのパスを追加
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import datastore
+from train import DATA_DIR, load_target_data
+
+AREA = 'tokyo'
+
+START = '2026-01-03'
+END = '2026-01-05'
+
+
+class LoadTargetDataRangeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.store_dir = mock.patch.object(datastore, 'STORE_DIR', self.tmp_dir)
+        self.store_dir.start()
+
+    def tearDown(self):
+        self.store_dir.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def assert_whole_days(self, df: pd.DataFrame):
+        self.assertEqual(df['timestamp'].min(), pd.Timestamp('2026-01-03 00:00'))
+        self.assertEqual(df['timestamp'].max(), pd.Timestamp('2026-01-05 23:30'))
+        self.assertEqual(len(df), 3 * 48)
+
+    def test_csv_includes_whole_end_day(self):
+        self.assertFalse(datastore.has_partitions('price', AREA))
+        self.assert_whole_days(load_target_data('price', AREA, START, END))
+
+    def test_store_matches_csv(self):
+        csv = pd.read_csv(DATA_DIR / f'price_{AREA}_sample.csv', parse_dates=['timestamp'])
+        datastore.append_partitions('price', AREA, csv[['timestamp', 'price_yen']])
+
+        store = load_target_data('price', AREA, START, END)
+        self.assert_whole_days(store)
+
+        # 時刻を含む終了日時はその時刻まで
+        store = load_target_data('price', AREA, START, '2026-01-05 12:00')
+        self.assertEqual(store['timestamp'].max(), pd.Timestamp('2026-01-05 12:00'))
+
+
+if __name__ == '__main__':
+    unittest.main()